@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+"""Append-only archive of daily KenPom snapshots, with queries.
+
+The archive is a single file: a short header followed by one record per date,
+each record being a binary snapshot (see snapshot.py) with a small header of
+its own. Queries mmap the file and pull just the columns they need out of each
+snapshot, so memory use stays flat however many seasons are stored.
+
+    python archive.py ARCHIVE trajectory vt,wof --days 30
+    python archive.py ARCHIVE movers --days 7
+"""
+import argparse
+import bisect
+import datetime
+import hashlib
+import mmap
+import os
+from pathlib import Path
+import re
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import snapshot
+from snapshot import SnapshotReader
+from table import KenPomData, KenPomTable
+
+MAGIC = b'KPARCH'
+VERSION = 1
+
+_FILE_HEADER = struct.Struct('<6sH')
+# payload length, date (proleptic Gregorian ordinal), sha256 of the payload
+_RECORD_HEADER = struct.Struct('<Ii32s')
+
+TRAJECTORY_FIELDS = ('rank', 'off_rank', 'def_rank')
+
+# The date in "Data includes 84 of 97 games played on Saturday, December 17"
+_AS_OF_DATE = re.compile(
+    r'\b(January|February|March|April|May|June|July|August|September|October|November|December)'
+    r'\s+(\d{1,2})\b',
+    re.IGNORECASE,
+)
+
+
+class ArchiveError(ValueError):
+    """Raised for non-archives, or archives from a newer version."""
+
+
+class Record(NamedTuple):
+    date: datetime.date
+    offset: int  # of the snapshot payload within the file
+    length: int
+    digest: bytes
+
+
+class Mover(NamedTuple):
+    abbrev: str
+    name: str
+    before: int
+    after: int
+
+    @property
+    def change(self) -> int:
+        """Places gained (positive) or lost (negative).
+
+        Ranks count down, so this is `before - after`.
+        """
+        return self.before - self.after
+
+
+def as_of_date(as_of: str, today: Optional[datetime.date] = None) -> Optional[datetime.date]:
+    """The date games were last played on, from KenPom's as-of text.
+
+    The text has no year, so it's the latest such date on or before `today`.
+    None if there's no date in it.
+    """
+    match = _AS_OF_DATE.search(as_of)
+    if not match:
+        return None
+    today = today or datetime.date.today()
+    month = datetime.datetime.strptime(match[1].title(), '%B').month
+    for year in (today.year, today.year - 1):
+        try:
+            date = datetime.date(year, month, int(match[2]))
+        except ValueError:  # e.g. February 29 of a year without one
+            continue
+        if date <= today:
+            return date
+    return None
+
+
+class Archive:
+    """One archive file, opened for appending and querying."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.records: List[Record] = []
+        self._end = _FILE_HEADER.size  # where the last whole record (and its padding) ends
+        self._buffer: Optional[mmap.mmap] = None
+        if not self.path.exists() or not self.path.stat().st_size:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_bytes(_FILE_HEADER.pack(MAGIC, VERSION))
+        self._read_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    def _read_index(self):
+        """Walk the record headers to find each snapshot."""
+        with open(self.path, 'rb') as f:
+            magic, version = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+            if magic != MAGIC:
+                raise ArchiveError(f'{self.path} is not a KenPom archive')
+            if version > VERSION:
+                raise ArchiveError(f'Archive version {version} is newer than we understand')
+
+            position = _FILE_HEADER.size
+            end = os.fstat(f.fileno()).st_size
+            while position + _RECORD_HEADER.size <= end:
+                f.seek(position)
+                length, ordinal, digest = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+                offset = position + _RECORD_HEADER.size
+                if offset + length > end:
+                    break  # a torn write at the tail, the next append overwrites it
+                date = datetime.date.fromordinal(ordinal)
+                bisect.insort(self.records, Record(date, offset, length, digest))
+                position = offset + length + (-length % 8)
+                self._end = position
+
+    def _map(self) -> mmap.mmap:
+        if self._buffer is None:
+            with open(self.path, 'rb') as f:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._buffer
+
+    def dates(self) -> List[datetime.date]:
+        return [r.date for r in self.records]
+
+    def append(self, data: KenPomData, as_of: str, date: Optional[datetime.date] = None) -> bool:
+        """Store a snapshot for `date`, by default that of `as_of`.
+
+        Dates may arrive in any order (think backfilling old seasons). Returns
+        False, storing nothing, if we already have that date or the very same
+        data under another date (no games played in between).
+        """
+        date = date or as_of_date(as_of)
+        return self.append_snapshot(snapshot.dumps(data, as_of), date)
+
+    def append_snapshot(self, payload: bytes, date: Optional[datetime.date] = None) -> bool:
+        """Like `append`, for a snapshot from `snapshot.dumps`."""
+        date = date or datetime.date.today()
+        if date in self.dates():
+            return False
+
+        digest = hashlib.sha256(payload).digest()
+        if any(r.digest == digest for r in self.records):
+            return False
+
+        self.close()
+        with open(self.path, 'r+b') as f:
+            # Drop any torn record at the tail, or it would swallow this one
+            position = self._end
+            f.truncate(position)
+            f.seek(position)
+            header = _RECORD_HEADER.pack(len(payload), date.toordinal(), digest)
+            f.write(header + payload + b'\0' * (-len(payload) % 8))
+            self._end = f.tell()
+        bisect.insort(self.records, Record(date, position + len(header), len(payload), digest))
+        return True
+
+    def snapshots(
+        self, since: Optional[datetime.date] = None, until: Optional[datetime.date] = None
+    ) -> Iterator[Tuple[datetime.date, SnapshotReader]]:
+        """Yield a lazy reader per snapshot from `since` to `until`."""
+        for record in self.records:
+            if (since and record.date < since) or (until and record.date > until):
+                continue
+            yield record.date, self._reader(record)
+
+    def _reader(self, record: Record) -> SnapshotReader:
+        return SnapshotReader(self._map(), record.offset)
+
+    def load(self, date: datetime.date) -> Tuple[KenPomTable, str]:
+        """Return `(table, as_of)` for the snapshot stored on `date`."""
+        for record in self.records:
+            if record.date == date:
+                return snapshot.loads(self._map(), record.offset)
+        raise KeyError(date)
+
+    def _since(self, days: int) -> Optional[datetime.date]:
+        return self.records[-1].date - datetime.timedelta(days=days) if self.records else None
+
+    def trajectory(
+        self, abbrevs: Sequence[str], fields: Sequence[str] = TRAJECTORY_FIELDS, days: int = 30
+    ) -> Dict[str, List[Tuple[datetime.date, Tuple[int, ...]]]]:
+        """Return each abbrev's `fields` over the last `days`."""
+        wanted = [a.upper() for a in abbrevs]
+        result: Dict[str, List[Tuple[datetime.date, Tuple[int, ...]]]] = {
+            a.lower(): [] for a in abbrevs
+        }
+        for date, reader in self.snapshots(since=self._since(days)):
+            positions = {a: i for i, a in enumerate(reader.column('abbrev'))}
+            columns = [reader.column(f) for f in fields]
+            for abbrev in wanted:
+                i = positions.get(abbrev)
+                if i is not None:
+                    result[abbrev.lower()].append((date, tuple(c[i] for c in columns)))
+        return result
+
+    def movers(self, days: int = 7, field: str = 'rank', limit: int = 10) -> List[Mover]:
+        """Return the biggest changes in `field` over the last `days`.
+
+        Compares the latest snapshot with the newest one at least `days` older.
+        """
+        cutoff = self._since(days)
+        older = [r for r in self.records if cutoff and r.date <= cutoff]
+        if not older:
+            return []
+        before, after = self._reader(older[-1]), self._reader(self.records[-1])
+        before_values = dict(zip(before.column('abbrev'), before.column(field)))
+        movers = [
+            Mover(abbrev, name, before_values[abbrev], value)
+            for abbrev, name, value in zip(
+                after.column('abbrev'), after.column('name'), after.column(field)
+            )
+            if abbrev in before_values
+        ]
+        movers.sort(key=lambda m: abs(m.change), reverse=True)
+        return movers[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query an archive of KenPom snapshots.')
+    parser.add_argument('archive', type=Path, help='archive file, see kenpom.py --archive')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    trajectory = commands.add_parser('trajectory', help='ranks over time for some teams')
+    trajectory.add_argument('abbrevs', help='comma-separated school abbrevs, e.g. vt,wof')
+    trajectory.add_argument('--days', type=int, default=30, help='defaults to %(default)s')
+
+    movers = commands.add_parser('movers', help='biggest rank changes')
+    movers.add_argument('--days', type=int, default=7, help='defaults to %(default)s')
+    movers.add_argument('--field', default='rank', help='defaults to %(default)s')
+    movers.add_argument('--limit', type=int, default=10, help='defaults to %(default)s')
+    args = parser.parse_args()
+
+    with Archive(args.archive) as archive:
+        if args.command == 'trajectory':
+            abbrevs = [a.strip() for a in args.abbrevs.split(',')]
+            for abbrev, points in archive.trajectory(abbrevs, days=args.days).items():
+                print(f'{abbrev.upper():>6}  ' + '/'.join(f[:3] for f in TRAJECTORY_FIELDS))
+                for date, values in points:
+                    print(f'{date}  ' + ' / '.join(f'{v:>3}' for v in values))
+                print()
+        else:
+            for mover in archive.movers(args.days, args.field, args.limit):
+                print(
+                    f'{mover.name:>25} {mover.abbrev:>6} {mover.before:>5} -> {mover.after:>5}'
+                    f' {mover.change:>+5}'
+                )
+
+
+if __name__ == '__main__':
+    main()
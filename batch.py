@@ -0,0 +1,123 @@
+"""Run many filters against one snapshot: `kenpom.py --batch FILE|-`.
+
+A nightly report used to run the script once per filter, paying start up,
+the fetch and the parse every time for what is really one snapshot and a
+lot of cheap filters. Here the snapshot is loaded once and each filter's
+output is written in order, with a delimiter line naming the query:
+
+    table   ==> acc <==
+    csv     # query: acc
+    jsonl   {"query": "acc", "num_teams": 15}
+
+Large batches fan out over a process pool. Each worker loads the snapshot
+from its compact binary form (see snapshot.py) once, and since filtering and
+rendering are pure Python that is what actually uses more than one core.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import io
+import json
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import formats
+from kenpom import filter_data, write_to_console
+from query import SortKey
+import snapshot
+from table import KenPomData
+
+# Below this many filters a pool costs more to start than it saves
+PARALLEL_MIN_QUERIES = 200
+CHUNK_QUERIES = 25
+
+
+def read_filters(lines: Iterable[str]) -> List[str]:
+    """One filter per line, skipping blank lines and `#` comments."""
+    filters = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            filters.append('0' if line.lower() == 'all' else line)
+    return filters
+
+
+def delimiter(fmt: str, query: str, num_teams: int) -> str:
+    if fmt == 'jsonl':
+        return json.dumps({'query': query, 'num_teams': num_teams}) + '\n'
+    if fmt == 'csv':
+        return f'# query: {query}\n'
+    return f'==> {query} <==\n'
+
+
+def render(
+    data: KenPomData,
+    as_of: str,
+    query: str,
+    fmt: str = 'table',
+    indent: int = 0,
+    sort: Optional[List[SortKey]] = None,
+) -> str:
+    """Return the delimited output of one filter."""
+    try:
+        filtered, meta = filter_data(data, query, sort)
+    except (AssertionError, ValueError) as e:  # bad top `n` or expression, carry on
+        return delimiter(fmt, query, 0) + f'error: {e}\n'
+
+    out = io.StringIO()
+    out.write(delimiter(fmt, query, meta['num_teams']))
+    if fmt == 'table':
+        write_to_console(filtered, meta, as_of, indent, out)
+    else:
+        formats.write(filtered, as_of, fmt, out)
+    return out.getvalue()
+
+
+_worker_snapshot: Optional[Tuple[KenPomData, str]] = None
+
+
+def _load_worker_snapshot(payload: bytes):
+    global _worker_snapshot
+    _worker_snapshot = snapshot.loads(payload)
+
+
+def _render_in_worker(
+    query: str, fmt: str, indent: int, sort: Optional[List[SortKey]] = None
+) -> str:
+    assert _worker_snapshot is not None, 'Worker started without a snapshot'
+    table, as_of = _worker_snapshot
+    return render(table, as_of, query, fmt, indent, sort)
+
+
+def run_batch(
+    data: KenPomData,
+    as_of: str,
+    filters: List[str],
+    fmt: str = 'table',
+    indent: int = 0,
+    sort: Optional[List[SortKey]] = None,
+    workers: Optional[int] = None,
+) -> Iterator[str]:
+    """Yield each filter's output, in order.
+
+    `workers` defaults to the CPU count for batches of `PARALLEL_MIN_QUERIES` or
+    more, otherwise everything runs in this process.
+    """
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(filters) >= PARALLEL_MIN_QUERIES else 1
+    if workers <= 1:
+        for query in filters:
+            yield render(data, as_of, query, fmt, indent, sort)
+        return
+
+    payload = snapshot.dumps(data, as_of)
+    with ProcessPoolExecutor(
+        workers, initializer=_load_worker_snapshot, initargs=(payload,)
+    ) as pool:
+        n = len(filters)
+        yield from pool.map(
+            _render_in_worker,
+            filters,
+            [fmt] * n,
+            [indent] * n,
+            [sort] * n,
+            chunksize=CHUNK_QUERIES,
+        )
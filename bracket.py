@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+"""Monte Carlo tournament simulator, from matchup predictions.
+
+    python bracket.py                        # the tourney field, by seed
+    python bracket.py --bracket field.txt    # teams in bracket order, one per line
+    python bracket.py --sims 10000000 --seed 7
+
+A bracket file lists teams (abbrevs or full names) in bracket order: the first
+two meet in the first round, their winner meets the winner of the next two and
+so on, so the field must be a power of two. Without one, once KenPom shows
+tourney seeds we play the 64 team field, otherwise the top 64 teams by rank.
+Game win probabilities come from `matchup.MatchupMatrix`.
+
+Simulations run in fixed size batches. Each batch is vectorized with NumPy
+(plain Python without it), batches are spread over a process pool, and each
+batch gets its own RNG stream spawned from `--seed`, so results are the same
+for a given seed however many workers run them. The work grows with the number
+of sims, not of teams, so `table.NUMPY_MIN_ROWS` doesn't apply.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from kenpom import fetch_and_parse_data
+from matchup import find_team, matrix_for
+from pagecache import default_cache_dir
+import snapshot
+from table import as_table, KenPomTable, load_numpy, MISSING
+
+BATCH_SIMS = 50_000
+DEFAULT_FIELD_SIZE = 64
+REGIONS = 4
+REGION_SEEDS = 16
+
+
+def bracket_order(size: int) -> List[int]:
+    """Seeds 1..size in the usual bracket order, 1 v size first."""
+    order = [1]
+    while len(order) < size:
+        total = 2 * len(order) + 1
+        order = [s for seed in order for s in (seed, total - seed)]
+    return order
+
+
+def seeded_field(table: KenPomTable) -> Optional[List[int]]:
+    """Rows of the tourney field in bracket order, if seeded.
+
+    KenPom doesn't say which region a team is in, so each seed line is dealt out
+    along the S-curve by rank, and where a seed has more than four teams (the
+    First Four) the best ranked four play.
+    """
+    seeds = table.column('seed')
+    by_seed: Dict[int, List[int]] = {}
+    for row in table.argsort('rank'):
+        if seeds[row] != MISSING:
+            by_seed.setdefault(seeds[row], []).append(row)
+    if any(len(by_seed.get(s, ())) < REGIONS for s in range(1, REGION_SEEDS + 1)):
+        return None
+
+    regions: List[List[int]] = [[] for _ in range(REGIONS)]
+    for seed in range(1, REGION_SEEDS + 1):
+        teams = by_seed[seed][:REGIONS]
+        for region, row in zip(regions, teams if seed % 2 else teams[::-1]):
+            region.append(row)
+    # The best 1 seed meets the worst in the semis
+    semis = [regions[0], regions[3], regions[1], regions[2]]
+    return [region[seed - 1] for region in semis for seed in bracket_order(REGION_SEEDS)]
+
+
+def default_field(table: KenPomTable, size: int = DEFAULT_FIELD_SIZE) -> List[int]:
+    """The tourney field if it's `size` teams, else the top `size`."""
+    if size == REGIONS * REGION_SEEDS:
+        field = seeded_field(table)
+        if field is not None:
+            return field
+
+    by_rank = table.argsort('rank')[:size]
+    if size < 2 or size & (size - 1):
+        raise ValueError(f'A bracket needs a power of two teams, not {size}')
+    if len(by_rank) < size:
+        raise ValueError(f'Only {len(by_rank)} teams, not enough for a field of {size}')
+    return [by_rank[seed - 1] for seed in bracket_order(size)]
+
+
+def read_bracket(table: KenPomTable, lines: Iterable[str]) -> List[int]:
+    """Rows of the teams in a bracket file, skipping `#` comments."""
+    teams = [line.strip() for line in lines]
+    field = [find_team(table, t) for t in teams if t and not t.startswith('#')]
+    if len(field) < 2 or len(field) & (len(field) - 1):
+        raise ValueError(f'A bracket needs a power of two teams, not {len(field)}')
+    return field
+
+
+def round_names(size: int) -> List[str]:
+    """What winning each round gets a team into, `Champ` last."""
+    return [f'Last {size >> r}' for r in range(1, size.bit_length() - 1)] + ['Champ']
+
+
+def _field_probabilities(table: KenPomTable, field: Sequence[int]) -> List[List[float]]:
+    """Chance that field position i beats field position j."""
+    win_probabilities = matrix_for(table).win_probabilities
+    return [[float(win_probabilities[i][j]) for j in field] for i in field]
+
+
+def _simulate_batch(probabilities: List[List[float]], sims: int, seed: Any) -> List[List[int]]:
+    """Count, per position, the sims it won each round in."""
+    np = load_numpy()
+    if np is None:
+        return _simulate_batch_python(probabilities, sims, seed)
+
+    # One row per sim of the positions still alive; float32 draws and a flat
+    # `take` rather than 2-D fancy indexing are each good for ~20%.
+    size = len(probabilities)
+    flat = np.asarray(probabilities, dtype='float32').ravel()
+    rng = np.random.Generator(np.random.PCG64(seed))
+    alive = np.broadcast_to(np.arange(size), (sims, size))
+    wins = []
+    while alive.shape[1] > 1:
+        left, right = alive[:, 0::2], alive[:, 1::2]
+        won = rng.random(left.shape, dtype='float32') < flat.take(left * size + right)
+        alive = np.where(won, left, right)
+        wins.append(np.bincount(alive.ravel(), minlength=size).tolist())
+    return wins
+
+
+def _simulate_batch_python(probabilities: List[List[float]], sims: int, seed: Any):
+    rng = random.Random(str(seed))
+    size = len(probabilities)
+    wins = [[0] * size for _ in range(size.bit_length() - 1)]
+    for _ in range(sims):
+        alive = list(range(size))
+        for round_wins in wins:
+            alive = [
+                a if rng.random() < probabilities[a][b] else b
+                for a, b in zip(alive[0::2], alive[1::2])
+            ]
+            for team in alive:
+                round_wins[team] += 1
+    return wins
+
+
+def _batch_seeds(seed: Optional[int], batches: int) -> List[Any]:
+    np = load_numpy()
+    if np is None:
+        base = random.Random(seed).getrandbits(64)
+        return [(base, i) for i in range(batches)]
+    return np.random.SeedSequence(seed).spawn(batches)
+
+
+def simulate(
+    table: KenPomTable,
+    field: Sequence[int],
+    sims: int = 1_000_000,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, List[float]]:
+    """Return each abbrev's chance of winning each round."""
+    if sims < 1:
+        raise ValueError(f'Need at least one simulation, not {sims}')
+    probabilities = _field_probabilities(table, field)
+    full, rest = divmod(sims, BATCH_SIMS)
+    batch_sizes = [BATCH_SIMS] * full + ([rest] if rest else [])
+    seeds = _batch_seeds(seed, len(batch_sizes))
+    args = ([probabilities] * len(batch_sizes), batch_sizes, seeds)
+
+    workers = workers or min(os.cpu_count() or 1, len(batch_sizes))
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_simulate_batch, *args))
+    else:
+        results = list(map(_simulate_batch, *args))
+
+    rounds = len(field).bit_length() - 1
+    totals = [[0] * len(field) for _ in range(rounds)]
+    for wins in results:
+        for round_totals, round_wins in zip(totals, wins):
+            for position, count in enumerate(round_wins):
+                round_totals[position] += count
+
+    abbrevs = table.column('abbrev')
+    return {
+        abbrevs[row]: [totals[r][position] / sims for r in range(rounds)]
+        for position, row in enumerate(field)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a tournament from KenPom data.')
+    parser.add_argument(
+        '--bracket', type=argparse.FileType('r'), metavar='FILE', help='teams in bracket order'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=DEFAULT_FIELD_SIZE,
+        help='without --bracket or seeds, play the top N teams by rank',
+    )
+    parser.add_argument('--sims', type=int, default=1_000_000, help='defaults to %(default)s')
+    parser.add_argument('--seed', type=int, help='for reproducible results')
+    parser.add_argument('--workers', type=int, help='processes to use, defaults to all CPUs')
+    parser.add_argument(
+        '--snapshot', metavar='FILE', help='read data from a snapshot file rather than KenPom'
+    )
+    args = parser.parse_args()
+    if args.sims < 1:
+        parser.error('--sims must be at least 1')
+
+    if args.snapshot:
+        data, as_of = snapshot.load(args.snapshot)
+    else:
+        as_of, data = fetch_and_parse_data('stream', default_cache_dir())
+    table = as_table(data)
+    try:
+        field = (
+            read_bracket(table, args.bracket) if args.bracket else default_field(table, args.size)
+        )
+    except KeyError as e:
+        sys.exit(f'No team with abbrev or name {e}')
+    except ValueError as e:
+        sys.exit(str(e))
+
+    results = simulate(table, field, args.sims, args.seed, args.workers)
+    names = dict(zip(table.column('abbrev'), table.column('name')))
+    print(f'{"Team":>25} {"Abbrev":>6}' + ''.join(f' {r:>7}' for r in round_names(len(field))))
+    for abbrev, chances in sorted(results.items(), key=lambda item: item[1][::-1], reverse=True):
+        print(f'{names[abbrev]:>25} {abbrev:>6}' + ''.join(f' {c:>7.1%}' for c in chances))
+    print(f'\n{args.sims:,} simulations, {as_of}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Per-conference summaries, for `--conf-summary` and `/conferences`.
+
+For each conference in a snapshot: the number of teams, the mean, median, min
+and max of a few efficiency fields, and the best and worst ranked team. All
+conferences are summarized in one group-by pass over the table's columns
+(vectorized with NumPy for tables past `table.NUMPY_MIN_ROWS`), and the result
+is cached on the table, so it is worked out once per refresh however often it's
+asked for.
+"""
+import csv
+import io
+import json
+import math
+import statistics
+import sys
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+from table import as_table, KenPomData, KenPomTable, load_numpy, numpy_for
+
+STAT_FIELDS = ('eff_margin', 'offense', 'defense', 'tempo', 'sos_eff_margin')
+STATS = ('mean', 'median', 'min', 'max')
+
+
+class ConfSummary(NamedTuple):
+    conf: str
+    teams: int
+    best: str  # abbrevs of the best and worst ranked teams
+    worst: str
+    stats: Dict[str, Dict[str, float]]  # field -> stat -> value
+
+    def flat(self) -> Dict[str, Any]:
+        """One level dict, e.g. `eff_margin_mean`, for JSONL and CSV."""
+        row: Dict[str, Any] = {f: getattr(self, f) for f in ('conf', 'teams', 'best', 'worst')}
+        for field, stats in self.stats.items():
+            # KenPom gives three decimals at most, the rest is float noise
+            row.update((f'{field}_{stat}', round(value, 4)) for stat, value in stats.items())
+        return row
+
+
+def summarize(table: KenPomTable) -> List[ConfSummary]:
+    """Summarize every conference in `table`, best first.
+
+    Best means the highest mean `eff_margin`.
+    """
+    np = numpy_for(len(table))
+    summarize_groups = _summarize_numpy if np is not None else _summarize_python
+    summaries = summarize_groups(table)
+    return sorted(summaries, key=lambda s: -s.stats['eff_margin']['mean'])
+
+
+def _summarize_numpy(table: KenPomTable) -> List[ConfSummary]:
+    np = load_numpy()
+    codes = np.asarray(table.column('conf'), dtype='intp')
+    counts = np.bincount(codes, minlength=len(table.conf_labels))
+    starts = np.cumsum(counts) - counts
+    ends = starts + counts - 1
+
+    # Sort rows by conf then value: each group's min, median and max are then
+    # at fixed offsets from where the group starts.
+    stats = {}
+    for field in STAT_FIELDS:
+        values = np.asarray(table.column(field), dtype='float64')
+        ordered = values[np.lexsort((values, codes))]
+        with np.errstate(invalid='ignore', divide='ignore'):  # empty groups
+            mean = np.bincount(codes, weights=values, minlength=len(counts)) / counts
+        median = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+        stats[field] = (mean, median, ordered[starts], ordered[ends])
+
+    by_rank = np.lexsort((np.asarray(table.column('rank')), codes))
+    abbrevs = table.column('abbrev')
+    return [
+        ConfSummary(
+            label,
+            int(counts[code]),
+            abbrevs[by_rank[starts[code]]],
+            abbrevs[by_rank[ends[code]]],
+            {f: dict(zip(STATS, (float(s[code]) for s in stats[f]))) for f in STAT_FIELDS},
+        )
+        for code, label in enumerate(table.conf_labels)
+        if counts[code]
+    ]
+
+
+def _summarize_python(table: KenPomTable) -> List[ConfSummary]:
+    groups: Dict[int, List[int]] = {}
+    for row, code in enumerate(table.column('conf')):
+        groups.setdefault(code, []).append(row)
+
+    ranks, abbrevs = table.column('rank'), table.column('abbrev')
+    columns = {f: table.column(f) for f in STAT_FIELDS}
+    summaries = []
+    for code, rows in groups.items():
+        stats = {}
+        for field, column in columns.items():
+            values = [column[row] for row in rows]
+            stats[field] = dict(
+                zip(
+                    STATS,
+                    (
+                        math.fsum(values) / len(values),
+                        statistics.median(values),
+                        min(values),
+                        max(values),
+                    ),
+                )
+            )
+        by_rank = sorted(rows, key=ranks.__getitem__)
+        summaries.append(
+            ConfSummary(
+                table.conf_labels[code],
+                len(rows),
+                abbrevs[by_rank[0]],
+                abbrevs[by_rank[-1]],
+                stats,
+            )
+        )
+    return summaries
+
+
+def summary_for(data: KenPomData) -> List[ConfSummary]:
+    """Return the summaries for a snapshot, built once."""
+    return as_table(data).derived('conf_summary', summarize)
+
+
+def select(summaries: Iterable[ConfSummary], confs: Iterable[str]) -> List[ConfSummary]:
+    """Just the summaries for `confs`, or all if none are given.
+
+    Conferences match without regard to case.
+    """
+    wanted = {c.lower() for c in confs}
+    return [s for s in summaries if not wanted or s.conf.lower() in wanted]
+
+
+def write(
+    summaries: List[ConfSummary], as_of: str, fmt: str = 'table', stream=None, indent: int = 0
+):
+    """Write summaries as a console table, JSON Lines or CSV."""
+    out = io.StringIO()
+    if fmt == 'jsonl':
+        out.writelines(json.dumps(s.flat()) + '\n' for s in summaries)
+    elif fmt == 'csv':
+        rows = [s.flat() for s in summaries]
+        if rows:
+            writer = csv.DictWriter(out, fieldnames=list(rows[0]), lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        out.write(_console_table(summaries, as_of, indent))
+
+    stream = stream or sys.stdout
+    stream.write(out.getvalue())
+    stream.flush()
+
+
+def _console_table(summaries: List[ConfSummary], as_of: str, indent: int = 0) -> str:
+    left_pad = indent * ' '
+    template = (
+        '{left_pad}{conf:>5} {teams:>5}  {em_mean:>6} {em_median:>6} {em_min:>6} {em_max:>6}'
+        '  {offense:>5} {defense:>5} {tempo:>5} {sos:>6}  {best:>6} {worst:>6}\n'
+    )
+    header = template.format(
+        left_pad=left_pad,
+        conf='Conf',
+        teams='Teams',
+        em_mean='AdjEM',
+        em_median='Median',
+        em_min='Min',
+        em_max='Max',
+        offense='Off',
+        defense='Def',
+        tempo='Tempo',
+        sos='SOS',
+        best='Best',
+        worst='Worst',
+    )
+    lines = [header, left_pad + (len(header) - len(left_pad) - 1) * '-' + '\n']
+    for s in summaries:
+        em = s.stats['eff_margin']
+        lines.append(
+            template.format(
+                left_pad=left_pad,
+                conf=s.conf,
+                teams=s.teams,
+                em_mean=f'{em["mean"]:+.2f}',
+                em_median=f'{em["median"]:+.2f}',
+                em_min=f'{em["min"]:+.2f}',
+                em_max=f'{em["max"]:+.2f}',
+                offense=f'{s.stats["offense"]["mean"]:.1f}',
+                defense=f'{s.stats["defense"]["mean"]:.1f}',
+                tempo=f'{s.stats["tempo"]["mean"]:.1f}',
+                sos=f'{s.stats["sos_eff_margin"]["mean"]:+.2f}',
+                best=s.best,
+                worst=s.worst,
+            )
+        )
+    lines.append(f'\n{left_pad}{as_of}\n\n')
+    return ''.join(lines)
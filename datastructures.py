@@ -1,11 +1,27 @@
 import dataclasses
-from typing import Any, Dict
+from typing import Any, Callable, Dict, get_args, Optional, Sequence, Tuple
 
 # * HOLY COW, why am I just now seeing this:
 #     https://www.espn.com/apis/devcenter/overview.html
 #     http://site.api.espn.com/apis/site/v2/sports/basketball/mens-college-basketball/teams?limit=400
 
 
+def _slotted(cls):
+    """Rebuild a dataclass with `__slots__` for its fields.
+
+    This is what `dataclass(slots=True)` does, but that needs Python 3.10.
+    """
+    field_names = tuple(f.name for f in dataclasses.fields(cls))
+    namespace = dict(cls.__dict__)
+    namespace['__slots__'] = field_names
+    for name in field_names + ('__dict__', '__weakref__'):
+        # Class level defaults would clash with the slot descriptors. Fields can
+        # still have defaults, the generated `__init__` holds on to its own copy.
+        namespace.pop(name, None)
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@_slotted
 @dataclasses.dataclass
 class KenPom:
     """Lightweight wrapper around all available KenPom stats."""
@@ -34,6 +50,8 @@ class KenPom:
     # NOTE: abbrev is NOT in source KenPom data.
     # We append it so we can do searches based on score-ticker names (KU, VT, UVA, etc).
     abbrev: str
+    # NCAA tourney seed, on the page from Selection Sunday until the next season starts.
+    seed: Optional[int] = None
 
     def __post_init__(self):
         """Type incoming data.
@@ -41,10 +59,62 @@ class KenPom:
         We're scraping DOM element `text` values, so everything comes in as
         text, but we want typed values (think ACC avg offense rank: 23).
         """
-        for field in dataclasses.fields(self):
-            value = getattr(self, field.name)
-            if not isinstance(value, field.type):
-                setattr(self, field.name, field.type(value))
+        for name, types, convert in _NAMED_CONVERTERS:
+            value = getattr(self, name)
+            if not isinstance(value, types):
+                setattr(self, name, convert(value))
+
+    @classmethod
+    def from_text_items(cls, text_items: Sequence[Any]) -> 'KenPom':
+        """Build a row from values in field order.
+
+        This is the fast path for the parser: no `__init__` and no per-field
+        `isinstance` checks. The body is generated once, below the class.
+        """
+        return _from_text_items(cls, text_items)
+
+
+def _compile_from_text_items(cls) -> Callable[[type, Sequence[Any]], Any]:
+    """Generate a straight-line constructor, one call per slot.
+
+    Same trick `dataclasses` uses for `__init__`: unrolling the loop saves the
+    zip/lookup overhead on every one of the fields of every row we parse.
+    """
+    fields = dataclasses.fields(cls)
+    lines = ['def from_text_items(cls, items):', '    row = new(cls)', '    n = len(items)']
+    namespace: Dict[str, Any] = {'new': object.__new__}
+    for i, f in enumerate(fields):
+        namespace[f'convert_{f.name}'] = _converter(f)
+        if f.default is dataclasses.MISSING:
+            lines.append(f'    row.{f.name} = convert_{f.name}(items[{i}])')
+        else:  # trailing optional fields may be left off
+            namespace[f'default_{f.name}'] = f.default
+            lines.append(
+                f'    row.{f.name} = convert_{f.name}(items[{i}]) if n > {i} else default_{f.name}'
+            )
+    lines += ['    return row']
+    exec('\n'.join(lines), namespace)
+    return namespace['from_text_items']
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    return None if value is None or value == '' else int(value)
+
+
+def _converter(field: dataclasses.Field) -> Callable[[Any], Any]:
+    """The type itself for `int`, `float` and `str` fields."""
+    return _optional_int if field.type == Optional[int] else field.type  # type: ignore
+
+
+# Per-field converters, in field order, built once at import time
+FIELD_CONVERTERS: Tuple[Callable[[Any], Any], ...] = tuple(
+    map(_converter, dataclasses.fields(KenPom))
+)
+_NAMED_CONVERTERS = tuple(
+    (f.name, get_args(f.type) or f.type, convert)
+    for f, convert in zip(dataclasses.fields(KenPom), FIELD_CONVERTERS)
+)
+_from_text_items = _compile_from_text_items(KenPom)
 
 
 KenPomDict = Dict[str, KenPom]
@@ -0,0 +1,310 @@
+"""A small filter language, compiled to whole column operations.
+
+    conf in (acc, sec) and tempo < 66 and rank <= 100
+    not (luck > 0 or seed = 1)
+    defense_pct >= 90 and record != '12-0'
+
+A comparison is `FIELD OP VALUE`, OP one of < <= = == != >= >, or
+`FIELD in (VALUE, ...)`, and comparisons combine with `and`, `or`, `not` and
+parentheses. FIELD is any `KenPom` field or a percentile column (see
+percentiles.py). Text fields (name, abbrev, conf, record) compare without
+regard to case and only with =, != and `in`; teams without a seed never match
+a comparison on it.
+
+A query is parsed into a tree once, then compiled into nested functions that
+each turn a table into a row mask: a NumPy bool array for columns NumPy scans
+(see `KenPomTable.vector`), a list of bools otherwise. Compiled queries are
+cached by their text, so a query asked again, of this snapshot or the next,
+goes straight to evaluating.
+"""
+import functools
+import re
+from typing import Any, Callable, List, NamedTuple, Set, Tuple, Union
+
+import percentiles
+from query import index_for
+from table import CATEGORICAL_FIELDS, FIELDS, is_ndarray, KenPomTable, load_numpy, MISSING
+from table import NUMERIC_FIELDS, OPERATORS, OPTIONAL_FIELDS
+
+KEYWORDS = ('and', 'or', 'not', 'in')
+# Anything with a comparison or keyword in it is an expression, never a name
+_LOOKS_LIKE_EXPRESSION = re.compile(r'[<>=!]|\b(?:and|or|not)\b|\bin\s*\(')
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<number>-?(?:\d+(?:\.\d*)?|\.\d+))(?![^\s(),<>=!])
+      | (?P<op><=|>=|==|!=|<|>|=)
+      | (?P<punct>[(),])
+      | '(?P<quoted>[^']*)' | "(?P<dquoted>[^"]*)"
+      | (?P<word>[^\s(),<>=!'"]+)
+    )""",
+    re.VERBOSE,
+)
+TEXT_OPERATORS = ('=', '==', '!=')
+
+Value = Union[float, str]
+Mask = Any  # a NumPy bool array or a list of bools, one per row
+
+
+class ExpressionError(ValueError):
+    """A filter expression we can't parse or can't answer."""
+
+
+# The tree
+class Compare(NamedTuple):
+    field: str
+    op: str
+    value: Value
+
+
+class In(NamedTuple):
+    field: str
+    values: Tuple[Value, ...]
+
+
+class Not(NamedTuple):
+    operand: Any
+
+
+class BoolOp(NamedTuple):
+    op: str  # `and` or `or`
+    operands: Tuple[Any, ...]
+
+
+Node = Union[Compare, In, Not, BoolOp]
+
+
+def is_expression(text: str) -> bool:
+    """Whether a filter is an expression, not a top `n` or names."""
+    return bool(_LOOKS_LIKE_EXPRESSION.search(text.lower()))
+
+
+def _tokenize(text: str) -> List[Tuple[str, Value]]:
+    tokens: List[Tuple[str, Value]] = []
+    position, text = 0, text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ExpressionError(f'Unexpected {text[position:].strip()!r}')
+        kind = match.lastgroup or ''
+        value = match[kind]
+        if kind == 'number':
+            tokens.append(('value', float(value)))
+        elif kind in ('quoted', 'dquoted'):
+            tokens.append(('value', value))
+        elif kind == 'word':
+            tokens.append(('keyword', value) if value in KEYWORDS else ('value', value))
+        elif kind == 'op':
+            tokens.append(('op', value))
+        else:  # punctuation is its own kind
+            tokens.append((value, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent, `or` binding loosest and `not` tightest.
+
+    or_expr -> and_expr -> not_expr -> comparison or (...)
+    """
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def parse(self) -> Node:
+        node = self.or_expr()
+        if self.position < len(self.tokens):
+            raise ExpressionError(f'Unexpected {self.tokens[self.position][1]!r}')
+        return node
+
+    def peek(self) -> Tuple[str, Value]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ('end', '')
+
+    def take(self, kind: str, value: Value = '') -> Value:
+        token_kind, token_value = self.peek()
+        if token_kind != kind or (value and token_value != value):
+            found = repr(token_value) if token_kind != 'end' else 'the end'
+            raise ExpressionError(f'Expected {value or kind}, found {found}')
+        self.position += 1
+        return token_value
+
+    def accept(self, kind: str, value: Value = '') -> bool:
+        token_kind, token_value = self.peek()
+        if token_kind == kind and (not value or token_value == value):
+            self.position += 1
+            return True
+        return False
+
+    def or_expr(self) -> Node:
+        operands = [self.and_expr()]
+        while self.accept('keyword', 'or'):
+            operands.append(self.and_expr())
+        return operands[0] if len(operands) == 1 else BoolOp('or', tuple(operands))
+
+    def and_expr(self) -> Node:
+        operands = [self.not_expr()]
+        while self.accept('keyword', 'and'):
+            operands.append(self.not_expr())
+        return operands[0] if len(operands) == 1 else BoolOp('and', tuple(operands))
+
+    def not_expr(self) -> Node:
+        if self.accept('keyword', 'not'):
+            return Not(self.not_expr())
+        if self.accept('('):
+            node = self.or_expr()
+            self.take(')')
+            return node
+        return self.comparison()
+
+    def comparison(self) -> Node:
+        field = self.take('value')
+        if not isinstance(field, str) or field not in FIELDS + percentiles.COLUMNS:
+            raise ExpressionError(f'No field {field!r}')
+        if self.accept('keyword', 'in'):
+            self.take('(')
+            values = [self.take('value')]
+            while self.accept(','):
+                values.append(self.take('value'))
+            self.take(')')
+            return In(field, tuple(_check_value(field, v) for v in values))
+        op = str(self.take('op'))
+        if field not in NUMERIC_FIELDS + percentiles.COLUMNS and op not in TEXT_OPERATORS:
+            raise ExpressionError(f'{field} can only be compared with =, != or in')
+        return Compare(field, op, _check_value(field, self.take('value')))
+
+
+def _check_value(field: str, value: Value) -> Value:
+    numeric = field in NUMERIC_FIELDS + percentiles.COLUMNS
+    if numeric and not isinstance(value, float):
+        raise ExpressionError(f'{field} needs a number, not {value!r}')
+    if not numeric:
+        # `record = 11-1` is a word, but `abbrev = 1` would be a number
+        return f'{value:g}' if isinstance(value, float) else str(value)
+    return value
+
+
+def parse(text: str) -> Node:
+    """Parse a filter expression into its tree."""
+    return _Parser(text.lower()).parse()
+
+
+# Compiling the tree to functions of a table
+def _column(table: KenPomTable, field: str) -> Any:
+    if field in percentiles.COLUMNS:
+        return percentiles.percentiles_for(table).columns[field]
+    return table.vector(field)
+
+
+def _is_list(mask: Mask) -> bool:
+    return isinstance(mask, list)
+
+
+def _compare(node: Compare) -> Callable[[KenPomTable], Mask]:
+    field, compare, value = node.field, OPERATORS[node.op], node.value
+    if field not in NUMERIC_FIELDS + percentiles.COLUMNS:  # text, = or !=
+        return _member(In(field, (value,)), negate=node.op == '!=')
+
+    optional = field in OPTIONAL_FIELDS
+
+    def mask(table: KenPomTable) -> Mask:
+        column = _column(table, field)
+        if not is_ndarray(column):
+            if optional:
+                return [v != MISSING and compare(v, value) for v in column]
+            return [compare(v, value) for v in column]
+        matches = compare(column, value)
+        return matches & (column != MISSING) if optional else matches
+
+    return mask
+
+
+def _member(node: In, negate: bool = False) -> Callable[[KenPomTable], Mask]:
+    field, values = node.field, node.values
+
+    def mask(table: KenPomTable) -> Mask:
+        wanted: Set[Any]
+        if field in CATEGORICAL_FIELDS:
+            column, wanted = table.vector(field), {table.conf_code(str(v)) for v in values}
+        elif field in NUMERIC_FIELDS + percentiles.COLUMNS:
+            column, wanted = _column(table, field), set(values)
+            if field in OPTIONAL_FIELDS:
+                wanted.discard(MISSING)
+        else:
+            column, wanted = table.column(field), {str(v) for v in values}
+            return [(v.lower() in wanted) != negate for v in column]
+
+        if is_ndarray(column):
+            return load_numpy().isin(column, list(wanted), invert=negate)
+        return [(v in wanted) != negate for v in column]
+
+    return mask
+
+
+def _not(node: Not) -> Callable[[KenPomTable], Mask]:
+    operand = _compile(node.operand)
+
+    def mask(table: KenPomTable) -> Mask:
+        result = operand(table)
+        return [not m for m in result] if _is_list(result) else ~result
+
+    return mask
+
+
+def _bool_op(node: BoolOp) -> Callable[[KenPomTable], Mask]:
+    operands = [_compile(operand) for operand in node.operands]
+    is_and = node.op == 'and'
+
+    def mask(table: KenPomTable) -> Mask:
+        result = operands[0](table)
+        for operand in operands[1:]:
+            other = operand(table)
+            if _is_list(result) and _is_list(other):
+                pairs = zip(result, other)
+                result = [a and b for a, b in pairs] if is_and else [a or b for a, b in pairs]
+            else:
+                np = load_numpy()
+                result = (np.logical_and if is_and else np.logical_or)(result, other)
+        return result
+
+    return mask
+
+
+def _compile(node: Node) -> Callable[[KenPomTable], Mask]:
+    if isinstance(node, Compare):
+        return _compare(node)
+    if isinstance(node, In):
+        return _member(node)
+    if isinstance(node, Not):
+        return _not(node)
+    return _bool_op(node)
+
+
+class Expression:
+    """A compiled filter expression, ready to run against any table."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tree = parse(text)
+        self._mask = _compile(self.tree)
+
+    def __repr__(self):
+        return f'<Expression {self.text!r}>'
+
+    def mask(self, table: KenPomTable) -> Mask:
+        return self._mask(table)
+
+    def rows(self, table: KenPomTable) -> List[int]:
+        """Rows matching the expression, in page order."""
+        if isinstance(self.tree, Compare) and self.tree.field == 'seed':
+            # A lone `seed<=4` is a range of the snapshot's sorted seeds
+            return index_for(table).seeds(self.tree.op, float(self.tree.value))
+        mask = self._mask(table)
+        if _is_list(mask):
+            return [i for i, matches in enumerate(mask) if matches]
+        return load_numpy().flatnonzero(mask).tolist()
+
+
+@functools.lru_cache(maxsize=256)
+def compile_filter(text: str) -> Expression:
+    """Return the compiled expression for `text`, compiled once."""
+    return Expression(text)
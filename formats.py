@@ -0,0 +1,110 @@
+"""Machine-readable output: JSON Lines, CSV or Arrow IPC.
+
+These are for piping into other tools, so unlike the console table they carry
+all the fields and no header or footer text. Rows are written in batches, one
+`write` call per batch, straight from a `KenPomTable`'s columns.
+
+Arrow needs `pyarrow`, which is optional; the as-of text goes into the schema
+metadata there.
+"""
+import csv
+import io
+from itertools import islice
+import json
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import metrics
+from table import as_table, FIELDS, KenPomData, KenPomTable, MISSING, NUMERIC_FIELDS
+from table import OPTIONAL_FIELDS
+
+FORMATS = ('table', 'jsonl', 'csv', 'arrow')
+BATCH_ROWS = 256
+
+
+class FormatError(ValueError):
+    """Raised when an output format can't be used."""
+
+
+def _column(table: KenPomTable, name: str) -> Any:
+    """A field's values, `conf` decoded and None for missing."""
+    column = table.column(name)
+    if name == 'conf':
+        return [table.conf_labels[c] for c in column]
+    if name in OPTIONAL_FIELDS:
+        return [None if v == MISSING else v for v in column]
+    return column
+
+
+def _columns(table: KenPomTable) -> List[Any]:
+    """Each field's values in `FIELDS` order, see `_column`."""
+    return [_column(table, f) for f in FIELDS]
+
+
+def row_batches(data: KenPomData, batch_rows: int = BATCH_ROWS) -> Iterator[List[Tuple]]:
+    """Yield lists of up to `batch_rows` rows, as tuples."""
+    rows = zip(*_columns(as_table(data)))
+    while batch := list(islice(rows, batch_rows)):
+        yield batch
+
+
+def write_jsonl(data: KenPomData, as_of: str, stream, batch_rows: int = BATCH_ROWS):
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for batch in row_batches(data, batch_rows):
+        stream.write(''.join(dumps(dict(zip(FIELDS, row))) + '\n' for row in batch))
+
+
+def write_csv(data: KenPomData, as_of: str, stream, batch_rows: int = BATCH_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(FIELDS)
+    for batch in row_batches(data, batch_rows):
+        writer.writerows(batch)
+        stream.write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+    stream.write(buffer.getvalue())  # just the header if there were no rows
+
+
+def write_arrow(data: KenPomData, as_of: str, stream, batch_rows: int = BATCH_ROWS):
+    """Write an Arrow IPC stream, `conf` dictionary encoded."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise FormatError('The arrow format needs pyarrow, try `pip install pyarrow`')
+
+    table = as_table(data)
+    types = {'i': pa.int32(), 'd': pa.float64()}
+    arrays = []
+    for name in FIELDS:
+        column = table.column(name)
+        if name in NUMERIC_FIELDS:
+            values = _column(table, name)  # None becomes null
+            arrays.append(pa.array(values, type=types[column.typecode]))
+        elif name == 'conf':
+            codes = pa.array(column, type=pa.uint8())
+            arrays.append(pa.DictionaryArray.from_arrays(codes, table.conf_labels))
+        else:
+            arrays.append(pa.array(column, type=pa.string()))
+    arrow_table = pa.Table.from_arrays(arrays, names=list(FIELDS), metadata={'as_of': as_of})
+
+    sink = getattr(stream, 'buffer', stream)  # Arrow is binary, even on stdout
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        for batch in arrow_table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+    sink.flush()
+
+
+WRITERS: Dict[str, Callable[..., None]] = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'arrow': write_arrow,
+}
+
+
+@metrics.span('write')
+def write(data: KenPomData, as_of: str, fmt: str, stream, batch_rows: int = BATCH_ROWS):
+    """Write `data` to `stream` in one of `FORMATS`."""
+    if fmt not in WRITERS:
+        raise FormatError(f'Unknown format `{fmt}`, expected one of {tuple(WRITERS)}')
+    WRITERS[fmt](data, as_of, stream, batch_rows)
+    stream.flush()
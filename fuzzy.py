@@ -0,0 +1,150 @@
+"""Typo-tolerant lookups of school names, abbrevs and conferences.
+
+`filter_data` matches names by substring and abbrevs and conferences exactly,
+so "gonzga" or "virgina tech" used to find nothing. Terms that match nothing
+are looked up here instead, in two structures built once per process:
+
+* a trigram index over school names, scored by the Dice coefficient of the
+  padded trigrams, which shrugs off a dropped, doubled or swapped letter
+* abbrevs and conference names, too short for trigrams, indexed by every
+  string one deletion away from them (a symmetric delete index), to find
+  those within one edit of a term without comparing it to each of them
+
+A term close enough to exactly one thing is corrected to it; otherwise the
+closest few are offered as suggestions. Either way a lookup only scores the
+handful of candidates sharing a trigram or a deletion with it, well under a
+millisecond, so it can run on every prompt and request.
+"""
+import functools
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from datastructures import CONF_NAMES, SCHOOL_ABBREVS, SCHOOL_NAMES
+
+# A name needs a Dice score this good to be suggested (an abbrev or conf must
+# be within one edit)
+MIN_SCORE = 0.4
+# To be corrected without asking, a term must score this well and beat the
+# runner up by a clear margin
+CORRECT_SCORE = 0.6
+CORRECT_MARGIN = 0.1
+SUGGESTIONS = 5
+
+
+class Suggestion(NamedTuple):
+    text: str  # lower case, as it would be typed in a filter
+    kind: str  # `name`, `abbrev` or `conf`
+    score: float  # 1.0 for an exact match
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f'  {text} '
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance, the single character edits `a` to `b`."""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            )
+        previous = current
+    return previous[-1]
+
+
+def _deletes(word: str) -> Set[str]:
+    """`word` and every string one deletion away from it."""
+    return {word} | {word[:i] + word[i + 1 :] for i in range(len(word))}
+
+
+class FuzzyIndex:
+    """Names, abbrevs and conferences, indexed for near misses."""
+
+    def __init__(self, names: Iterable[str], abbrevs: Iterable[str], confs: Iterable[str]):
+        self.names = sorted({n.lower() for n in names})
+        # Newline separated, so "is this a substring of any name" is one search
+        self._all_names = '\n'.join(self.names)
+        self._by_trigram: Dict[str, List[int]] = {}
+        self._trigram_counts = []
+        for i, name in enumerate(self.names):
+            grams = _trigrams(name)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._by_trigram.setdefault(gram, []).append(i)
+
+        self.kinds = {a.lower(): 'abbrev' for a in abbrevs}
+        self.kinds.update((c.lower(), 'conf') for c in confs)
+        # Two strings within one edit share a string of at most one deletion
+        # from each, so look codes up by those
+        self._by_delete: Dict[str, Set[str]] = {}
+        for code in self.kinds:
+            for variant in _deletes(code):
+                self._by_delete.setdefault(variant, set()).add(code)
+        self._longest_code = max(map(len, self.kinds), default=0)
+
+    def known(self, term: str) -> bool:
+        """Whether `term` already matches something as it is.
+
+        That is, it's an abbrev, a conf or part of a name.
+        """
+        return term in self.kinds or ('\n' not in term and term in self._all_names)
+
+    def suggest(self, term: str, limit: int = SUGGESTIONS) -> List[Suggestion]:
+        """The closest names, abbrevs and confs to `term`."""
+        term = term.strip().lower()
+        if not term:
+            return []
+        suggestions = self._similar_names(term) + self._similar_codes(term)
+        suggestions.sort(key=lambda s: (-s.score, s.text))
+        unique: Dict[str, Suggestion] = {}  # e.g. `duke` is a name and an abbrev
+        for suggestion in suggestions:
+            unique.setdefault(suggestion.text, suggestion)
+        return list(unique.values())[:limit]
+
+    def _similar_codes(self, term: str) -> List[Suggestion]:
+        if len(term) > self._longest_code + 1:  # more than one edit from every code
+            return []
+        candidates: Set[str] = set()
+        for variant in _deletes(term):
+            candidates.update(self._by_delete.get(variant, ()))
+        suggestions = []
+        for code in candidates:
+            distance = edit_distance(term, code)
+            # One edit of a two letter code is half of it, too big a change
+            if distance == 0 or (distance == 1 and len(code) > 2):
+                score = 1 - distance / max(len(term), len(code))
+                suggestions.append(Suggestion(code, self.kinds[code], score))
+        return suggestions
+
+    def _similar_names(self, term: str) -> List[Suggestion]:
+        grams = _trigrams(term)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for i in self._by_trigram.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        suggestions = []
+        for i, count in shared.items():
+            score = 2 * count / (len(grams) + self._trigram_counts[i])
+            if score >= MIN_SCORE:
+                suggestions.append(Suggestion(self.names[i], 'name', score))
+        return suggestions
+
+    def correct(self, term: str) -> Optional[Suggestion]:
+        """What `term` was surely meant to be, if anything.
+
+        Only if it's close to one thing and only one.
+        """
+        suggestions = self.suggest(term, 2)
+        if not suggestions or suggestions[0].score < CORRECT_SCORE:
+            return None
+        if len(suggestions) > 1 and suggestions[0].score - suggestions[1].score < CORRECT_MARGIN:
+            return None
+        return suggestions[0]
+
+
+@functools.lru_cache(maxsize=1)
+def default_index() -> FuzzyIndex:
+    """The index over every D1 school and conference, built once."""
+    return FuzzyIndex(SCHOOL_NAMES, SCHOOL_ABBREVS, CONF_NAMES)
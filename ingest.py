@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""Backfill an archive from saved KenPom front pages, in parallel.
+
+    python ingest.py ARCHIVE pages/             # a directory of .html files
+    python ingest.py ARCHIVE season-2023.tar.gz
+
+Each page is dated from a YYYY-MM-DD (or YYYYMMDD) in its file name, falling
+back to its modification time. Pages are parsed across a process pool and each
+one's snapshot is added to the archive (see archive.py). For every file we
+report the team rows dropped for not having `DATA_ROW_COL_COUNT` cells and the
+school names missing from `SCHOOL_DATA_BY_NAME`, so page layout changes over
+the seasons show up rather than silently thinning out the data.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import datetime
+import json
+import os
+from pathlib import Path
+import re
+import sys
+import tarfile
+from typing import Deque, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from archive import Archive
+from kenpom import parse_data, ParseReport
+import snapshot
+
+PAGE_SUFFIXES = ('.html', '.htm')
+_DATE_PATTERN = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+
+Page = Tuple[str, float, Union[Path, bytes]]  # name, mtime, path or contents
+
+
+class FileReport(NamedTuple):
+    name: str
+    date: datetime.date
+    rows: int
+    skipped_rows: List[List[str]]
+    unmatched_names: List[str]
+    payload: bytes = b''  # the parsed snapshot, see `snapshot.dumps`
+    error: str = ''
+    added: bool = False
+
+
+def page_date(name: str, mtime: float) -> datetime.date:
+    match = _DATE_PATTERN.search(Path(name).name)
+    if match:
+        try:
+            return datetime.date(*map(int, match.groups()))
+        except ValueError:  # eight digits that aren't a date
+            pass
+    return datetime.date.fromtimestamp(mtime)
+
+
+def pages(source: Path) -> Iterator[Page]:
+    """Yield the saved pages in a directory or tarball, by name."""
+    if source.is_dir():
+        for path in sorted(p for p in source.rglob('*') if p.suffix in PAGE_SUFFIXES):
+            yield str(path.relative_to(source)), path.stat().st_mtime, path
+        return
+
+    with tarfile.open(source) as tar:
+        members = sorted(
+            (m for m in tar if m.isfile() and m.name.endswith(PAGE_SUFFIXES)),
+            key=lambda m: m.name,
+        )
+        for member in members:
+            f = tar.extractfile(member)
+            if f is not None:
+                yield member.name, member.mtime, f.read()
+
+
+def parse_page(page: Page, parser: str = 'stream') -> FileReport:
+    """Parse one page into a snapshot, noting what was dropped.
+
+    Runs in a worker.
+    """
+    name, mtime, content = page
+    date = page_date(name, mtime)
+    try:
+        raw = content.read_bytes() if isinstance(content, Path) else content
+        report = ParseReport([], [])
+        table, as_of = parse_data(raw.decode('utf-8', 'replace'), parser, True, report)
+    except Exception as e:  # one bad file shouldn't sink a whole backfill
+        return FileReport(name, date, 0, [], [], error=f'{type(e).__name__}: {e}')
+
+    rows = len(table)
+    if not rows:
+        return FileReport(name, date, 0, *report, error='no team rows found')
+    return FileReport(name, date, rows, *report, payload=snapshot.dumps(table, as_of))
+
+
+def parse_pages(
+    source: Path, parser: str = 'stream', workers: Optional[int] = None
+) -> Iterator[FileReport]:
+    """Parse every page in `source` across a process pool.
+
+    Only a few pages per worker are in flight at once, so a tarball of several
+    seasons never has to fit in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        in_flight: Deque['Future[FileReport]'] = deque()
+        for page in pages(source):
+            in_flight.append(pool.submit(parse_page, page, parser))
+            if len(in_flight) >= workers * 4:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def ingest(
+    archive: Archive, source: Path, parser: str = 'stream', workers: Optional[int] = None
+) -> Iterator[FileReport]:
+    """Add each page in `source` to `archive`, reporting on each."""
+    for report in parse_pages(source, parser, workers):
+        if report.payload:
+            report = report._replace(added=archive.append_snapshot(report.payload, report.date))
+        yield report
+
+
+def _summary(report: FileReport) -> str:
+    if report.error:
+        status = f'error, {report.error}'
+    else:
+        status = 'added' if report.added else 'already archived'
+    lines = [f'{report.date}  {report.name}: {report.rows} rows, {status}']
+    for row in report.skipped_rows:
+        lines.append(f'    skipped row with {len(row)} cells: {" | ".join(row[:4])} ...')
+    for name in report.unmatched_names:
+        lines.append(f'    unknown school name: {name}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill an archive from saved KenPom pages.')
+    parser.add_argument('archive', type=Path, help='archive file, created if need be')
+    parser.add_argument('source', type=Path, help='directory or tarball of saved pages')
+    parser.add_argument(
+        '--parser', choices=('soup', 'stream'), default='stream', help='defaults to %(default)s'
+    )
+    parser.add_argument(
+        '--workers', type=int, help='processes to parse with, defaults to all CPUs'
+    )
+    parser.add_argument(
+        '--report', type=Path, metavar='FILE', help='also write the per file reports as JSON'
+    )
+    args = parser.parse_args()
+
+    reports = []
+    with Archive(args.archive) as archive:
+        for report in ingest(archive, args.source, args.parser, args.workers):
+            print(_summary(report))
+            reports.append(report)
+
+    dropped = sum(len(r.skipped_rows) + len(r.unmatched_names) for r in reports)
+    errors = sum(1 for r in reports if r.error)
+    added = sum(1 for r in reports if r.added)
+    print(f'\n{added} of {len(reports)} pages added, {dropped} rows dropped, {errors} errors')
+    if args.report:
+        fields = [f for f in FileReport._fields if f != 'payload']
+        rows = [{f: getattr(r, f) for f in fields} for r in reports]
+        args.report.write_text(json.dumps(rows, indent=2, default=str) + '\n')
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
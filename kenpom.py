@@ -8,15 +8,18 @@ TODO:
   pretty useful (lacks, tempo, luck, SOS).
 """
 import argparse
+import functools
+import importlib.util
+import json
 import logging
+from pathlib import Path
+import re
 import sys
-from typing import List, Tuple
+import textwrap
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, TYPE_CHECKING
 from urllib.parse import unquote_plus
 
-from bs4 import BeautifulSoup, SoupStrainer
-from cachetools import TTLCache, cached
-import requests
-
+from archive import Archive
 from datastructures import (
     CONF_NAMES,
     KenPom,
@@ -25,6 +28,27 @@ from datastructures import (
     SCHOOL_DATA_BY_ABBREV,
     SCHOOL_DATA_BY_NAME,
 )
+import conferences
+import expressions
+import formats
+import fuzzy
+import matchup
+import metrics
+from pagecache import default_cache_dir, FetchResult, SnapshotCache
+import percentiles
+import similar
+import snapshot
+from query import index_for, parse_sort, sort_places, sort_rows, sort_values, SortKey
+from refresher import BackgroundRefresher, RefreshError
+import repl
+from table import as_table, KenPomData, KenPomTable, KenPomTableBuilder
+
+if TYPE_CHECKING:
+    from cachetools import TTLCache
+
+# The HTML (bs4, lxml) and HTTP (requests) stacks, and cachetools, are imported
+# where they're used: a run answered from the on-disk cache never needs them and
+# importing them is most of our start up time.
 
 log = logging.getLogger(__name__)
 
@@ -32,25 +56,122 @@ URL = 'https://kenpom.com/'
 NUM_SCHOOLS = 363  # Total number of NCAA D1 schools
 DATA_ROW_COL_COUNT = 22  # Number of data elements in tr elements w/ data we want
 HEADER_LEN = 37  # Number of `-` chars to print underneath the output header text
+CONSOLE_FIELDS = ('name', 'abbrev', 'rank', 'off_rank', 'def_rank', 'record', 'conf')
+
+# "Boise St. 10" in tourney mode: the name, then the seed if there is one
+_SCHOOL_NAME = re.compile(r'(.*?)(?:\s+(\d+))?')
 CACHE_IN_SECS = 600
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:102.0) ' 'Gecko/20100101 Firefox/102.0',
+}
+# Seconds to connect, then between bytes, so a stalled server can't hang a refresh
+REQUEST_TIMEOUT = (10, 30)
 
 
 def main():
     """Get args, fetch data, filter data, display data."""
     args = parse_args()
+    profile_sink: Optional[metrics.Sink] = None
+    if args.profile_jsonl:
+        profile_sink = metrics.JsonLines(args.profile_jsonl)
+    elif args.profile:
+        profile_sink = metrics.stderr_summary
+
+    if args.serve:
+        # Imported here, server.py builds on this module
+        from server import serve
+
+        serve(lambda: get_data(args), args.host, args.port)
+        return
+
+    if args.matchup:
+        as_of, raw_data = get_data(args)
+        write_matchup(raw_data, as_of, args.matchup, args.format)
+        if profile_sink:
+            metrics.flush(profile_sink)
+        return
+
+    if args.conf_summary:
+        as_of, raw_data = get_data(args)
+        names, _ = _get_filters(args.filter)
+        summaries = conferences.select(conferences.summary_for(raw_data), CONF_NAMES & set(names))
+        conferences.write(summaries, as_of, args.format, sys.stdout, args.indent)
+        if profile_sink:
+            metrics.flush(profile_sink)
+        return
+
+    if args.similar:
+        as_of, raw_data = get_data(args)
+        team, *k = args.similar
+        data, meta_data = similar_data(raw_data, team, int(k[0]) if k else similar.DEFAULT_K)
+        if args.stats:
+            meta_data['stats'] = percentiles.console_columns(raw_data, data, args.stats)
+        if args.format == 'table':
+            write_to_console(data, meta_data, as_of, args.indent)
+        else:
+            formats.write(data, as_of, args.format, sys.stdout)
+        if profile_sink:
+            metrics.flush(profile_sink)
+        return
+
+    if args.batch:
+        # Imported here, batch.py builds on this module
+        from batch import read_filters, run_batch
+
+        filters = read_filters(args.batch)
+        as_of, raw_data = get_data(args)
+        outputs = run_batch(raw_data, as_of, filters, args.format, args.indent, args.sort)
+        for output in outputs:
+            sys.stdout.write(output)
+        if profile_sink:
+            metrics.flush(profile_sink)
+        return
+
     if args.filter:
         user_input = args.filter
     else:
         user_input = get_input(args.indent)
 
+    # In the interactive loop, refresh data in the background and answer from
+    # the last good copy, rather than blocking a prompt on a slow fetch.
+    refresher = None
+    if not args.only_once and not args.snapshot:
+        refresher = BackgroundRefresher(
+            lambda revalidate: get_data(args, revalidate), CACHE_IN_SECS
+        )
+        refresher.start()
+
+    prompt = None if args.only_once else repl.Prompt()
     while user_input not in ('q', 'quit', 'exit'):
-        as_of, raw_data = fetch_and_parse_data()
-        data, meta_data = filter_data(raw_data, user_input)
-        write_to_console(data, meta_data, as_of, args.indent)
+        if user_input.startswith(':'):
+            message = repl.run_command(user_input, args, refresher and refresher.refresh)
+            print(textwrap.indent(f'\n{message}', args.indent * ' '))
+            user_input = 'quit' if args.only_once else get_input(args.indent, prompt)
+            continue
+
+        try:
+            if refresher:
+                as_of, raw_data = refresher.get()
+                if stale_note := refresher.stale_note():
+                    as_of = f'{as_of}  [{stale_note}]'
+            else:
+                as_of, raw_data = get_data(args)
+            data, meta_data = filter_data(raw_data, user_input, args.sort)
+        except (RefreshError, expressions.ExpressionError) as e:
+            print(f'\n{args.indent * " "}{e}')
+        else:
+            if args.stats:
+                meta_data['stats'] = percentiles.console_columns(raw_data, data, args.stats)
+            if args.format == 'table':
+                write_to_console(data, meta_data, as_of, args.indent)
+            else:
+                formats.write(data, as_of, args.format, sys.stdout)
+        if profile_sink:
+            metrics.flush(profile_sink)
         if args.only_once:
             user_input = 'quit'
         else:
-            user_input = 'quit' if not args.filter else get_input(args.indent)
+            user_input = 'quit' if not args.filter else get_input(args.indent, prompt)
 
 
 def parse_args():
@@ -69,6 +190,8 @@ def parse_args():
     acc,sec  List all teams from the ACC and SEC conferences
     vt,wof   Compare teams by abbrev: Virginia Tech and Wofford
     Valley   List all teams with `valley` in the school name
+    seed<=4  List tourney teams seeded 1 through 4
+    defense_pct>=90  List teams in the top 10%% of D1 on defense
 
     School names with spaces in them can be quoted or use the + sign in
     lieu of a space. That is, both of the following will work.
@@ -95,31 +218,206 @@ def parse_args():
         action='store_true',
         help='run once and quit, bypassing the interactive loop',
     )
-    return parser.parse_args()
+    parser.add_argument(
+        '--sort',
+        type=_sort_arg,
+        metavar='FIELD[,FIELD]',
+        help='order teams by these fields rather than rank, a leading - sorts high to low,'
+        ' e.g. --sort=-tempo',
+    )
+    parser.add_argument(
+        '--stats',
+        choices=percentiles.KINDS,
+        help='add percentile ranks (pct) or z-scores (z) of efficiency, tempo, luck and SOS'
+        ' to the console table, higher is better',
+    )
+    parser.add_argument(
+        '--batch',
+        type=argparse.FileType('r'),
+        metavar='FILE',
+        help='run each filter in FILE (one per line, - for stdin) against one copy of'
+        ' the data, then quit',
+    )
+    parser.add_argument(
+        '--matchup',
+        metavar='A,B',
+        help='predict the score and win probability of a neutral court game, e.g. vt,wof',
+    )
+    parser.add_argument(
+        '--conf-summary',
+        action='store_true',
+        help='summarize each conference (or just those named in the filter): team count,'
+        ' efficiency and SOS averages and spreads, best and worst team',
+    )
+    parser.add_argument(
+        '--similar',
+        nargs='+',
+        metavar=('TEAM', 'K'),
+        help=f'list TEAM and the K (default {similar.DEFAULT_K}) teams with the most similar'
+        ' efficiencies, tempo, luck and schedule strength, nearest first',
+    )
+    parser.add_argument(
+        '--format',
+        choices=formats.FORMATS,
+        default='table',
+        help='print the console table (the default), or every field as JSON Lines, CSV'
+        ' or an Arrow IPC stream (needs pyarrow) for piping into other tools',
+    )
+    parser.add_argument(
+        '--parser',
+        choices=tuple(PARSERS),
+        default='stream',
+        help='HTML parser to use, defaults to the single-pass `stream` parser',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=Path,
+        metavar='DIR',
+        default=default_cache_dir(),
+        help='keep the page and parsed data here between runs, defaults to %(default)s',
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='cache_dir',
+        action='store_const',
+        const=None,
+        help='always fetch and parse the page, ignoring the on-disk cache',
+    )
+    parser.add_argument(
+        '--snapshot',
+        type=Path,
+        metavar='FILE',
+        help='read data from a snapshot file (see --save-snapshot) rather than KenPom',
+    )
+    parser.add_argument(
+        '--save-snapshot',
+        type=Path,
+        metavar='FILE',
+        help='save the fetched data to a compact binary snapshot file',
+    )
+    parser.add_argument(
+        '--archive',
+        type=Path,
+        metavar='FILE',
+        help='add the data to a snapshot archive, dated by its as-of line, see archive.py for'
+        ' queries',
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='after each query, summarize on stderr how long each stage took and count'
+        ' cache hits and dropped rows',
+    )
+    parser.add_argument(
+        '--profile-jsonl',
+        type=Path,
+        metavar='FILE',
+        help='like --profile, but append each summary to FILE as a line of JSON',
+    )
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='serve filters as JSON over HTTP, e.g. http://127.0.0.1:8080/teams?q=acc',
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='--serve address, %(default)s')
+    parser.add_argument('--port', type=int, default=8080, help='--serve port, %(default)s')
+    args = parser.parse_args()
+    if args.matchup and (args.matchup.count(',') != 1 or args.format not in ('table', 'jsonl')):
+        parser.error('--matchup takes two teams, A,B, and prints a table or jsonl')
+    if args.conf_summary and args.format == 'arrow':
+        parser.error('--conf-summary prints a table, jsonl or csv')
+    if args.similar and (len(args.similar) > 2 or not all(k.isdigit() for k in args.similar[1:])):
+        parser.error('--similar takes a team and optionally how many like it to list, e.g. vt 5')
+    if args.batch and args.format == 'arrow':
+        parser.error("--batch can't delimit queries in an arrow stream, try jsonl or csv")
+    if args.format == 'arrow' and not importlib.util.find_spec('pyarrow'):
+        parser.error('--format arrow needs pyarrow, try `pip install pyarrow`')
+    return args
+
+
+def _sort_arg(value: str) -> List[SortKey]:
+    try:
+        return parse_sort(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 
-@cached(cache=TTLCache(maxsize=20000, ttl=CACHE_IN_SECS))
-def fetch_and_parse_data():
+def get_data(args: argparse.Namespace, revalidate: bool = False) -> Tuple[str, KenPomData]:
+    """Load data from a snapshot file if asked to, else KenPom.
+
+    With `revalidate` we skip our caches' freshness checks and ask KenPom if the
+    page changed (cheap if it hasn't), as the background refresher does.
+    """
+    if args.snapshot:
+        table, as_of = snapshot.load(args.snapshot)
+        return as_of, table
+
+    if revalidate:
+        as_of, raw_data = _fetch_and_parse_data(args.parser, args.cache_dir, revalidate=True)
+    elif args.only_once:  # no later call to share an in-memory copy with
+        as_of, raw_data = _fetch_and_parse_data(args.parser, args.cache_dir)
+    else:
+        as_of, raw_data = fetch_and_parse_data(args.parser, args.cache_dir)
+    if args.save_snapshot:
+        snapshot.dump(args.save_snapshot, raw_data, as_of)
+    if args.archive:
+        with Archive(args.archive) as archive:
+            archive.append(raw_data, as_of)
+    return as_of, raw_data
+
+
+@functools.lru_cache(maxsize=None)
+def _memory_cache() -> 'TTLCache':
+    from cachetools import TTLCache
+
+    return TTLCache(maxsize=20000, ttl=CACHE_IN_SECS)
+
+
+def fetch_and_parse_data(parser: str = 'stream', cache_dir: Optional[Path] = None):
     """Convenience method that allows us to cache results.
 
     Caching the results allow us to let a long-running process (such as PyTo on
     the phone) get relatively up-to-date results. Note that as of 2020-02-07 the
     total size of raw data was 18500 bytes, so we may need to double-check this
     after each season to ensure Kenpom hasn't dumped more data.
+
+    With a `cache_dir` the page and its parsed snapshot also persist on disk, so
+    a fresh process (think `--once` from cron) usually just reads a file.
     """
-    page_content = fetch_content(URL)
-    raw_data, as_of = parse_data(page_content)
-    return as_of, raw_data
+    cache, key = _memory_cache(), (parser, cache_dir)
+    result = cache.get(key)
+    metrics.count('cache.memory.misses' if result is None else 'cache.memory.hits')
+    if result is None:
+        result = cache[key] = _fetch_and_parse_data(parser, cache_dir)
+    return result
+
+
+def _fetch_and_parse_data(
+    parser: str = 'stream', cache_dir: Optional[Path] = None, revalidate: bool = False
+) -> Tuple[str, KenPomData]:
+    """The uncached work behind `fetch_and_parse_data`."""
+
+    def parse(page_content: str) -> Tuple[str, KenPomData]:
+        raw_data, as_of = parse_data(page_content, parser, as_table=True)
+        return as_of, raw_data
+
+    if cache_dir is None:
+        return parse(fetch_content(URL))
+    return SnapshotCache(cache_dir, CACHE_IN_SECS).fetch_and_parse(
+        URL, fetch_page, parse, revalidate
+    )
 
 
-def get_input(indent: int) -> str:
+def get_input(indent: int, prompt: Optional['repl.Prompt'] = None) -> str:
     """Pull args from command-line, or prompt user if no args.
 
-    Keep the user input as a string, we'll type it later.
+    Keep the user input as a string, we'll type it later. With a `prompt`
+    there's line editing, tab completion and history, see repl.py.
     """
     left_pad = indent * ' ' if indent else ''
+    read = prompt.read if prompt else input
     user_input = (
-        input(f'\n{left_pad}Top `n`, abbrev(s), conference(s), or school(s) [25]: ') or '25'
+        read(f'\n{left_pad}Top `n`, abbrev(s), conference(s), or school(s) [25]: ') or '25'
     )
 
     # Convert All input to our numerical/str equivalent
@@ -131,79 +429,255 @@ def get_input(indent: int) -> str:
 
 def fetch_content(url: str) -> str:
     """Fetch the HTML content from the URL."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:102.0) ' 'Gecko/20100101 Firefox/102.0',
-    }
-    response = requests.get(url, headers=headers)
+    import requests
+
+    with metrics.span('fetch'):
+        response = requests.get(url, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
     return response.content.decode('utf-8')
 
 
-def parse_data(html_content: str) -> Tuple[KenPomDict, str]:
+def fetch_page(url: str, conditional_headers: Dict[str, str]) -> FetchResult:
+    """Conditionally fetch the URL, a 304 comes back empty."""
+    import requests
+
+    with metrics.span('fetch'):
+        headers = {**REQUEST_HEADERS, **conditional_headers}
+        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return FetchResult(304, headers=response.headers)
+    response.raise_for_status()
+    return FetchResult(response.status_code, response.content.decode('utf-8'), response.headers)
+
+
+class ParseReport(NamedTuple):
+    """What `parse_data` left out of a page.
+
+    Kept so that changes to the page layout show up.
+    """
+
+    skipped_rows: List[List[str]]  # `td` rows without `DATA_ROW_COL_COUNT` children
+    unmatched_names: List[str]  # school names missing from `SCHOOL_DATA_BY_NAME`
+
+
+def parse_data(
+    html_content: str,
+    parser: str = 'stream',
+    as_table: bool = False,
+    report: Optional[ParseReport] = None,
+) -> Tuple[KenPomData, str]:
     """Parse raw HTML into a more useful data structure.
 
     We also append one data item: `abbrev`. This allows us to search by the oft-
     used school abbrev (KU, UK, UMBC, aka score ticker symbol).
+
+    The default `stream` parser walks the page once via lxml parser events and
+    never builds a tree; `soup` is the original BeautifulSoup implementation.
+
+    With `as_table` the rows go straight into a columnar `KenPomTable` (which
+    quacks like a `KenPomDict`) without creating a `KenPom` per row. Pass a
+    `ParseReport` to collect the rows we had to drop.
     """
-    as_of_html = BeautifulSoup(html_content, 'lxml').find_all(class_='update')
-    as_of = as_of_html[0].text.strip() if as_of_html else ''
+    if parser not in PARSERS:
+        raise ValueError(f'Unknown parser `{parser}`, expected one of {tuple(PARSERS)}')
+    with metrics.span(f'parse.{parser}'):
+        rows, as_of = PARSERS[parser](html_content, report.skipped_rows if report else None)
 
     # Join the total # of games and date info onto one line.
     as_of = as_of.replace('\n', ' ')
 
-    soup = BeautifulSoup(html_content, 'lxml', parse_only=SoupStrainer('tr'))
-    data = dict()
-    for elements in soup:
-        # Rely on the fact that relevant rows have distinct, known number of items
-        if len(elements) != DATA_ROW_COL_COUNT:
-            continue
-
-        # Grab just text vales from our html elements
-        text_items = [e.text.strip() for e in elements if hasattr(e, 'text') if e.text.strip()]
-
-        # Tidy up the school name for a variety of oddities, we are passing text_items
-        # into the constructor later, so be sure to update that.
-        text_items[1] = _massage_school_name(text_items[1])
-
-        # Get abbrev to use as data key, allow user to search on this
-        school_data = SCHOOL_DATA_BY_NAME.get(text_items[1].lower(), {})
-        if school_data and school_data.get('abbrev'):
-            school_abbrev = school_data['abbrev']
-            text_items.append(school_abbrev.upper())
-            data[school_abbrev] = KenPom(*text_items)
-        else:
-            log.info(f'Bad data? text_items content: {text_items}')
+    with metrics.span('parse.build'):
+        data: KenPomDict = dict()
+        builder = KenPomTableBuilder() if as_table else None
+        unmatched = 0
+        for text_items in rows:
+            # Tidy up the school name for a variety of oddities, we are passing text_items
+            # into the constructor later, so be sure to update that.
+            text_items[1], seed = _split_school_name(text_items[1])
+
+            # Get abbrev to use as data key, allow user to search on this
+            school_data = SCHOOL_DATA_BY_NAME.get(text_items[1].lower(), {})
+            if school_data and school_data.get('abbrev'):
+                school_abbrev = school_data['abbrev']
+                values: List[Any] = [*text_items, school_abbrev.upper(), seed]
+                if builder:
+                    builder.append(values)
+                else:
+                    data[school_abbrev] = KenPom.from_text_items(values)
+            else:
+                unmatched += 1
+                log.info(f'Bad data? text_items content: {text_items}')
+                if report:
+                    report.unmatched_names.append(text_items[1])
+        metrics.count('rows.unmatched_name', unmatched)
+
+        if builder:
+            return builder.build(), as_of
+        return data, as_of
+
+
+def _soup_rows(
+    html_content: str, skipped_rows: Optional[List[List[str]]] = None
+) -> Tuple[List[List[str]], str]:
+    """Find the as-of text and data rows with two BeautifulSoup passes.
+
+    Rows of `td` cells (not headers) without the expected number of children are
+    added to `skipped_rows`.
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    with metrics.span('parse.soup.as_of'):
+        as_of_html = BeautifulSoup(html_content, 'lxml').find_all(class_='update')
+        as_of = as_of_html[0].text.strip() if as_of_html else ''
+
+    with metrics.span('parse.soup.rows'):
+        soup = BeautifulSoup(html_content, 'lxml', parse_only=SoupStrainer('tr'))
+        rows = []
+        skipped = 0
+        elements: Any  # a `tr` Tag, bs4's stubs only promise a PageElement
+        for elements in soup:
+            # Rely on the fact that relevant rows have distinct, known number of items
+            if len(elements) != DATA_ROW_COL_COUNT:
+                # Header rows (no `td` cells) are expected, only count data rows
+                if not elements.find('td', recursive=False):
+                    continue
+                skipped += 1
+                if skipped_rows is not None:
+                    skipped_rows.append(
+                        [e.text.strip() for e in elements if hasattr(e, 'text') if e.text.strip()]
+                    )
+                continue
+
+            # Grab just text vales from our html elements
+            rows.append([e.text.strip() for e in elements if hasattr(e, 'text') if e.text.strip()])
+    metrics.count('rows.skipped_column_count', skipped)
+    return rows, as_of
+
+
+def _stream_rows(
+    html_content: str, skipped_rows: Optional[List[List[str]]] = None
+) -> Tuple[List[List[str]], str]:
+    """Find the as-of text and data rows in a single pass.
+
+    Rows of `td` cells (not headers) without the expected number of children are
+    added to `skipped_rows`.
+    """
+    from lxml import etree
 
-    return data, as_of
+    target = _KenPomTarget(skipped_rows)
+    parser = etree.HTMLParser(target=target)
+    parser.feed(html_content)
+    rows, as_of = parser.close()
+    metrics.count('rows.skipped_column_count', target.skipped)
+    return rows, as_of
 
 
-def _massage_school_name(school_name: str) -> str:
-    """Given a school name, massage the text for various peculiarities.
+class _KenPomTarget:
+    """lxml parser target collecting just the bits we use.
 
-    * Replace the trailing dot of school names like Boise St.
-    * Handle "Tourney Mode" where school names have their seed in the name.
+    Mirrors what the BeautifulSoup parser sees: a `tr` is a data row when it has
+    `DATA_ROW_COL_COUNT` children (text nodes included), and each child is
+    reduced to its stripped text.
     """
 
-    # Replace the trailing dot in `Boise St.` so right-justified text looks better.
-    # ... trust me, it makes a difference.
-    school_name = school_name.replace('.', '')
+    def __init__(self, skipped_rows: Optional[List[List[str]]] = None):
+        self.rows: List[List[str]] = []
+        self.as_of: Optional[str] = None
+        self.skipped = 0  # `td` rows without `DATA_ROW_COL_COUNT` children
+        self.skipped_rows = skipped_rows
+        self._as_of_depth = 0  # > 0 while inside the first `update` element
+        self._as_of_text: List[str] = []
+        self._row_depth = 0  # > 0 while inside a `tr`, 1 == direct children
+        self._row_children = 0
+        self._row_has_cells = False
+        self._row_items: List[str] = []
+        self._child_text: List[str] = []
+        self._in_text_child = False
+
+    def start(self, tag, attrib):
+        if self._as_of_depth:
+            self._as_of_depth += 1
+        elif self.as_of is None and 'update' in attrib.get('class', '').split():
+            self._as_of_depth = 1
+
+        if self._row_depth == 1:
+            self._flush_child()
+            self._row_children += 1
+            self._row_has_cells = self._row_has_cells or tag == 'td'
+            self._row_depth += 1
+        elif self._row_depth:
+            self._row_depth += 1
+        elif tag == 'tr':
+            self._row_depth = 1
+            self._row_children = 0
+            self._row_has_cells = False
+            self._row_items = []
+
+    def end(self, tag):
+        if self._as_of_depth:
+            self._as_of_depth -= 1
+            if not self._as_of_depth:
+                self.as_of = ''.join(self._as_of_text).strip()
+
+        if self._row_depth:
+            self._row_depth -= 1
+            if self._row_depth <= 1:
+                self._flush_child()
+            if not self._row_depth:
+                if self._row_children == DATA_ROW_COL_COUNT:
+                    self.rows.append(self._row_items)
+                elif self._row_has_cells:  # header rows are expected, not counted
+                    self.skipped += 1
+                    if self.skipped_rows is not None:
+                        self.skipped_rows.append(self._row_items)
+
+    def data(self, data):
+        if self._as_of_depth:
+            self._as_of_text.append(data)
+
+        if self._row_depth == 1 and not self._in_text_child:
+            # Bare text directly under the `tr` counts as a child of its own
+            self._flush_child()
+            self._row_children += 1
+            self._in_text_child = True
+        if self._row_depth:
+            self._child_text.append(data)
+
+    def close(self) -> Tuple[List[List[str]], str]:
+        return self.rows, self.as_of or ''
+
+    def _flush_child(self):
+        text = ''.join(self._child_text).strip()
+        if text:
+            self._row_items.append(text)
+        self._child_text = []
+        self._in_text_child = False
+
+
+PARSERS = {
+    'soup': _soup_rows,
+    'stream': _stream_rows,
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def _split_school_name(school_name: str) -> Tuple[str, Optional[int]]:
+    """Given a school name, return it tidied up and any seed.
+
+    * Drop the dots of school names like Boise St. (or St. John's)
+    * Handle "Tourney Mode" where school names have their seed in the name.
 
+    Names hardly change from one refresh to the next, so results are cached.
+    """
     # Who knew! During the NCAA tourney season KenPom puts the tourney seed into
     # the school name. So, while text_items[1] will be "Gonzaga" most of the year,
     # during (and after, till start of next season) text_items[1] will be
     # "Gonzaga 1" since they're a #1 seed.
+    name, seed = _SCHOOL_NAME.fullmatch(school_name).groups()  # type: ignore
 
-    # convert "NC State 1" to ["NC", "State", "1"]
-    name_candidate = school_name.split(' ')
-    try:
-        # Is the last element a number?
-        int(name_candidate[-1])
-
-        # Convert back to a string, minus the trailing number
-        school_name = ' '.join(name_candidate[:-1])
-    except ValueError:
-        pass
-    return school_name
+    # Replace the dots in `Boise St.` so right-justified text looks better.
+    # ... trust me, it makes a difference.
+    return name.replace('.', ''), int(seed) if seed else None
 
 
 def _get_filters(user_input: str) -> Tuple[List[str], int]:
@@ -233,9 +707,30 @@ def _get_filters(user_input: str) -> Tuple[List[str], int]:
         return input_as_list, -1
 
 
-def filter_data(data: KenPomDict, user_input: str) -> Tuple[KenPomDict, MetaData]:
-    """Filter which schools we will display based on user input."""
+@metrics.span('filter')
+def filter_data(
+    data: KenPomData, user_input: str, sort: Optional[List[SortKey]] = None
+) -> Tuple[KenPomData, MetaData]:
+    """Filter which schools we will display based on user input.
+
+    Rows come back in page (rank) order unless `sort` keys are given, see
+    `query.parse_sort`. Input with a comparison or `and`/`or`/`not`/`in` in it
+    is an expression, see expressions.py, and raises `ExpressionError` (a
+    `ValueError`) if it doesn't parse.
+    """
+    sort = sort or []
+    if expressions.is_expression(user_input):
+        expression = expressions.compile_filter(user_input.strip().lower())
+        table = as_table(data)
+        return _filter_rows(data, expression.rows(table), sort)
+
     names, top_filter = _get_filters(user_input)
+    names, fuzzy_meta = _fuzzy_names(names)
+    fuzzy_meta = _applied_corrections(fuzzy_meta, names, top_filter)
+
+    if isinstance(data, KenPomTable):
+        filtered, meta = _filter_table(data, names, top_filter, sort)
+        return filtered, {**meta, **fuzzy_meta}
 
     if top_filter == 0:
         filtered_data = data
@@ -252,6 +747,9 @@ def filter_data(data: KenPomDict, user_input: str) -> Tuple[KenPomDict, MetaData
     else:  # full school name
         filtered_data = {k: v for k, v in data.items() for n in names if n in v.name.lower()}
 
+    if sort:
+        filtered_data = _sort_dict(filtered_data, sort)
+
     # Keep track of the longest school name. We'll need this to handle
     # right-justified formatting in our console output. If there's no
     # filtered_data then we have bogus input, so we need to guard against
@@ -263,22 +761,191 @@ def filter_data(data: KenPomDict, user_input: str) -> Tuple[KenPomDict, MetaData
         'names': names,
         'num_teams': len(filtered_data),
         'top_filter': top_filter,
+        'sort': sort,
+        **fuzzy_meta,
     }
     return filtered_data, meta_data
 
 
+def _fuzzy_names(names: List[str]) -> Tuple[List[str], MetaData]:
+    """Correct terms that match nothing, e.g. `gonzga`.
+
+    Also returns what to tell the user: `corrected` (typed -> used) and, for
+    terms too far from anything to be sure, `suggestions` (typed -> closest).
+    """
+    index = fuzzy.default_index()
+    corrected, suggestions, fixed = {}, {}, []
+    for name in (n.strip() for n in names):
+        if index.known(name):
+            fixed.append(name)
+        elif correction := index.correct(name):
+            # As typed correctly: a name stays a substring of names, so the
+            # usual abbrev > conf > name precedence decides what it finds
+            corrected[name] = correction.text
+            fixed.append(correction.text)
+        else:
+            suggestions[name] = [s.text for s in index.suggest(name)]
+            fixed.append(name)
+
+    meta_data: MetaData = {}
+    if corrected:
+        meta_data['corrected'] = corrected
+    if suggestions:
+        meta_data['suggestions'] = suggestions
+    return fixed, meta_data
+
+
+def _applied_corrections(fuzzy_meta: MetaData, names: List[str], top_filter: int) -> MetaData:
+    """Keep only the corrections to terms the filter precedence used.
+
+    `vt,virgina tech` filters by abbrev, so the corrected name never applied.
+    """
+    if top_filter >= 0:
+        applied: Set[str] = set()
+    elif abbrevs := SCHOOL_DATA_BY_ABBREV.keys() & set(names):
+        applied = abbrevs
+    elif conf_names := CONF_NAMES.intersection(set(names)):
+        applied = conf_names
+    else:  # full school name
+        applied = set(names)
+
+    meta_data = {k: v for k, v in fuzzy_meta.items() if k != 'corrected'}
+    corrected = {
+        old: new for old, new in fuzzy_meta.get('corrected', {}).items() if new in applied
+    }
+    if corrected:
+        meta_data['corrected'] = corrected
+    return meta_data
+
+
+def _filter_table(
+    table: KenPomTable, names: List[str], top_filter: int, sort: List[SortKey]
+) -> Tuple[KenPomTable, MetaData]:
+    """Indexed version of `filter_data`, same precedence rules."""
+    index = index_for(table)
+    rows: Optional[List[int]]
+    if top_filter == 0:
+        rows = None
+
+    elif top_filter > 0:
+        rows = index.top(top_filter)
+
+    elif abbrevs := SCHOOL_DATA_BY_ABBREV.keys() & set(names):
+        rows = index.abbrevs(abbrevs)
+
+    elif conf_names := CONF_NAMES.intersection(set(names)):
+        rows = index.confs(conf_names)
+
+    else:  # full school name
+        rows = index.names(names)
+
+    filtered = _take_sorted(table, rows, sort)
+    meta_data = {
+        'max_name_len': filtered.max_len('name'),
+        'names': names,
+        'num_teams': len(filtered),
+        'top_filter': top_filter,
+        'sort': sort,
+    }
+    return filtered, meta_data
+
+
+def _filter_rows(
+    data: KenPomData, rows: List[int], sort: List[SortKey]
+) -> Tuple[KenPomData, MetaData]:
+    """The teams at `rows`, for stat and expression filters."""
+    filtered: KenPomData
+    if isinstance(data, KenPomTable):
+        filtered = _take_sorted(data, rows, sort)
+        max_name_len = filtered.max_len('name')
+    else:
+        teams = list(data.items())
+        filtered = dict(teams[i] for i in rows)
+        filtered = _sort_dict(filtered, sort) if sort else filtered
+        max_name_len = max((len(v.name) for v in filtered.values()), default=0)
+
+    meta_data = {
+        'max_name_len': max_name_len,
+        'names': [],
+        'num_teams': len(filtered),
+        'top_filter': -1,
+        'sort': sort,
+    }
+    return filtered, meta_data
+
+
+def _take_sorted(
+    table: KenPomTable, rows: Optional[List[int]], sort: List[SortKey]
+) -> KenPomTable:
+    """The table of just `rows`, in `sort` order if given."""
+    if sort:
+        rows = sort_rows(table, rows, sort)
+    return table if rows is None else table.take(rows)
+
+
+def _sort_dict(data: KenPomDict, sort: List[SortKey]) -> KenPomDict:
+    teams = list(data.items())
+    places = [
+        sort_places(sort_values(name, (getattr(v, name) for _, v in teams)), desc)
+        for name, desc in sort
+    ]
+    order = sorted(range(len(teams)), key=lambda i: tuple(p[i] for p in places))
+    return dict(teams[i] for i in order)
+
+
+def similar_data(data: KenPomData, team: str, k: int) -> Tuple[KenPomTable, MetaData]:
+    """`team` and the `k` teams most like it, nearest first."""
+    table = as_table(data)
+    try:
+        row = matchup.find_team(table, team)
+    except KeyError as e:
+        sys.exit(f'No team with abbrev or name {e}')
+    nearest = similar.index_for(table).nearest(row, k)
+    filtered = table.take([row] + [other for other, _ in nearest])
+    meta_data = {
+        'max_name_len': filtered.max_len('name'),
+        'names': [team],
+        'num_teams': len(filtered),
+        'top_filter': 0,
+        'sort': [],
+    }
+    return filtered, meta_data
+
+
+def write_matchup(data: KenPomData, as_of: str, teams: str, fmt: str = 'table'):
+    """Print the predicted result of a game, teams `A,B`."""
+    table = as_table(data)
+    team, opponent = teams.split(',')
+    try:
+        prediction = matchup.predict(table, team, opponent)
+    except KeyError as e:
+        sys.exit(f'No team with abbrev or name {e}')
+    if fmt == 'jsonl':
+        print(json.dumps({**prediction._asdict(), 'margin': prediction.margin}))
+    else:
+        print(f'{matchup.describe(prediction, table)}\n\n{as_of}\n')
+
+
+@metrics.span('write')
 def write_to_console(
-    data: KenPomDict, meta: MetaData, as_of: str, indent: int = 0
-) -> Tuple[KenPomDict, MetaData]:
-    """Dump the data to standard out."""
+    data: KenPomData, meta: MetaData, as_of: str, indent: int = 0, stream=None
+) -> Tuple[KenPomData, MetaData]:
+    """Dump the data to standard out, or `stream`."""
+    stream = stream or sys.stdout
 
     left_pad = indent * ' ' if indent else ''
     str_template = (
         '{left_pad}{team:>{len}}  {abbrev:>5} {rank:>5}  {off_rank:>3} /{def_rank:>4} '
-        '{record:>6} {conf:>5}'
+        '{record:>6} {conf:>5}{extra}\n'
     )
+    # Sorted on fields we don't otherwise show? Add them on the end, then any
+    # `--stats` columns (header -> formatted values, see percentiles.py).
+    extra = [name for name, _ in meta.get('sort', ()) if name not in CONSOLE_FIELDS]
+    stats = meta.get('stats', {})
+    widths = [max(len(name), 6) for name in [*extra, *stats]]
+
     # Header text ...
-    print(
+    lines = [
         str_template.format(
             len=meta['max_name_len'],
             left_pad=left_pad,
@@ -289,14 +956,18 @@ def write_to_console(
             def_rank='Def',
             record='Rec',
             conf='Conf',
-        )
-    )
-    # -----------------------------------
-    print(left_pad + (meta['max_name_len'] + HEADER_LEN) * '-')
+            extra=''.join(f' {name:>{width}}' for name, width in zip([*extra, *stats], widths)),
+        ),
+        # -----------------------------------
+        left_pad + (meta['max_name_len'] + HEADER_LEN + len(widths) + sum(widths)) * '-' + '\n',
+    ]
 
     # Data ...
-    for team in list(data.values()):
-        print(
+    stat_rows = zip(*stats.values())
+    for team in data.values():
+        values = [_or_blank(getattr(team, name)) for name in extra]
+        values += next(stat_rows, ())
+        lines.append(
             str_template.format(
                 len=meta['max_name_len'],
                 left_pad=left_pad,
@@ -307,14 +978,32 @@ def write_to_console(
                 def_rank=team.def_rank,
                 record=team.record,
                 conf=team.conf,
+                extra=''.join(f' {value:>{width}}' for value, width in zip(values, widths)),
             )
         )
+        if len(lines) >= formats.BATCH_ROWS:
+            stream.write(''.join(lines))
+            lines.clear()
+
+    # Typos we corrected or couldn't, see `_fuzzy_names`
+    if corrected := meta.get('corrected'):
+        fixes = ', '.join(f'{new} for {old}' for old, new in corrected.items())
+        lines.append(f'\n{left_pad}Showing {fixes}\n')
+    for term, closest in meta.get('suggestions', {}).items():
+        hint = f', did you mean {" or ".join(closest)}?' if closest else ''
+        lines.append(f'\n{left_pad}Nothing matches {term}{hint}\n')
+
     # Footer (as of date)
-    print(f'\n{left_pad}{as_of}\n')
+    lines.append(f'\n{left_pad}{as_of}\n\n')
+    stream.write(''.join(lines))
 
     return data, meta
 
 
+def _or_blank(value: Any) -> Any:
+    return '' if value is None else value
+
+
 if __name__ == '__main__':
     MAJ, MIN, *_ = sys.version_info
     if MAJ == 3 and MIN < 8:
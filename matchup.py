@@ -0,0 +1,165 @@
+"""Predicted scores, margins and win probabilities from one snapshot.
+
+For teams A and B on a neutral court, with D1 averages for efficiency and tempo:
+
+    possessions = tempo_A * tempo_B / avg_tempo
+    points_A    = (offense_A + defense_B - avg_efficiency) * possessions / 100
+    margin      = points_A - points_B
+    P(A wins)   = Phi(margin / MARGIN_STDDEV)
+
+`predict` answers one matchup. `MatchupMatrix` answers every pairing in the
+snapshot at once, built in one vectorized pass (NumPy when installed) and
+cached on the table, so it is computed once per refresh rather than per query.
+It uses NumPy whatever `table.NUMPY_MIN_ROWS` says: the work grows with the
+square of the rows, so a season's few hundred teams is already worth it.
+"""
+import math
+from typing import Any, NamedTuple, Sequence
+
+from table import KenPomTable, load_numpy
+
+# Spread of actual margins around the predicted one, in points
+MARGIN_STDDEV = 11.0
+
+
+class Prediction(NamedTuple):
+    team: str  # abbrevs
+    opponent: str
+    team_score: float
+    opponent_score: float
+    possessions: float
+    win_probability: float
+
+    @property
+    def margin(self) -> float:
+        return self.team_score - self.opponent_score
+
+
+def _mean(values: Sequence[float]) -> float:
+    return math.fsum(values) / len(values)
+
+
+def _win_probability(margin: float) -> float:
+    return 0.5 * (1 + math.erf(margin / (MARGIN_STDDEV * math.sqrt(2))))
+
+
+def _erf(x: Any) -> Any:
+    """Vectorized erf, NumPy has none.
+
+    Abramowitz & Stegun 7.1.26, error < 1.5e-7.
+    """
+    np = load_numpy()
+    sign, x = np.sign(x), np.abs(x)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (
+        0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429)))
+    )
+    return sign * (1 - poly * np.exp(-x * x))
+
+
+def find_team(table: KenPomTable, team: str) -> int:
+    """Return the row of a team given its abbrev or name.
+
+    Names match without regard to case.
+    """
+    key = team.strip().lower()
+    if key in table:
+        return table.position(key)
+    for i, name in enumerate(table.column('name')):
+        if name.lower() == key:
+            return i
+    raise KeyError(team)
+
+
+def predict(table: KenPomTable, team: str, opponent: str) -> Prediction:
+    """Predict a neutral court game between two teams."""
+    i, j = find_team(table, team), find_team(table, opponent)
+    avg_efficiency, avg_tempo = _mean(table.column('offense')), _mean(table.column('tempo'))
+    offense, defense, tempo = (table.column(f) for f in ('offense', 'defense', 'tempo'))
+
+    possessions = tempo[i] * tempo[j] / avg_tempo
+    team_score = (offense[i] + defense[j] - avg_efficiency) * possessions / 100
+    opponent_score = (offense[j] + defense[i] - avg_efficiency) * possessions / 100
+    abbrevs = table.column('abbrev')
+    return Prediction(
+        abbrevs[i],
+        abbrevs[j],
+        team_score,
+        opponent_score,
+        possessions,
+        _win_probability(team_score - opponent_score),
+    )
+
+
+class MatchupMatrix:
+    """Every pairing in a table, indexed `[team_row][opponent_row]`.
+
+    `scores[i][j]` is what team i scores against team j; `margins` and
+    `win_probabilities` are from team i's side. With NumPy these are 2-D arrays,
+    otherwise lists of lists.
+    """
+
+    def __init__(self, table: KenPomTable):
+        self.table = table
+        offense, defense, tempo = (table.column(f) for f in ('offense', 'defense', 'tempo'))
+        avg_efficiency, avg_tempo = _mean(offense), _mean(tempo)
+
+        np = load_numpy()
+        if np is not None:
+            offense, defense, tempo = (
+                np.asarray(c, dtype='float64') for c in (offense, defense, tempo)
+            )
+            self.possessions = np.outer(tempo, tempo) / avg_tempo
+            self.scores = (
+                (offense[:, None] + defense[None, :] - avg_efficiency) * self.possessions / 100
+            )
+            self.margins = self.scores - self.scores.T
+            self.win_probabilities = 0.5 * (
+                1 + _erf(self.margins / (MARGIN_STDDEV * math.sqrt(2)))
+            )
+            return
+
+        n = len(offense)
+        self.possessions = [[tempo[i] * tempo[j] / avg_tempo for j in range(n)] for i in range(n)]
+        self.scores = [
+            [
+                (offense[i] + defense[j] - avg_efficiency) * self.possessions[i][j] / 100
+                for j in range(n)
+            ]
+            for i in range(n)
+        ]
+        self.margins = [
+            [self.scores[i][j] - self.scores[j][i] for j in range(n)] for i in range(n)
+        ]
+        self.win_probabilities = [list(map(_win_probability, row)) for row in self.margins]
+
+    def predict(self, team: str, opponent: str) -> Prediction:
+        i, j = find_team(self.table, team), find_team(self.table, opponent)
+        abbrevs = self.table.column('abbrev')
+        return Prediction(
+            abbrevs[i],
+            abbrevs[j],
+            float(self.scores[i][j]),
+            float(self.scores[j][i]),
+            float(self.possessions[i][j]),
+            float(self.win_probabilities[i][j]),
+        )
+
+
+def matrix_for(table: KenPomTable) -> MatchupMatrix:
+    """Return the all-pairs matrix for `table`, built once."""
+    return table.derived('matchups', MatchupMatrix)
+
+
+def describe(prediction: Prediction, table: KenPomTable) -> str:
+    """Two lines of text for the console."""
+    names = {a: n for a, n in zip(table.column('abbrev'), table.column('name'))}
+    team, opponent = names[prediction.team], names[prediction.opponent]
+    favorite, chance = (team, prediction.win_probability)
+    if prediction.margin < 0:
+        favorite, chance = opponent, 1 - prediction.win_probability
+    return (
+        f'{team} {prediction.team_score:.0f}, {opponent} {prediction.opponent_score:.0f}'
+        f' ({prediction.possessions:.0f} possessions)\n'
+        f'{favorite} by {abs(prediction.margin):.1f}, {chance:.0%} to win'
+    )
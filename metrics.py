@@ -0,0 +1,137 @@
+"""Timing spans and event counters for the hot paths.
+
+So we can tell whether a slow refresh was the network, the parse or rendering:
+
+    with metrics.span('fetch'):
+        ...
+    metrics.count('rows.unmatched_name')
+
+Everything is recorded into one process-wide registry (spans are per call, not
+per row, so this costs next to nothing). `kenpom.py --profile` sends what each
+query recorded to a sink: a summary on stderr or a JSON line per query. Server
+mode exposes the running totals at `/metrics` in the Prometheus text format.
+"""
+import contextlib
+import json
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List
+
+Report = Dict[str, Any]
+Sink = Callable[[Report], None]
+
+
+class _SpanStats:
+    __slots__ = ('calls', 'seconds', 'max_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class Registry:
+    """Span timings and counters, safe to use from threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: Dict[str, _SpanStats] = {}
+        self._counters: Dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = _SpanStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def report(self) -> Report:
+        """Everything recorded so far, as plain (JSON friendly) data."""
+        with self._lock:
+            return self._report()
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def flush(self, sink: Sink):
+        """Hand what was recorded to `sink`, then start over."""
+        with self._lock:
+            report = self._report()
+            self._spans, self._counters = {}, {}
+        sink(report)
+
+    def _report(self) -> Report:
+        return {
+            'spans': {
+                name: {'calls': s.calls, 'seconds': s.seconds, 'max_seconds': s.max_seconds}
+                for name, s in self._spans.items()
+            },
+            'counters': dict(self._counters),
+        }
+
+
+REGISTRY = Registry()
+span = REGISTRY.span
+count = REGISTRY.count
+report = REGISTRY.report
+reset = REGISTRY.reset
+flush = REGISTRY.flush
+
+
+def stderr_summary(report: Report, stream=None):
+    """Sink printing a small table of spans and counters."""
+    stream = stream or sys.stderr
+    lines: List[str] = []
+    for name, s in sorted(report['spans'].items()):
+        lines.append(
+            f'{name:>24} {s["calls"]:>5} calls {s["seconds"] * 1e3:>10.2f} ms'
+            f' {s["max_seconds"] * 1e3:>10.2f} ms max'
+        )
+    for name, value in sorted(report['counters'].items()):
+        lines.append(f'{name:>24} {value:>5}')
+    if lines:
+        print('\n'.join(lines), file=stream)
+
+
+class JsonLines:
+    """Sink appending one JSON object per report to a file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, report: Report):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'time': time.time(), **report}) + '\n')
+
+
+def prometheus_text(report: Report, prefix: str = 'kenpom') -> str:
+    """Render a report in the Prometheus text exposition format."""
+    spans, counters = report['spans'], report['counters']
+    lines = [
+        f'# TYPE {prefix}_span_calls_total counter',
+        *(f'{prefix}_span_calls_total{{span="{n}"}} {s["calls"]}' for n, s in spans.items()),
+        f'# TYPE {prefix}_span_seconds_total counter',
+        *(f'{prefix}_span_seconds_total{{span="{n}"}} {s["seconds"]}' for n, s in spans.items()),
+        f'# TYPE {prefix}_span_max_seconds gauge',
+        *(f'{prefix}_span_max_seconds{{span="{n}"}} {s["max_seconds"]}' for n, s in spans.items()),
+        f'# TYPE {prefix}_events_total counter',
+        *(f'{prefix}_events_total{{event="{n}"}} {v}' for n, v in counters.items()),
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,172 @@
+"""Persistent, on-disk cache of the KenPom page and its parsed snapshot.
+
+The in-process `TTLCache` in kenpom.py only helps a long-running process. This
+cache survives between runs: while it's fresh we just read the stored snapshot
+back, and once it's stale we revalidate with `If-None-Match`/`If-Modified-Since`.
+A 304, or a 200 whose body hashes the same as the stored page, reuses the stored
+parse rather than paying for the HTML parse again.
+
+The cache is only ever an optimization: a stored snapshot we can't read is a
+miss, and a cache directory we can't write to is logged and otherwise ignored.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+import metrics
+import snapshot
+
+META_FILE = 'meta.json'
+PAGE_FILE = 'page.html'
+SNAPSHOT_FILE = 'snapshot.kps'
+
+log = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> Path:
+    """Return `$XDG_CACHE_HOME/kenpom`, or `~/.cache/kenpom`."""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'kenpom'
+
+
+class FetchResult:
+    """The bits of an HTTP response the cache cares about."""
+
+    def __init__(
+        self, status: int, content: str = '', headers: Optional[Mapping[str, str]] = None
+    ):
+        self.status = status
+        self.content = content
+        self.headers = headers or {}
+
+
+class SnapshotCache:
+    """A directory holding the page and its parsed snapshot."""
+
+    def __init__(self, cache_dir, ttl: float):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.meta: Dict[str, Any] = self._read_meta()
+
+    def _path(self, name: str) -> Path:
+        return self.cache_dir / name
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self._path(META_FILE).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, name: str, content: bytes):
+        """Write a file atomically, never leaving half a cache."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path(f'.{name}.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, self._path(name))
+
+    def _write_meta(self):
+        self._write(META_FILE, json.dumps(self.meta, indent=2).encode('utf-8'))
+
+    def has_snapshot(self, url: str) -> bool:
+        return self.meta.get('url') == url and self._path(SNAPSHOT_FILE).exists()
+
+    def is_fresh(self, url: str) -> bool:
+        """True if our snapshot of `url` is younger than the TTL."""
+        age = time.time() - self.meta.get('fetched_at', 0)
+        return self.has_snapshot(url) and 0 <= age < self.ttl
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Return headers for revalidating our copy of `url`."""
+        if not self.has_snapshot(url):
+            return {}
+        headers = {}
+        if self.meta.get('etag'):
+            headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified'):
+            headers['If-Modified-Since'] = self.meta['last_modified']
+        return headers
+
+    def read_snapshot(self) -> Optional[Tuple[str, Any]]:
+        """Return the stored `(as_of, data)`, None if unreadable.
+
+        An unreadable snapshot is forgotten too, so we fetch the whole page.
+        """
+        try:
+            with metrics.span('cache.disk.read'):
+                data, as_of = snapshot.load(self._path(SNAPSHOT_FILE))
+        except (OSError, snapshot.SnapshotError) as e:
+            log.warning('Ignoring the cached snapshot in %s: %s', self.cache_dir, e)
+            metrics.count('cache.disk.unreadable')
+            self.meta = {}  # so we fetch the whole page, without validators
+            return None
+        return as_of, data
+
+    def revalidated(self, headers: Mapping[str, str]):
+        """Our stored copy is still good, restart the TTL clock."""
+        self.meta['fetched_at'] = time.time()
+        self.meta['etag'] = headers.get('ETag', self.meta.get('etag'))
+        self.meta['last_modified'] = headers.get('Last-Modified', self.meta.get('last_modified'))
+        try:
+            self._write_meta()
+        except OSError as e:
+            log.warning('Could not update the cache in %s: %s', self.cache_dir, e)
+
+    def store(
+        self, url: str, page: str, digest: str, headers: Mapping[str, str], parsed: Tuple[str, Any]
+    ):
+        as_of, data = parsed
+        try:
+            self._write(PAGE_FILE, page.encode('utf-8'))
+            self._write(SNAPSHOT_FILE, snapshot.dumps(data, as_of))
+            self.meta = {
+                'url': url,
+                'sha256': digest,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+            }
+            self._write_meta()
+        except OSError as e:
+            log.warning('Could not write the cache in %s: %s', self.cache_dir, e)
+
+    def fetch_and_parse(
+        self,
+        url: str,
+        fetch: Callable[[str, Dict[str, str]], FetchResult],
+        parse: Callable[[str], Tuple[str, Any]],
+        revalidate: bool = False,
+    ) -> Tuple[str, Any]:
+        """Return `(as_of, data)` for `url`, fetching when stale.
+
+        `fetch(url, request_headers)` does the conditional GET and `parse(page)`
+        turns page content into the `(as_of, data)` snapshot we store. Pass
+        `revalidate` to check with the server even if our copy is still fresh.
+        """
+        if not revalidate and self.is_fresh(url):
+            if cached := self.read_snapshot():
+                metrics.count('cache.disk.fresh')
+                return cached
+
+        result = fetch(url, self.validators(url))
+        if result.status == 304 and self.has_snapshot(url):
+            if cached := self.read_snapshot():
+                metrics.count('cache.disk.not_modified')
+                self.revalidated(result.headers)
+                return cached
+            result = fetch(url, {})  # our copy is gone, we need the page after all
+
+        digest = hashlib.sha256(result.content.encode('utf-8')).hexdigest()
+        if digest == self.meta.get('sha256') and self.has_snapshot(url):
+            if cached := self.read_snapshot():
+                metrics.count('cache.disk.unchanged')
+                self.revalidated(result.headers)
+                return cached
+
+        metrics.count('cache.disk.misses')
+        parsed = parse(result.content)
+        self.store(url, result.content, digest, result.headers, parsed)
+        return parsed
@@ -0,0 +1,113 @@
+"""Percentile ranks and z-scores of each team's stats within a snapshot.
+
+Every stat in `FIELDS` gets two derived columns, `<field>_pct` (0-100, the share
+of D1 a team is ahead of, ties counting half) and `<field>_z` (standard
+deviations from the D1 mean). Both are oriented so higher is better, which for
+`defense` and `sos_def` (points allowed, by the team or its opponents) means
+lower raw values. All of them are computed in one pass, vectorized with NumPy
+for tables big enough to be worth it (see `table.NUMPY_MIN_ROWS`), and cached on
+the table, so filters like `defense_pct>=90` and the `--stats` console columns
+are lookups.
+"""
+import bisect
+import math
+from typing import Any, Dict, List, Sequence
+
+from table import as_table, KenPomData, KenPomTable, numpy_for
+
+FIELDS = (
+    'eff_margin',
+    'offense',
+    'defense',
+    'tempo',
+    'luck',
+    'sos_eff_margin',
+    'sos_off',
+    'sos_def',
+    'sos_non_conf',
+)
+LOWER_IS_BETTER = frozenset({'defense', 'sos_def'})
+KINDS = ('pct', 'z')
+COLUMNS = tuple(f'{field}_{kind}' for field in FIELDS for kind in KINDS)
+
+# What `--stats` adds to the console table, and the headers it uses
+CONSOLE_FIELDS = {
+    'eff_margin': 'AdjEM',
+    'offense': 'Off',
+    'defense': 'Def',
+    'tempo': 'Tempo',
+    'luck': 'Luck',
+    'sos_eff_margin': 'SOS',
+}
+
+
+def _percentiles_python(values: Sequence[float]) -> List[float]:
+    ordered = sorted(values)
+    scale = 50 / len(values)
+    return [
+        (bisect.bisect_left(ordered, v) + bisect.bisect_right(ordered, v)) * scale for v in values
+    ]
+
+
+def z_scores(values: Sequence[float]) -> List[float]:
+    """Standard deviations from the mean, 0 if all values are equal."""
+    mean = math.fsum(values) / len(values)
+    std = math.sqrt(math.fsum((v - mean) ** 2 for v in values) / len(values)) or 1.0
+    return [(v - mean) / std for v in values]
+
+
+class Percentiles:
+    """Every derived column for one table, by name, in row order.
+
+    With NumPy the columns are arrays, otherwise lists.
+    """
+
+    def __init__(self, table: KenPomTable):
+        self.positions = {abbrev: row for row, abbrev in enumerate(table.column('abbrev'))}
+        self.columns: Dict[str, Any] = {}
+        if not len(table):
+            self.columns = {name: [] for name in COLUMNS}
+            return
+
+        np = numpy_for(len(table))
+        for field in FIELDS:
+            sign = -1 if field in LOWER_IS_BETTER else 1
+            if np is not None:
+                values = sign * np.asarray(table.column(field), dtype='float64')
+                ordered = np.sort(values)
+                below = np.searchsorted(ordered, values, 'left')
+                below_or_tied = np.searchsorted(ordered, values, 'right')
+                self.columns[f'{field}_pct'] = (below + below_or_tied) * (50 / len(values))
+                std = values.std() or 1.0
+                self.columns[f'{field}_z'] = (values - values.mean()) / std
+            else:
+                values = [sign * v for v in table.column(field)]
+                self.columns[f'{field}_pct'] = _percentiles_python(values)
+                self.columns[f'{field}_z'] = z_scores(values)
+
+    def value(self, abbrev: str, name: str) -> float:
+        """One team's (by abbrev) value of a derived column."""
+        return float(self.columns[name][self.positions[abbrev]])
+
+
+def percentiles_for(data: KenPomData) -> Percentiles:
+    """Return the derived columns for a snapshot, built once."""
+    table = as_table(data)
+    return table.derived('percentiles', Percentiles)
+
+
+def console_columns(snapshot: KenPomData, shown: KenPomData, kind: str) -> Dict[str, List[str]]:
+    """The `--stats pct|z` columns for the teams in `shown`.
+
+    Maps each header to the formatted values. `snapshot` is the whole snapshot
+    `shown` was filtered from: percentiles are always relative to all of D1.
+    """
+    stats = percentiles_for(snapshot)
+    template = '{:.0f}' if kind == 'pct' else '{:+.2f}'
+    suffix = '%' if kind == 'pct' else ' z'
+    abbrevs = [team.abbrev for team in shown.values()]
+    columns = {}
+    for field, label in CONSOLE_FIELDS.items():
+        name = f'{field}_{kind}'
+        columns[label + suffix] = [template.format(stats.value(a, name)) for a in abbrevs]
+    return columns
@@ -0,0 +1,192 @@
+"""Per-snapshot indexes behind `filter_data` for `KenPomTable`s.
+
+A long-running process (the interactive loop, server mode, archive queries)
+asks many questions of one snapshot, so we build a few lookup structures once
+per table and answer each filter from those instead of scanning every row:
+
+* abbrev -> row (the table's own mapping)
+* conf -> sorted rows
+* ranks in ascending order, for top `n`
+* tourney seeds in ascending order, for `seed<=4` and friends
+* a trigram index over school names, for substring searches
+
+Sort orders (`--sort tempo,-luck`) are cached per snapshot the same way, one
+per field and direction, so a leaderboard query only sorts its own rows by
+precomputed integer places.
+"""
+import bisect
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from table import FIELDS, KenPomTable, MISSING, NUMERIC_FIELDS, OPTIONAL_FIELDS
+
+NGRAM = 3
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i : i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class SnapshotIndex:
+    """Lookup structures for one `KenPomTable`, by row index."""
+
+    def __init__(self, table: KenPomTable):
+        self.table = table
+        ranks = table.column('rank')
+        self._rank_order = table.argsort('rank')
+        self._sorted_ranks = [ranks[i] for i in self._rank_order]
+
+        seeds = table.column('seed')
+        self._seed_order = [i for i in table.argsort('seed') if seeds[i] != MISSING]
+        self._sorted_seeds = [seeds[i] for i in self._seed_order]
+
+        self._by_conf: Dict[str, List[int]] = {}
+        conf_labels = [c.lower() for c in table.conf_labels]
+        for i, code in enumerate(table.column('conf')):
+            self._by_conf.setdefault(conf_labels[code], []).append(i)
+
+        self._names = [n.lower() for n in table.column('name')]
+        self._by_ngram: Dict[str, Set[int]] = {}
+        for i, name in enumerate(self._names):
+            for gram in _ngrams(name):
+                self._by_ngram.setdefault(gram, set()).add(i)
+
+    def top(self, n: int) -> List[int]:
+        """Rows ranked `n` or better, in page order."""
+        count = bisect.bisect_right(self._sorted_ranks, n)
+        return sorted(self._rank_order[:count])
+
+    def seeds(self, op: str, seed: float) -> List[int]:
+        """Rows where `row seed <op> seed` holds, in page order."""
+        order, sorted_seeds = self._seed_order, self._sorted_seeds
+        low = bisect.bisect_left(sorted_seeds, seed)
+        high = bisect.bisect_right(sorted_seeds, seed)
+        if op == '!=':
+            return sorted(order[:low] + order[high:])
+        start, end = {
+            '<': (0, low),
+            '<=': (0, high),
+            '=': (low, high),
+            '==': (low, high),
+            '>=': (low, len(order)),
+            '>': (high, len(order)),
+        }[op]
+        return sorted(order[start:end])
+
+    def abbrevs(self, abbrevs: Iterable[str]) -> List[int]:
+        """Rows for the given (lower case) abbrevs, in page order."""
+        table = self.table
+        return sorted(table.position(a) for a in abbrevs if a in table)
+
+    def confs(self, confs: Iterable[str]) -> List[int]:
+        """Rows in any of the (lower case) conferences."""
+        rows: List[int] = []
+        for conf in set(confs):
+            rows.extend(self._by_conf.get(conf, ()))
+        return sorted(rows)
+
+    def names(self, terms: Iterable[str]) -> List[int]:
+        """Rows whose school name contains any of the terms."""
+        rows: Set[int] = set()
+        for term in terms:
+            rows.update(self._name_matches(term))
+        return sorted(rows)
+
+    def _name_matches(self, term: str) -> Iterable[int]:
+        if len(term) < NGRAM:
+            # Too short to index, but there are only a few hundred names
+            return (i for i, name in enumerate(self._names) if term in name)
+
+        postings = [self._by_ngram.get(gram, set()) for gram in _ngrams(term)]
+        candidates = set.intersection(*sorted(postings, key=len))
+        # Sharing every trigram doesn't guarantee a substring match, so check
+        return (i for i in candidates if term in self._names[i])
+
+
+def index_for(table: KenPomTable) -> SnapshotIndex:
+    """Return the index for `table`, built once."""
+    return table.derived('index', SnapshotIndex)
+
+
+SortKey = Tuple[str, bool]  # field, descending
+
+
+class SortOrder(NamedTuple):
+    order: List[int]  # every row, sorted
+    places: List[int]  # each row's place in that order, ties sharing one
+
+
+def parse_sort(spec: str) -> List[SortKey]:
+    """Parse `field[,field]`, `-field` sorting high to low."""
+    keys = []
+    for term in spec.lower().split(','):
+        term = term.strip()
+        name = term.lstrip('-')
+        if name not in FIELDS:
+            raise ValueError(f'Unknown sort field `{name}`, expected one of {FIELDS}')
+        keys.append((name, term.startswith('-')))
+    return keys
+
+
+def _record_key(record: str) -> Optional[Tuple[int, int]]:
+    """`12-1` sorts as (12, -1): by wins, then fewest losses."""
+    wins, _, losses = record.partition('-')
+    try:
+        return int(wins), -int(losses)
+    except ValueError:
+        return None
+
+
+def sort_values(name: str, values: Iterable[Any]) -> List[Any]:
+    """What to sort a field's values by, a record by wins and losses."""
+    return [_record_key(v) for v in values] if name == 'record' else list(values)
+
+
+def sort_places(values: Sequence[Any], descending: bool = False) -> List[int]:
+    """Each value's place in sorted order, None last."""
+    present = sorted({v for v in values if v is not None}, reverse=descending)
+    places = {v: i for i, v in enumerate(present)}
+    return [len(present) if v is None else places[v] for v in values]
+
+
+def _sort_order(table: KenPomTable, name: str, descending: bool) -> SortOrder:
+    if name in NUMERIC_FIELDS and name not in OPTIONAL_FIELDS:
+        # Places fall out of the (vectorized) argsort
+        order = table.argsort(name, reverse=descending)
+        column = table.column(name)
+        places = [0] * len(order)
+        place, previous = -1, None
+        for row in order:
+            if column[row] != previous:
+                place, previous = place + 1, column[row]
+            places[row] = place
+        return SortOrder(order, places)
+
+    column = table.column(name)
+    if name == 'conf':
+        column = [table.conf_labels[c] for c in column]
+    elif name in OPTIONAL_FIELDS:
+        column = [None if v == MISSING else v for v in column]
+    places = sort_places(sort_values(name, column), descending)
+    return SortOrder(sorted(range(len(places)), key=places.__getitem__), places)
+
+
+def sort_order(table: KenPomTable, name: str, descending: bool = False) -> SortOrder:
+    """Return the order of `table` by one field, built once."""
+    return table.derived(f'sort:{name}:{descending}', lambda t: _sort_order(t, name, descending))
+
+
+def sort_rows(
+    table: KenPomTable, rows: Optional[Iterable[int]], keys: Sequence[SortKey]
+) -> List[int]:
+    """Sort `rows` (None for all of them) by `keys`.
+
+    Ties are kept in page order.
+    """
+    orders = [sort_order(table, name, descending) for name, descending in keys]
+    if rows is None and len(orders) == 1:
+        return orders[0].order
+    rows = range(len(table)) if rows is None else rows
+    if len(orders) == 1:
+        return sorted(rows, key=orders[0].places.__getitem__)
+    places = [o.places for o in orders]
+    return sorted(rows, key=lambda row: tuple(p[row] for p in places))
@@ -0,0 +1,100 @@
+"""Keep a snapshot fresh from a thread for the interactive loop.
+
+The loop used to block a prompt on a fetch and parse whenever the cache had
+expired, and crashed outright if KenPom was unreachable. A `BackgroundRefresher`
+instead revalidates the snapshot shortly before it expires and answers every
+prompt from the last good copy, noting in the footer when that copy is stale.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+Snapshot = Tuple[str, Any]
+
+
+class RefreshError(RuntimeError):
+    """Raised when there is no snapshot to answer from at all."""
+
+
+class BackgroundRefresher:
+    """Load a snapshot, then reload it now and then on a thread.
+
+    `load(revalidate)` is a blocking callable returning `(as_of, data)`. It is
+    called with False for the first load, so a cached copy is fine, and with
+    True afterwards, so the cache asks KenPom whether the page changed.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[bool], Snapshot],
+        max_age: float,
+        lead_time: float = 60,
+        retry_after: float = 30,
+    ):
+        self.load = load
+        self.max_age = max_age
+        self.lead_time = min(lead_time, max_age / 2)  # never spin on short max ages
+        self.retry_after = retry_after
+        self.snapshot: Optional[Snapshot] = None
+        self.loaded_at = 0.0
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._first_attempt = threading.Event()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='kenpom-refresher', daemon=True)
+
+    def start(self) -> 'BackgroundRefresher':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def refresh(self):
+        """Reload now rather than waiting for expiry."""
+        self._wake.set()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    def get(self, timeout: Optional[float] = None) -> Snapshot:
+        """Return the last good snapshot, waiting only for the first."""
+        self._first_attempt.wait(timeout)
+        with self._lock:
+            if self.snapshot is None:
+                raise RefreshError(f'Could not load KenPom data: {self.error or "timed out"}')
+            return self.snapshot
+
+    def stale_note(self) -> str:
+        """Say why the snapshot is out of date, if it is."""
+        with self._lock:
+            if self.snapshot is None or self.age < self.max_age:
+                return ''
+            minutes = int(self.age // 60)
+            note = f'stale, refreshed {minutes} min ago'
+            return f'{note}, last refresh failed' if self.error else note
+
+    def _run(self):
+        revalidate = False
+        while not self._stopped:
+            try:
+                snapshot = self.load(revalidate)
+            except Exception as e:  # keep answering from the old snapshot
+                log.warning('Refreshing KenPom data failed: %s', e)
+                with self._lock:
+                    self.error = e
+                wait = self.retry_after
+            else:
+                with self._lock:
+                    self.snapshot, self.loaded_at, self.error = snapshot, time.monotonic(), None
+                wait = self.max_age - self.lead_time
+                revalidate = True
+            self._first_attempt.set()
+            self._wake.wait(max(wait, 0))
+            self._wake.clear()
@@ -0,0 +1,173 @@
+"""The interactive prompt: editing, completion, history, commands.
+
+Besides any filter, the prompt takes a few commands:
+
+    :sort -tempo,luck   order results by these fields, `:sort` alone for rank order
+    :format csv         print as a table, jsonl or csv
+    :stats pct          add percentile (pct) or z-score (z) columns, `:stats` alone to drop them
+    :refresh            reload the data now rather than when it's due
+    :help
+
+Tab completes abbrevs, conference and school names (each term after a comma),
+commands, sort fields and formats. Each kind of word is kept in one sorted
+list and the words with a given prefix are the slice between two bisects, so
+completion is instant; the lists are only built on the first tab. Lines are
+saved to `~/.kenpom_history` between runs. Without `readline` (e.g. on
+Windows) the prompt is a plain `input()`.
+"""
+import argparse
+import bisect
+import functools
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from datastructures import CONF_NAMES, SCHOOL_ABBREVS, SCHOOL_NAMES
+from query import parse_sort
+from table import NUMERIC_FIELDS
+
+log = logging.getLogger(__name__)
+
+HISTORY_FILE = Path('~/.kenpom_history')
+HISTORY_LENGTH = 1000
+COMMANDS = ('sort', 'format', 'stats', 'refresh', 'help')
+FORMATS = ('table', 'jsonl', 'csv')  # not arrow, it's binary
+STATS = ('pct', 'z')
+HELP = (__doc__ or '').split('\n\n')[2]  # the list of commands above
+
+
+class PrefixIndex:
+    """Sorted words, for listing those with a prefix."""
+
+    def __init__(self, words: Iterable[str]):
+        self.words = sorted(set(words))
+
+    def complete(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.words, prefix)
+        # Every word with the prefix sorts before the prefix plus the last code point
+        end = bisect.bisect_left(self.words, prefix + '\U0010ffff', start)
+        return self.words[start:end]
+
+
+class Completer:
+    """Work out tab completions from the line typed so far.
+
+    Completion is on the text after the last comma (readline is told only commas
+    separate words, school names have spaces in them), so each candidate is a
+    replacement for all of that text.
+    """
+
+    def __init__(self):
+        self._matches: List[str] = []
+
+    @functools.cached_property
+    def _indexes(self) -> Dict[str, PrefixIndex]:
+        return {
+            'filter': PrefixIndex([*SCHOOL_ABBREVS, *CONF_NAMES, *SCHOOL_NAMES, 'all']),
+            'command': PrefixIndex(COMMANDS),
+            'sort': PrefixIndex(NUMERIC_FIELDS + ('name', 'abbrev', 'conf', 'record')),
+            'format': PrefixIndex(FORMATS),
+            'stats': PrefixIndex(STATS),
+        }
+
+    def candidates(self, line: str) -> List[str]:
+        """Replacements for the text after the last comma in `line`."""
+        segment = line.rpartition(',')[2]
+        if not line.startswith(':'):
+            word = segment.lstrip()
+            keep = segment[: len(segment) - len(word)]
+            return [keep + w for w in self._indexes['filter'].complete(word.lower())]
+
+        command, space, argument = line[1:].partition(' ')
+        if not space:
+            return [f':{c}' for c in self._indexes['command'].complete(command)]
+        if command not in ('sort', 'format', 'stats'):
+            return []
+        word = segment if ',' in line else argument
+        keep = segment[: len(segment) - len(word)]
+        if command == 'sort' and word.startswith('-'):
+            keep, word = keep + '-', word[1:]
+        return [keep + w for w in self._indexes[command].complete(word)]
+
+    def complete(self, readline: Any) -> Callable[[str, int], Optional[str]]:
+        """The completion function for `readline.set_completer`."""
+
+        def complete(text: str, state: int) -> Optional[str]:
+            if state == 0:
+                self._matches = self.candidates(
+                    readline.get_line_buffer()[: readline.get_endidx()]
+                )
+            return self._matches[state] if state < len(self._matches) else None
+
+        return complete
+
+
+class Prompt:
+    """Read lines, with readline when it's available."""
+
+    def __init__(self, history_file: Optional[Path] = HISTORY_FILE):
+        self.history_file = history_file.expanduser() if history_file else None
+        self.completer = Completer()
+        try:
+            import readline
+        except ImportError:  # pragma: no cover - Windows, or Python built without it
+            self.readline = None
+            return
+
+        self.readline = readline
+        readline.set_completer(self.completer.complete(readline))
+        readline.set_completer_delims(',')
+        # libedit (macOS) and GNU readline spell this differently
+        if 'libedit' in (readline.__doc__ or ''):
+            readline.parse_and_bind('bind ^I rl_complete')
+        else:
+            readline.parse_and_bind('tab: complete')
+        readline.set_history_length(HISTORY_LENGTH)
+        if self.history_file and self.history_file.exists():
+            try:
+                readline.read_history_file(self.history_file)
+            except OSError as e:
+                log.warning('Could not read history from %s: %s', self.history_file, e)
+
+    def read(self, prompt: str) -> str:
+        line = input(prompt)
+        if self.readline and self.history_file and line.strip():
+            try:
+                self.history_file.parent.mkdir(parents=True, exist_ok=True)
+                self.readline.write_history_file(self.history_file)
+            except OSError as e:
+                log.warning('Could not save history to %s: %s', self.history_file, e)
+        return line
+
+
+def run_command(line: str, args: argparse.Namespace, refresh: Optional[Callable[[], None]]) -> str:
+    """Carry out a `:command`, returning what to tell the user.
+
+    Updates `args` in place.
+    """
+    command, _, argument = line[1:].strip().partition(' ')
+    argument = argument.strip()
+    if command == 'sort':
+        try:
+            args.sort = parse_sort(argument) if argument else None
+        except ValueError as e:
+            return str(e)
+        return f'Sorting by {argument}' if argument else 'Sorting by rank'
+    if command == 'format':
+        if argument not in FORMATS:
+            return f'Format is {args.format}, choose from {", ".join(FORMATS)}'
+        args.format = argument
+        return f'Printing {argument}'
+    if command == 'stats':
+        if argument and argument not in STATS:
+            return f'Choose from {", ".join(STATS)}, or nothing to drop the columns'
+        args.stats = argument or None
+        return f'Showing {argument} columns' if argument else 'Not showing stats columns'
+    if command == 'refresh':
+        if refresh is None:
+            return 'Nothing to refresh, the data is from a snapshot file'
+        refresh()
+        return 'Refreshing in the background, the next answer will have the new data'
+    if command == 'help':
+        return HELP
+    return f'No command :{command}, try :help'
@@ -0,0 +1,283 @@
+"""Serve KenPom filters as JSON from one shared snapshot.
+
+Started via `kenpom.py --serve`. Every client shares the same parsed snapshot,
+so a dashboard, a bot and a widget no longer each pay for Python start up,
+the fetch and the parse. Endpoints:
+
+    GET /teams?q=FILTER     same filter language as the command line, default 25,
+                            optionally &sort=FIELD[,FIELD] like --sort
+    GET /matchup?teams=A,B  predicted score and win probability, see matchup.py
+    GET /conferences        per-conference summaries, optionally ?confs=acc,sec
+    GET /similar?team=A     the teams most like A and their distances, optionally &k=N
+    GET /health             as-of text and snapshot age
+    GET /metrics            stage timings and counters, Prometheus text format
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import conferences
+from datastructures import MetaData
+from kenpom import CACHE_IN_SECS, filter_data
+import metrics
+from matchup import matrix_for
+from query import parse_sort
+import similar
+from table import as_table, FIELDS, KenPomData
+
+log = logging.getLogger(__name__)
+
+MAX_REQUEST_LINE = 8192
+MAX_HEADER_LINES = 100
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'  # Prometheus' text format
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+Snapshot = Tuple[str, KenPomData]
+
+
+class SharedSnapshot:
+    """The snapshot every client reads, refreshed one at a time.
+
+    `load` is a blocking callable returning `(as_of, data)`; it runs in the
+    default executor so a slow fetch never stalls requests being served from the
+    snapshot we already have.
+    """
+
+    def __init__(self, load: Callable[[], Snapshot], max_age: float = CACHE_IN_SECS):
+        self.load = load
+        self.max_age = max_age
+        self.snapshot: Optional[Snapshot] = None
+        self.loaded_at = 0.0
+        self._refreshing: Optional['asyncio.Task[Snapshot]'] = None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    async def get(self) -> Snapshot:
+        """Return the current snapshot, waiting only for the first.
+
+        An expired snapshot is still served while a refresh runs behind it.
+        """
+        if self.snapshot is None:
+            return await self.refresh()
+        if self.age >= self.max_age and self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._reload())
+            self._refreshing.add_done_callback(_log_refresh_failure)
+        return self.snapshot
+
+    async def refresh(self) -> Snapshot:
+        """Reload the snapshot, or join a reload in progress."""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._reload())
+        # Shielded, so a client hanging up doesn't cancel everyone else's reload
+        return await asyncio.shield(self._refreshing)
+
+    async def _reload(self) -> Snapshot:
+        try:
+            snapshot = await asyncio.get_running_loop().run_in_executor(None, self.load)
+            self.snapshot, self.loaded_at = snapshot, time.monotonic()
+            return snapshot
+        finally:
+            self._refreshing = None
+
+    async def refresh_periodically(self):
+        """Keep the snapshot fresh so clients never wait."""
+        while True:
+            await asyncio.sleep(max(self.max_age - self.age, 0))
+            try:
+                await self.refresh()
+            except Exception:  # keep serving the old snapshot, try again later
+                log.exception('Snapshot refresh failed')
+                await asyncio.sleep(min(self.max_age, 30))
+
+
+def _log_refresh_failure(task: 'asyncio.Task[Snapshot]'):
+    if not task.cancelled() and task.exception():
+        log.error('Snapshot refresh failed', exc_info=task.exception())
+
+
+def teams_payload(data: KenPomData, meta: MetaData, as_of: str) -> Dict[str, Any]:
+    return {
+        'as_of': as_of,
+        'meta': meta,
+        'teams': [{f: getattr(team, f) for f in FIELDS} for team in data.values()],
+    }
+
+
+async def handle_request(shared: SharedSnapshot, method: str, target: str) -> Tuple[int, Any]:
+    """Route one request, returning `(status, json_body)`.
+
+    A `str` body is sent as plain text rather than JSON.
+    """
+    if not target:
+        return 400, {'error': 'Malformed request'}
+    if method != 'GET':
+        return 405, {'error': f'{method} not supported'}
+
+    url = urlsplit(target)
+    if url.path == '/health':
+        as_of, _ = await shared.get()
+        return 200, {'as_of': as_of, 'age': round(shared.age, 1)}
+
+    if url.path == '/matchup':
+        teams = parse_qs(url.query).get('teams', [''])[0].split(',')
+        if len(teams) != 2:
+            return 400, {'error': 'Expected teams=A,B'}
+        as_of, data = await shared.get()
+        table = as_table(data)
+        try:
+            # Every pairing is computed once per snapshot, then each request is a lookup
+            prediction = matrix_for(table).predict(*teams)
+        except KeyError as e:
+            return 404, {'error': f'No team with abbrev or name {e}'}
+        return 200, {'as_of': as_of, **prediction._asdict(), 'margin': prediction.margin}
+
+    if url.path == '/conferences':
+        confs = [c for c in parse_qs(url.query).get('confs', [''])[0].split(',') if c]
+        as_of, data = await shared.get()
+        summaries = conferences.select(conferences.summary_for(data), confs)
+        return 200, {'as_of': as_of, 'conferences': [s.flat() for s in summaries]}
+
+    if url.path == '/similar':
+        query = parse_qs(url.query)
+        team, k = query.get('team', [''])[0], query.get('k', [str(similar.DEFAULT_K)])[0]
+        if not team or not k.isdigit():
+            return 400, {'error': 'Expected team=A, optionally &k=N'}
+        as_of, data = await shared.get()
+        table = as_table(data)
+        try:
+            neighbors = similar.similar(table, team, int(k))
+        except KeyError as e:
+            return 404, {'error': f'No team with abbrev or name {e}'}
+        return 200, {'as_of': as_of, 'similar': [n._asdict() for n in neighbors]}
+
+    if url.path == '/metrics':
+        return 200, metrics.prometheus_text(metrics.report())
+
+    if url.path == '/teams':
+        params = parse_qs(url.query)
+        user_input = params.get('q', ['25'])[0].lower()
+        as_of, data = await shared.get()
+        try:
+            sort = parse_sort(params['sort'][0]) if 'sort' in params else None
+            filtered, meta = filter_data(data, user_input, sort)
+        except (AssertionError, ValueError) as e:  # bad top `n`, expression or sort field
+            return 400, {'error': str(e)}
+        return 200, teams_payload(filtered, meta, as_of)
+
+    return 404, {'error': f'No such endpoint {url.path}'}
+
+
+class _BadRequest(Exception):
+    """A request we can't read, answered 400 before hanging up."""
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[bytes, Dict[str, str]]:
+    """Read the request line and headers, no line if the peer left."""
+    headers: Dict[str, str] = {}
+    try:
+        request_line = await reader.readline()
+        if not request_line:
+            return request_line, headers
+        if len(request_line) > MAX_REQUEST_LINE:
+            raise _BadRequest('Request line too long')
+        lines = 0
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            lines += 1
+            if lines > MAX_HEADER_LINES:
+                raise _BadRequest('Too many header lines')
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+    except (ValueError, asyncio.LimitOverrunError) as e:  # a line past the reader's limit
+        raise _BadRequest('Line too long') from e
+    return request_line, headers
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, body: Any, keep_alive: bool):
+    if isinstance(body, str):
+        content_type, content = TEXT_CONTENT_TYPE, body.encode('utf-8')
+    else:
+        content_type, content = 'application/json', json.dumps(body).encode('utf-8')
+    writer.write(
+        (
+            f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(content)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+        ).encode('latin-1')
+        + content
+    )
+
+
+async def _serve_connection(
+    shared: SharedSnapshot, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+):
+    """Answer requests on one keep-alive connection."""
+    try:
+        while True:
+            try:
+                request_line, headers = await _read_head(reader)
+            except _BadRequest as e:
+                # What's left of the request is still unread, so don't keep the connection
+                _write_response(writer, 400, {'error': str(e)}, keep_alive=False)
+                await writer.drain()
+                break
+            if not request_line:
+                break
+
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+            except ValueError:
+                method, target, version = '', '', 'HTTP/1.0'
+            try:
+                status, body = await handle_request(shared, method, target)
+            except Exception:
+                log.exception('Request failed: %s', request_line)
+                status, body = 500, {'error': 'Internal error'}
+
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection') != 'close'
+            _write_response(writer, status, body, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(
+    shared: SharedSnapshot, host: str = '127.0.0.1', port: int = 8080
+) -> asyncio.AbstractServer:
+    return await asyncio.start_server(
+        lambda reader, writer: _serve_connection(shared, reader, writer), host, port
+    )
+
+
+async def _serve_forever(shared: SharedSnapshot, host: str, port: int):
+    await shared.refresh()
+    server = await start_server(shared, host, port)
+    refresher = asyncio.ensure_future(shared.refresh_periodically())
+    print(f'Serving KenPom data on http://{host}:{port}/teams?q=25')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        refresher.cancel()
+
+
+def serve(load: Callable[[], Snapshot], host: str = '127.0.0.1', port: int = 8080):
+    """Run the server until interrupted."""
+    try:
+        asyncio.run(_serve_forever(SharedSnapshot(load), host, port))
+    except KeyboardInterrupt:
+        pass
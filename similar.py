@@ -0,0 +1,91 @@
+"""Teams most like a given team, by how close their stats are.
+
+Each team is a vector of `FEATURES`, each standardized (z-scored across the
+snapshot) so that tempo in possessions and luck in fractions of a win weigh the
+same. Similarity is Euclidean distance between vectors. The standardized matrix
+is built once per snapshot and cached on the table, and each query is one
+vectorized pass over it (NumPy for tables past `table.NUMPY_MIN_ROWS`): with a
+few hundred teams and a handful of fields, that beats building a KD-tree.
+"""
+import heapq
+import math
+from typing import List, NamedTuple, Tuple
+
+from matchup import find_team
+from percentiles import z_scores
+from table import KenPomTable, load_numpy, numpy_for
+
+FEATURES = (
+    'offense',
+    'defense',
+    'tempo',
+    'luck',
+    'sos_eff_margin',
+    'sos_off',
+    'sos_def',
+    'sos_non_conf',
+)
+DEFAULT_K = 10
+
+
+class Neighbor(NamedTuple):
+    team: str  # abbrev
+    distance: float
+
+
+class SimilarityIndex:
+    """Every team's standardized stat vector, one row per table row.
+
+    With NumPy `vectors` is a 2-D array, otherwise a list of lists.
+    """
+
+    def __init__(self, table: KenPomTable):
+        self.table = table
+        columns = [table.column(f) for f in FEATURES]
+
+        np = numpy_for(len(table))
+        if np is not None:
+            matrix = np.asarray(columns, dtype='float64').T
+            std = matrix.std(axis=0)
+            std[std == 0] = 1.0  # a field every team shares tells us nothing
+            self.vectors = (matrix - matrix.mean(axis=0)) / std
+            return
+
+        self.vectors = [list(row) for row in zip(*map(z_scores, columns))]
+
+    def nearest(self, row: int, k: int = DEFAULT_K) -> List[Tuple[int, float]]:
+        """The `k` rows closest to `row`, and their distances.
+
+        `row` itself isn't counted.
+        """
+        if isinstance(self.vectors, list):
+            target = self.vectors[row]
+            distances = [
+                (math.fsum((a - b) ** 2 for a, b in zip(vector, target)), other)
+                for other, vector in enumerate(self.vectors)
+                if other != row
+            ]
+            return [(other, math.sqrt(d)) for d, other in heapq.nsmallest(k, distances)]
+
+        np = load_numpy()
+        squared = ((self.vectors - self.vectors[row]) ** 2).sum(axis=1)
+        squared[row] = np.inf
+        k = min(k, len(squared) - 1)
+        if k <= 0:
+            return []
+        # Only the k nearest need sorting; ties go to the higher ranked (earlier) row
+        candidates = np.argpartition(squared, k - 1)[:k]
+        candidates = candidates[np.lexsort((candidates, squared[candidates]))]
+        return [(int(other), float(np.sqrt(squared[other]))) for other in candidates]
+
+
+def index_for(table: KenPomTable) -> SimilarityIndex:
+    """Return the standardized vectors for `table`, built once."""
+    return table.derived('similar', SimilarityIndex)
+
+
+def similar(table: KenPomTable, team: str, k: int = DEFAULT_K) -> List[Neighbor]:
+    """The `k` teams most like `team`, nearest first."""
+    abbrevs = table.column('abbrev')
+    nearest = index_for(table).nearest(find_team(table, team), k)
+    return [Neighbor(abbrevs[row], distance) for row, distance in nearest]
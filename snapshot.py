@@ -0,0 +1,238 @@
+"""Compact binary snapshot files for a parsed `KenPomTable`.
+
+Loading one of these needs no HTML parsing at all, just a handful of
+`struct.unpack_from` calls and `array.frombytes` copies out of an `mmap`.
+
+Layout (all integers little-endian):
+
+    header      magic b'KPSNAP', u16 version, u16 column count, u32 row count
+    as_of       u32 string table index
+    strings     u32 count, u32 byte length, utf-8 blob of NUL separated strings
+    columns     per column: u32 name (string index), u8 kind, u32 offset, u32 length
+    data        column payloads, each 8 byte aligned
+
+Column kinds: numeric columns hold raw int32/float64 values, `conf` holds uint8
+codes followed by a u32 string index per label, and text columns hold a u32
+string index per row. Columns are looked up by name, so readers simply skip
+columns they don't know and older files missing a new column still load.
+"""
+from array import array
+import mmap
+import struct
+import sys
+from typing import Any, Dict, List, Sequence, Tuple
+
+from table import (
+    as_table,
+    CATEGORICAL_FIELDS,
+    FIELDS,
+    KenPomData,
+    KenPomTable,
+    MISSING,
+    NUMERIC_FIELDS,
+    OPTIONAL_FIELDS,
+)
+
+MAGIC = b'KPSNAP'
+VERSION = 1
+
+_HEADER = struct.Struct('<6sHHI')
+_U32 = struct.Struct('<I')
+_COLUMN_ENTRY = struct.Struct('<IBII')
+
+KIND_INT32 = 1
+KIND_FLOAT64 = 2
+KIND_CATEGORY = 3
+KIND_TEXT = 4
+_NUMERIC_KINDS = {KIND_INT32: 'i', KIND_FLOAT64: 'd'}
+_KIND_BY_TYPECODE = {'i': KIND_INT32, 'd': KIND_FLOAT64}
+
+
+class SnapshotError(ValueError):
+    """Raised for non-snapshots, or snapshots from a newer version."""
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, payload) -> array:
+    values = array(typecode)
+    values.frombytes(payload)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def to_bytes(self) -> bytes:
+        # One NUL separated blob lets a reader decode every string with one split
+        blob = '\0'.join(self.strings).encode('utf-8')
+        return _U32.pack(len(self.strings)) + _U32.pack(len(blob)) + blob
+
+
+def dumps(data: KenPomData, as_of: str) -> bytes:
+    """Serialize a snapshot (table or dict) plus its as-of text."""
+    table = as_table(data)
+    strings = _StringTable()
+    as_of_index = strings.add(as_of)
+
+    columns: List[Tuple[int, int, bytes]] = []
+    for name in FIELDS:
+        column = table.column(name)
+        if name in NUMERIC_FIELDS:
+            payload = _little_endian(column)
+            kind = _KIND_BY_TYPECODE[column.typecode]
+        elif name in CATEGORICAL_FIELDS:
+            labels = array('I', [strings.add(c) for c in table.conf_labels])
+            payload = _U32.pack(len(labels)) + _little_endian(labels) + bytes(column)
+            kind = KIND_CATEGORY
+        else:
+            payload = _little_endian(array('I', [strings.add(v) for v in column]))
+            kind = KIND_TEXT
+        columns.append((strings.add(name), kind, payload))
+
+    string_bytes = strings.to_bytes()
+    head_len = _HEADER.size + _U32.size + len(string_bytes) + _COLUMN_ENTRY.size * len(columns)
+    directory, blobs = [], []
+    offset = head_len
+    for name_index, kind, payload in columns:
+        padding = -offset % 8
+        offset += padding
+        blobs.append(b'\0' * padding + payload)
+        directory.append(_COLUMN_ENTRY.pack(name_index, kind, offset, len(payload)))
+        offset += len(payload)
+
+    header = _HEADER.pack(MAGIC, VERSION, len(columns), len(table))
+    return b''.join([header, _U32.pack(as_of_index), string_bytes, *directory, *blobs])
+
+
+def dump(path, data: KenPomData, as_of: str):
+    with open(path, 'wb') as f:
+        f.write(dumps(data, as_of))
+
+
+class SnapshotReader:
+    """Random access to the columns of one snapshot held in a buffer.
+
+    The buffer may be `bytes` or an `mmap`, and the snapshot may start at any
+    `offset` into it (the archive stores many back to back). Nothing is decoded
+    until asked for, so pulling one column out of a snapshot is cheap.
+    """
+
+    def __init__(self, buffer, offset: int = 0):
+        self._buffer = buffer
+        try:
+            self._read_directory(buffer, offset)
+        except struct.error:  # shorter than its header or column directory
+            raise SnapshotError('Truncated KenPom snapshot')
+
+    def _read_directory(self, buffer, offset: int):
+        magic, version, num_columns, self.num_rows = _HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC:
+            raise SnapshotError('Not a KenPom snapshot')
+        if version > VERSION:
+            raise SnapshotError(f'Snapshot version {version} is newer than we understand')
+
+        position = offset + _HEADER.size
+        (self._as_of_index,) = _U32.unpack_from(buffer, position)
+        position += _U32.size
+        self._num_strings, blob_length = struct.unpack_from('<II', buffer, position)
+        position += 2 * _U32.size
+        if position + blob_length > len(buffer):
+            raise SnapshotError('Truncated KenPom snapshot')
+        self._strings_blob = (position, position + blob_length)
+        self._strings: List[str] = []
+        position += blob_length
+
+        self._columns: Dict[str, Tuple[int, int, int]] = {}
+        for _ in range(num_columns):
+            name_index, kind, column_offset, length = _COLUMN_ENTRY.unpack_from(buffer, position)
+            position += _COLUMN_ENTRY.size
+            if offset + column_offset + length > len(buffer):
+                raise SnapshotError('Truncated KenPom snapshot')
+            self._columns[self.string(name_index)] = (kind, offset + column_offset, length)
+
+    @property
+    def strings(self) -> List[str]:
+        if not self._strings and self._num_strings:
+            start, end = self._strings_blob
+            self._strings = bytes(self._buffer[start:end]).decode('utf-8').split('\0')
+        return self._strings
+
+    def string(self, index: int) -> str:
+        return self.strings[index]
+
+    @property
+    def as_of(self) -> str:
+        return self.string(self._as_of_index)
+
+    @property
+    def column_names(self) -> Sequence[str]:
+        return tuple(self._columns)
+
+    def column(self, name: str) -> Any:
+        """Return a column as it is stored in a `KenPomTable`.
+
+        Numeric columns come back as `array.array`, `conf` as its uint8 codes
+        (see `conf_labels`) and text columns as lists of strings.
+        """
+        kind, start, end = self._column_span(name)
+        payload = self._buffer[start:end]
+        if kind in _NUMERIC_KINDS:
+            return _from_little_endian(_NUMERIC_KINDS[kind], payload)
+        if kind == KIND_CATEGORY:
+            (num_labels,) = _U32.unpack_from(payload, 0)
+            codes_start = _U32.size * (num_labels + 1)
+            return array('B', payload[codes_start:])
+        strings = self.strings
+        return [strings[i] for i in _from_little_endian('I', payload)]
+
+    def conf_labels(self) -> List[str]:
+        _, start, _ = self._column_span('conf')
+        (num_labels,) = _U32.unpack_from(self._buffer, start)
+        labels_start = start + _U32.size
+        labels_end = labels_start + _U32.size * num_labels
+        labels = _from_little_endian('I', self._buffer[labels_start:labels_end])
+        return [self.strings[i] for i in labels]
+
+    def _column_span(self, name: str) -> Tuple[int, int, int]:
+        kind, start, length = self._columns[name]
+        return kind, start, start + length
+
+    def table(self) -> KenPomTable:
+        columns = {name: self.column(name) for name in FIELDS if name in self._columns}
+        for name in OPTIONAL_FIELDS:  # written before the field existed
+            columns.setdefault(name, array('i', [MISSING]) * self.num_rows)
+        return KenPomTable(columns, self.conf_labels())
+
+
+def loads(buffer, offset: int = 0) -> Tuple[KenPomTable, str]:
+    """Return `(table, as_of)` from a buffer holding a snapshot."""
+    reader = SnapshotReader(buffer, offset)
+    return reader.table(), reader.as_of
+
+
+def load(path) -> Tuple[KenPomTable, str]:
+    """Return `(table, as_of)` from a snapshot file."""
+    with open(path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # can't mmap an empty file
+            raise SnapshotError('Not a KenPom snapshot')
+        with buffer:
+            return loads(buffer)
@@ -0,0 +1,391 @@
+"""Column-oriented storage for one snapshot of KenPom data.
+
+A `KenPomTable` keeps one typed array per `KenPom` field rather than one object
+per school. It is also a read-only mapping of abbrev -> row view, so code that
+was written against a `KenPomDict` (`.items()`, `.values()`, `data['vt']`) keeps
+working, while filters, sorts and aggregates can run over whole columns.
+
+NumPy is used for the column scans of larger tables when it is installed;
+otherwise we fall back to plain Python over `array.array` columns. It is only
+imported once a table that big shows up, a one-off lookup against this
+season's few hundred schools doesn't need it.
+"""
+from array import array
+import dataclasses
+import operator
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TYPE_CHECKING,
+    TypeVar,
+    Union,
+)
+
+from datastructures import FIELD_CONVERTERS, KenPom, KenPomDict
+
+_np: Any = ...  # NumPy, None if it isn't installed, `...` until first needed
+# Below this many rows plain Python scans about as fast as NumPy, without the import
+NUMPY_MIN_ROWS = 2048
+
+FIELDS = tuple(f.name for f in dataclasses.fields(KenPom))
+FIELD_TYPES = {f.name: f.type for f in dataclasses.fields(KenPom)}
+DEFAULTS = tuple(f.default for f in dataclasses.fields(KenPom))
+
+# `i` is a 32 bit signed int on every platform we care about, ranks fit nicely.
+TYPECODES = {int: 'i', float: 'd'}
+NUMPY_DTYPES = {'i': 'int32', 'd': 'float64', 'B': 'uint8'}
+
+# Optional ints (the tourney seed) are stored as int32 too, with `MISSING` for None
+OPTIONAL_FIELDS = tuple(f for f in FIELDS if FIELD_TYPES[f] == Optional[int])
+MISSING = 0
+
+NUMERIC_FIELDS = tuple(f for f in FIELDS if FIELD_TYPES[f] in TYPECODES or f in OPTIONAL_FIELDS)
+CATEGORICAL_FIELDS = ('conf',)
+STRING_FIELDS = tuple(f for f in FIELDS if f not in NUMERIC_FIELDS + CATEGORICAL_FIELDS)
+
+T = TypeVar('T')
+
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '=': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
+
+
+def load_numpy() -> Any:
+    """Return the numpy module, importing it the first time, or None."""
+    global _np
+    if _np is ...:
+        try:
+            import numpy
+
+            _np = numpy
+        except ImportError:  # pragma: no cover - exercised by monkeypatching `_np` in tests
+            _np = None
+    return _np
+
+
+def numpy_for(rows: int) -> Any:
+    """Return the numpy module if worth it for `rows` rows, or None.
+
+    See `NUMPY_MIN_ROWS`.
+    """
+    return load_numpy() if rows >= NUMPY_MIN_ROWS else None
+
+
+def is_ndarray(column: Any) -> bool:
+    """Whether a column is a NumPy array, see `KenPomTable.vector`."""
+    return _np is not None and _np is not ... and isinstance(column, _np.ndarray)
+
+
+class KenPomRow:
+    """Read-only view of one row of a `KenPomTable`.
+
+    Exposes the same attributes as `KenPom`, so display code can't tell them
+    apart. Properties for each field are attached below the class.
+    """
+
+    __slots__ = ('_table', '_index')
+
+    if TYPE_CHECKING:
+        rank: int
+        name: str
+        conf: str
+        record: str
+        eff_margin: float
+        offense: float
+        off_rank: int
+        defense: float
+        def_rank: int
+        tempo: float
+        tempo_rank: int
+        luck: float
+        luck_rank: int
+        sos_eff_margin: float
+        sos_eff_margin_rank: int
+        sos_off: float
+        sos_off_rank: int
+        sos_def: float
+        sos_def_rank: int
+        sos_non_conf: float
+        sos_non_conf_rank: int
+        abbrev: str
+        seed: Optional[int]
+
+    def __init__(self, table: 'KenPomTable', index: int):
+        self._table = table
+        self._index = index
+
+    def astuple(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, f) for f in FIELDS)
+
+    def to_kenpom(self) -> KenPom:
+        return KenPom(*self.astuple())
+
+    def __eq__(self, other):
+        if isinstance(other, (KenPomRow, KenPom)):
+            return self.astuple() == tuple(getattr(other, f) for f in FIELDS)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        values = ', '.join(f'{f}={getattr(self, f)!r}' for f in FIELDS)
+        return f'KenPomRow({values})'
+
+
+def _column_property(name: str) -> property:
+    def getter(row: KenPomRow):
+        return row._table._columns[name][row._index]
+
+    return property(getter, doc=f'`{name}` value for this row.')
+
+
+def _optional_property(name: str) -> property:
+    def getter(row: KenPomRow):
+        value = row._table._columns[name][row._index]
+        return None if value == MISSING else value
+
+    return property(getter, doc=f'`{name}` value for this row, or None.')
+
+
+def _conf_property() -> property:
+    def getter(row: KenPomRow):
+        table = row._table
+        return table.conf_labels[table._columns['conf'][row._index]]
+
+    return property(getter, doc='`conf` label for this row.')
+
+
+for _field in FIELDS:
+    if _field in CATEGORICAL_FIELDS:
+        setattr(KenPomRow, _field, _conf_property())
+    elif _field in OPTIONAL_FIELDS:
+        setattr(KenPomRow, _field, _optional_property(_field))
+    else:
+        setattr(KenPomRow, _field, _column_property(_field))
+
+
+class KenPomTable(Mapping[str, KenPomRow]):
+    """Columnar snapshot of KenPom rows, keyed by abbrev.
+
+    Numeric fields live in `array.array` columns, `conf` is stored as small int
+    codes into `conf_labels`, and the remaining text fields are plain lists.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence], conf_labels: List[str]):
+        self._columns = columns
+        self.conf_labels = conf_labels
+        self._keys = [a.lower() for a in columns['abbrev']]
+        self._positions = {k: i for i, k in enumerate(self._keys)}
+        self._conf_codes = {c.lower(): i for i, c in enumerate(conf_labels)}
+        self._derived: Dict[str, Any] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any]) -> 'KenPomTable':
+        """Build a table from `KenPom` instances, or lookalikes."""
+        builder = KenPomTableBuilder()
+        for row in rows:
+            builder.append([getattr(row, f) for f in FIELDS])
+        return builder.build()
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'KenPomTable':
+        return cls.from_rows(data.values())
+
+    # Mapping interface, keyed by lower case abbrev
+    def __getitem__(self, key: str) -> KenPomRow:
+        return KenPomRow(self, self._positions[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions
+
+    def __repr__(self):
+        return f'<KenPomTable {len(self)} rows>'
+
+    # Row and column access
+    def row(self, index: int) -> KenPomRow:
+        return KenPomRow(self, index)
+
+    def rows(self, indices: Optional[Iterable[int]] = None) -> Iterator[KenPomRow]:
+        for index in range(len(self)) if indices is None else indices:
+            yield KenPomRow(self, index)
+
+    def position(self, key: str) -> int:
+        """Return the row index of the school with abbrev `key`."""
+        return self._positions[key]
+
+    def column(self, name: str) -> Any:
+        """Return the raw storage for column `name`.
+
+        `conf` comes back as its integer codes, see `conf_labels`, and optional
+        fields like `seed` have `MISSING` where a row has no value.
+        """
+        return self._columns[name]
+
+    def vector(self, name: str) -> Any:
+        """Return a numeric column as a zero-copy NumPy array.
+
+        Without NumPy, or for short columns, this is just the underlying
+        `array.array`.
+        """
+        column = self._columns[name]
+        np = numpy_for(len(column))
+        if not isinstance(column, array) or np is None:
+            return column
+        return np.frombuffer(column, dtype=NUMPY_DTYPES[column.typecode])
+
+    def conf_code(self, conf: str) -> int:
+        """Return the code for a conf name, -1 if unknown.
+
+        Names match without regard to case.
+        """
+        return self._conf_codes.get(conf.lower(), -1)
+
+    def derived(self, key: str, build: Callable[['KenPomTable'], T]) -> T:
+        """Return a structure computed from this table, once.
+
+        Tables are never modified, so indexes, sort orders and the like can be
+        cached on the snapshot itself and dropped along with it.
+        """
+        if key not in self._derived:
+            self._derived[key] = build(self)
+        return self._derived[key]
+
+    # Vectorized helpers
+    def where(self, name: str, op: str, value: Any) -> List[int]:
+        """Return the row indices where `column <op> value` holds.
+
+        Rows missing an optional field never match.
+        """
+        compare = OPERATORS[op]
+        column = self.vector(name)
+        optional = name in OPTIONAL_FIELDS
+        if is_ndarray(column):
+            matches = compare(column, value)
+            return _np.flatnonzero(matches & (column != MISSING) if optional else matches).tolist()
+        if optional:
+            return [i for i, v in enumerate(column) if v != MISSING and compare(v, value)]
+        return [i for i, v in enumerate(column) if compare(v, value)]
+
+    def where_conf(self, confs: Iterable[str]) -> List[int]:
+        """Return the rows of schools in any of `confs`."""
+        codes = [self.conf_code(c) for c in confs]
+        codes = [c for c in codes if c >= 0]
+        column = self.vector('conf')
+        if is_ndarray(column):
+            return _np.flatnonzero(_np.isin(column, codes)).tolist()
+        wanted = set(codes)
+        return [i for i, c in enumerate(column) if c in wanted]
+
+    def argsort(self, name: str, reverse: bool = False) -> List[int]:
+        """Return row indices ordered by column `name`.
+
+        Ties are kept in page order.
+        """
+        column = self.vector(name)
+        if is_ndarray(column):
+            order = _np.argsort(-column if reverse else column, kind='stable')
+            return order.tolist()
+        return sorted(range(len(column)), key=column.__getitem__, reverse=reverse)
+
+    def take(self, indices: Iterable[int]) -> 'KenPomTable':
+        """Return a new table of just the rows at `indices`."""
+        return KenPomTable(_TakenColumns(self._columns, list(indices)), self.conf_labels)
+
+    def max_len(self, name: str) -> int:
+        """Return the length of the longest value in a text column."""
+        return max(map(len, self._columns[name]), default=0)
+
+
+# Either flavor of snapshot works anywhere we filter or display data
+KenPomData = Union[KenPomDict, KenPomTable]
+
+
+def as_table(data: KenPomData) -> KenPomTable:
+    """Return `data` as a `KenPomTable`, converting a `KenPomDict`."""
+    return data if isinstance(data, KenPomTable) else KenPomTable.from_dict(data)
+
+
+class _TakenColumns(dict):
+    """Columns for a `take`n table, copied out when used.
+
+    Display code only touches a handful of the columns of a filtered table, so
+    there's no point copying the rest.
+    """
+
+    def __init__(self, parent: Mapping[str, Sequence], indices: List[int]):
+        super().__init__()
+        self._parent = parent
+        self._indices = indices
+
+    def __missing__(self, name: str):
+        column = self._parent[name]
+        values = list(map(column.__getitem__, self._indices))
+        self[name] = array(column.typecode, values) if isinstance(column, array) else values
+        return self[name]
+
+
+class KenPomTableBuilder:
+    """Accumulate rows of values (or raw text) into typed columns."""
+
+    def __init__(self):
+        self._columns: Dict[str, Any] = {}
+        for name in FIELDS:
+            if name in OPTIONAL_FIELDS:
+                self._columns[name] = array('i')
+            elif name in NUMERIC_FIELDS:
+                self._columns[name] = array(TYPECODES[FIELD_TYPES[name]])
+            elif name in CATEGORICAL_FIELDS:
+                self._columns[name] = array('B')
+            else:
+                self._columns[name] = []
+        self._conf_labels: List[str] = []
+        self._conf_codes: Dict[str, int] = {}
+        self._appenders = list(zip(FIELD_CONVERTERS, map(self._appender, FIELDS)))
+
+    def _appender(self, name: str) -> Callable[[Any], None]:
+        if name in CATEGORICAL_FIELDS:
+            return self._append_conf
+        append = self._columns[name].append
+        if name in OPTIONAL_FIELDS:
+            return lambda value: append(MISSING if value is None else value)
+        return append
+
+    def _append_conf(self, conf: str):
+        code = self._conf_codes.get(conf)
+        if code is None:
+            code = self._conf_codes[conf] = len(self._conf_labels)
+            self._conf_labels.append(conf)
+        self._columns['conf'].append(code)
+
+    def append(self, values: Sequence[Any]):
+        """Append one row, values in `KenPom` field order.
+
+        Trailing optional fields may be left off.
+        """
+        if len(values) < len(FIELDS):
+            values = [*values, *DEFAULTS[len(values) :]]
+        for (convert, append), value in zip(self._appenders, values):
+            append(convert(value))
+
+    def build(self) -> KenPomTable:
+        return KenPomTable(self._columns, self._conf_labels)
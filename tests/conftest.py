@@ -0,0 +1,20 @@
+"""Fixtures shared across the test modules."""
+
+import pytest
+
+import table
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    """Run a test with NumPy and with the `array` fallback.
+
+    Tables only hand NumPy columns of `NUMPY_MIN_ROWS` or more, so that is
+    lowered for the small test page to take the NumPy paths too.
+    """
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(table, 'NUMPY_MIN_ROWS', 0)
+    else:
+        monkeypatch.setattr(table, '_np', None)
+    return request.param
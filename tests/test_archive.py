@@ -0,0 +1,123 @@
+"""Tests for the snapshot archive and its time-series queries."""
+
+import dataclasses
+import datetime
+
+import pytest
+
+from archive import Archive, ArchiveError, as_of_date
+from kenpom import parse_data
+from tests.test_kenpom import _fetch_test_content
+
+DICT_DATA, AS_OF = parse_data(_fetch_test_content())
+DAY_1 = datetime.date(2022, 12, 17)
+
+
+def _swap_ranks(data, a, b):
+    """Return a copy of `data` with `a` and `b` trading ranks."""
+    data = dict(data)
+    data[a], data[b] = (
+        dataclasses.replace(data[a], rank=data[b].rank),
+        dataclasses.replace(data[b], rank=data[a].rank),
+    )
+    return data
+
+
+def _fill(path):
+    day_2 = _swap_ranks(DICT_DATA, 'vt', 'conn')
+    day_9 = _swap_ranks(day_2, 'wof', 'hou')
+    with Archive(path) as archive:
+        assert archive.append(DICT_DATA, AS_OF, DAY_1)
+        assert archive.append(day_9, AS_OF, DAY_1 + datetime.timedelta(days=8))
+        # Out of order is fine, same date or same content is skipped
+        assert archive.append(day_2, AS_OF, DAY_1 + datetime.timedelta(days=1))
+        assert not archive.append(day_2, AS_OF, DAY_1 + datetime.timedelta(days=1))
+        assert not archive.append(day_9, AS_OF, DAY_1 + datetime.timedelta(days=9))
+
+
+def test_append_and_reopen(tmp_path):
+    path = tmp_path / 'kenpom.kpa'
+    _fill(path)
+    with Archive(path) as archive:
+        assert len(archive) == 3
+        assert archive.dates() == [
+            DAY_1,
+            DAY_1 + datetime.timedelta(days=1),
+            DAY_1 + datetime.timedelta(days=8),
+        ]
+        table, as_of = archive.load(DAY_1)
+        assert as_of == AS_OF
+        assert table == DICT_DATA
+        with pytest.raises(KeyError):
+            archive.load(DAY_1 - datetime.timedelta(days=1))
+
+
+def test_append_after_torn_write(tmp_path):
+    path = tmp_path / 'kenpom.kpa'
+    day_2 = _swap_ranks(DICT_DATA, 'vt', 'conn')
+    with Archive(path) as archive:
+        archive.append(DICT_DATA, AS_OF, DAY_1)
+        archive.append(day_2, AS_OF, DAY_1 + datetime.timedelta(days=1))
+    with open(path, 'r+b') as f:  # a crash partway through writing day 2
+        f.truncate(path.stat().st_size - 100)
+
+    day_3 = _swap_ranks(day_2, 'wof', 'hou')
+    with Archive(path) as archive:
+        assert archive.dates() == [DAY_1]
+        assert archive.append(day_3, AS_OF, DAY_1 + datetime.timedelta(days=2))
+    with Archive(path) as archive:
+        assert archive.dates() == [DAY_1, DAY_1 + datetime.timedelta(days=2)]
+        table, _ = archive.load(DAY_1 + datetime.timedelta(days=2))
+        assert table == day_3
+
+
+def test_as_of_date():
+    assert as_of_date(AS_OF, DAY_1) == DAY_1
+    # Run on New Year's Day, before the nightly update
+    assert as_of_date(AS_OF, datetime.date(2023, 1, 1)) == DAY_1
+    assert as_of_date('Data through games of March 3', datetime.date(2024, 3, 3)).year == 2024
+    assert as_of_date('games played on Saturday, February 29', datetime.date(2025, 3, 1)) == (
+        datetime.date(2024, 2, 29)
+    )
+    assert as_of_date('') is None
+
+
+def test_append_dates_by_as_of(tmp_path):
+    with Archive(tmp_path / 'kenpom.kpa') as archive:
+        assert archive.append(DICT_DATA, AS_OF)
+        (date,) = archive.dates()
+    assert (date.month, date.day) == (12, 17) and date <= datetime.date.today()
+
+
+def test_trajectory(tmp_path):
+    path = tmp_path / 'kenpom.kpa'
+    _fill(path)
+    with Archive(path) as archive:
+        points = archive.trajectory(['VT', 'wof'], days=30)
+        vt = DICT_DATA['vt']
+        assert [p[1][0] for p in points['vt']] == [vt.rank, 1, 1]
+        assert points['vt'][0] == (DAY_1, (vt.rank, vt.off_rank, vt.def_rank))
+        assert [p[1][0] for p in points['wof']][-1] == 2
+
+        # Only the last few days
+        assert len(archive.trajectory(['vt'], days=7)['vt']) == 2
+        assert len(archive.trajectory(['vt'], days=6)['vt']) == 1
+
+
+def test_movers(tmp_path):
+    path = tmp_path / 'kenpom.kpa'
+    _fill(path)
+    with Archive(path) as archive:
+        movers = archive.movers(days=7)
+        assert {m.abbrev for m in movers[:2]} == {'WOF', 'HOU'}
+        wofford = [m for m in movers if m.abbrev == 'WOF'][0]
+        assert wofford.after == 2
+        assert wofford.change == DICT_DATA['wof'].rank - 2
+        assert archive.movers(days=30) == []
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / 'junk.kpa'
+    path.write_bytes(b'definitely not an archive')
+    with pytest.raises(ArchiveError):
+        Archive(path)
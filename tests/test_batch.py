@@ -0,0 +1,35 @@
+"""Tests for batch mode, many filters against one snapshot."""
+
+import io
+
+from batch import read_filters, render, run_batch
+from kenpom import filter_data, parse_data, write_to_console
+from tests.test_kenpom import _fetch_test_content
+
+TABLE_DATA, AS_OF = parse_data(_fetch_test_content(), as_table=True)
+FILTERS = ['acc', 'vt,wof', '7', 'valley', '-1', 'foobar']
+
+
+def test_read_filters():
+    lines = io.StringIO('acc\n\n  # the usual suspects\n vt,wof \nALL\n')
+    assert read_filters(lines) == ['acc', 'vt,wof', '0']
+
+
+def test_render_matches_single_queries():
+    expected = io.StringIO()
+    filtered, meta = filter_data(TABLE_DATA, 'vt,wof')
+    write_to_console(filtered, meta, AS_OF, stream=expected)
+    assert render(TABLE_DATA, AS_OF, 'vt,wof') == '==> vt,wof <==\n' + expected.getvalue()
+
+    assert render(TABLE_DATA, AS_OF, '-1').startswith('==> -1 <==\nerror: ')
+    assert render(TABLE_DATA, AS_OF, 'vt', 'jsonl').startswith(
+        '{"query": "vt", "num_teams": 1}\n{"rank": 25'
+    )
+    assert render(TABLE_DATA, AS_OF, 'vt', 'csv').startswith('# query: vt\nrank,name,')
+
+
+def test_pool_output_matches_serial():
+    serial = list(run_batch(TABLE_DATA, AS_OF, FILTERS, 'csv', workers=1))
+    pooled = list(run_batch(TABLE_DATA, AS_OF, FILTERS * 10, 'csv', workers=2))
+    assert len(serial) == len(FILTERS)
+    assert pooled == serial * 10
@@ -0,0 +1,79 @@
+"""Tests for the tournament simulator."""
+
+import pytest
+
+import bracket
+from kenpom import parse_data
+from matchup import predict
+from table import KenPomTable
+from tests.test_kenpom import _fetch_test_content
+
+TABLE_DATA, AS_OF = parse_data(_fetch_test_content(), as_table=True)
+
+
+def test_bracket_order():
+    assert bracket.bracket_order(2) == [1, 2]
+    assert bracket.bracket_order(8) == [1, 8, 4, 5, 2, 7, 3, 6]
+    assert bracket.round_names(16) == ['Last 8', 'Last 4', 'Last 2', 'Champ']
+
+
+def test_default_field():
+    field = bracket.default_field(TABLE_DATA, 4)
+    ranks = [TABLE_DATA.column('rank')[row] for row in field]
+    assert ranks == [1, 4, 2, 3]
+    with pytest.raises(ValueError):
+        bracket.default_field(TABLE_DATA, 6)
+
+
+def test_seeded_field():
+    assert bracket.seeded_field(TABLE_DATA) is None  # not tourney time
+
+    # Seed the top 68 by rank 1, 1, 1, 1, 2, ... with six 16 seeds
+    rows = [row.to_kenpom() for row in TABLE_DATA.values()]
+    for i, row in enumerate(rows[:68]):
+        row.seed = min(i // 4 + 1, 16)
+    seeded = KenPomTable.from_rows(rows)
+    field = bracket.default_field(seeded)
+
+    ranks = [seeded.column('rank')[row] for row in field]
+    assert len(field) == 64 and len(set(field)) == 64
+    assert ranks[:4] == [1, 64, 32, 33]  # S-curve: the best 1 seed gets the worst 16, 8 and 9
+    assert 4 in ranks[16:32]  # and it meets the worst 1 seed in the semis
+    assert not {65, 66, 67, 68} & set(ranks)  # First Four losers
+
+
+def test_read_bracket():
+    lines = ['# East\n', 'VT\n', 'wofford\n', '\n', 'conn\n', 'Houston\n']
+    field = bracket.read_bracket(TABLE_DATA, lines)
+    assert [TABLE_DATA.column('abbrev')[row] for row in field] == ['VT', 'WOF', 'CONN', 'HOU']
+    with pytest.raises(ValueError):
+        bracket.read_bracket(TABLE_DATA, ['vt', 'wof', 'conn'])
+    with pytest.raises(KeyError):
+        bracket.read_bracket(TABLE_DATA, ['vt', 'nope'])
+
+
+def test_simulate(backend):
+    field = bracket.read_bracket(TABLE_DATA, ['vt', 'wof', 'conn', 'hou'])
+    results = bracket.simulate(TABLE_DATA, field, sims=20_000, seed=3, workers=1)
+
+    assert list(results) == ['VT', 'WOF', 'CONN', 'HOU']
+    assert sum(r[0] for r in results.values()) == pytest.approx(2)
+    assert sum(r[1] for r in results.values()) == pytest.approx(1)
+    for first, final in results.values():
+        assert final <= first
+
+    vt_wof = predict(TABLE_DATA, 'vt', 'wof').win_probability
+    assert results['VT'][0] == pytest.approx(vt_wof, abs=0.02)
+    assert results['VT'][0] + results['WOF'][0] == pytest.approx(1)
+
+    with pytest.raises(ValueError):
+        bracket.simulate(TABLE_DATA, field, sims=0)
+
+
+def test_simulate_is_reproducible(backend, monkeypatch):
+    monkeypatch.setattr(bracket, 'BATCH_SIMS', 1000)
+    field = bracket.default_field(TABLE_DATA, 8)
+    first = bracket.simulate(TABLE_DATA, field, sims=2500, seed=7, workers=1)
+    assert bracket.simulate(TABLE_DATA, field, sims=2500, seed=7, workers=1) == first
+    assert bracket.simulate(TABLE_DATA, field, sims=2500, seed=8, workers=1) != first
+    assert bracket.simulate(TABLE_DATA, field, sims=2500, seed=7, workers=2) == first
@@ -0,0 +1,68 @@
+"""Tests for the per-conference summaries.
+
+Checked against grouping the parsed dict.
+"""
+
+import io
+import json
+import statistics
+
+import pytest
+
+import conferences
+from kenpom import parse_data
+from tests.test_kenpom import _fetch_test_content
+
+DICT_DATA, AS_OF = parse_data(_fetch_test_content())
+TABLE_DATA, _ = parse_data(_fetch_test_content(), as_table=True)
+
+
+def test_summarize_matches_filtering(backend):
+    summaries = conferences.summarize(TABLE_DATA)
+    assert len(summaries) == len(TABLE_DATA.conf_labels)
+    assert sum(s.teams for s in summaries) == len(TABLE_DATA)
+    means = [s.stats['eff_margin']['mean'] for s in summaries]
+    assert means == sorted(means, reverse=True)
+
+    for summary in summaries:
+        teams = [t for t in DICT_DATA.values() if t.conf == summary.conf]
+        assert summary.teams == len(teams)
+        by_rank = sorted(teams, key=lambda t: t.rank)
+        assert (summary.best, summary.worst) == (by_rank[0].abbrev, by_rank[-1].abbrev)
+        for field in conferences.STAT_FIELDS:
+            values = [getattr(t, field) for t in teams]
+            expected = [statistics.mean(values), statistics.median(values)]
+            expected += [min(values), max(values)]
+            actual = [summary.stats[field][stat] for stat in conferences.STATS]
+            assert actual == pytest.approx(expected), (summary.conf, field)
+
+
+def test_summary_is_cached_per_snapshot():
+    assert conferences.summary_for(TABLE_DATA) is conferences.summary_for(TABLE_DATA)
+
+
+def test_select_and_write():
+    summaries = conferences.select(conferences.summary_for(TABLE_DATA), ['acc', 'SEC'])
+    assert [s.conf for s in summaries] == ['SEC', 'ACC']
+
+    stream = io.StringIO()
+    conferences.write(summaries, AS_OF, 'table', stream)
+    lines = stream.getvalue().splitlines()
+    header = 'Conf Teams AdjEM Median Min Max Off Def Tempo SOS Best Worst'
+    assert lines[0].split() == header.split()
+    assert (
+        lines[3].split()
+        == 'ACC 15 +10.67 +10.79 -5.56 +22.95 108.5 97.8 67.7 +0.68 UVA LOU'.split()
+    )
+    assert lines[-2] == AS_OF
+
+    stream = io.StringIO()
+    conferences.write(summaries, AS_OF, 'jsonl', stream)
+    rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert rows[1]['conf'] == 'ACC' and rows[1]['teams'] == 15
+    assert rows[1]['tempo_min'] == min(t.tempo for t in DICT_DATA.values() if t.conf == 'ACC')
+
+    stream = io.StringIO()
+    conferences.write(summaries, AS_OF, 'csv', stream)
+    header, *rows = stream.getvalue().splitlines()
+    assert header.startswith('conf,teams,best,worst,eff_margin_mean,') and len(rows) == 2
@@ -1,5 +1,6 @@
 from datastructures import (
     CONF_NAMES,
+    KenPom,
     SCHOOL_ABBREVS,
     SCHOOL_DATA_BY_ABBREV,
     SCHOOL_DATA_BY_NAME,
@@ -32,3 +33,21 @@ def test_school_data_structure():
             assert key == key.lower().strip()
             if type(value) == str:
                 assert value == value.lower().strip()
+
+
+def test_kenpom_from_text_items():
+    """The fast path must type values like the constructor."""
+    text_items = ['41', 'Oregon', 'P12', '6-5', '+15.35', '110.9', '35', '95.6', '59']
+    text_items += ['67.2', '243', '-.040', '259', '+9.03', '16', '106.1', '22', '97.0']
+    text_items += ['13', '+6.49', '34', 'ORE']
+    fast = KenPom.from_text_items(text_items)
+    assert fast == KenPom(*text_items)
+    assert fast.rank == 41
+    assert fast.luck == -0.04
+    assert fast.abbrev == 'ORE'
+    assert fast.seed is None
+    assert not hasattr(fast, '__dict__')
+
+    seeded = KenPom.from_text_items(text_items + ['7'])
+    assert seeded == KenPom(*text_items, seed=7)
+    assert seeded.seed == 7
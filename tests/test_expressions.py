@@ -0,0 +1,89 @@
+"""Tests for filter expressions, against plain Python.
+
+Each is checked against the same predicate in plain Python.
+"""
+
+import pytest
+
+from expressions import compile_filter, ExpressionError, In, is_expression, parse
+from kenpom import filter_data, parse_data
+import percentiles
+from tests.test_kenpom import _fetch_test_content
+
+DICT_DATA, _ = parse_data(_fetch_test_content())
+
+
+@pytest.fixture
+def table_data(backend):
+    """A fresh table, scanned with each backend."""
+    data, _ = parse_data(_fetch_test_content(), as_table=True)
+    return data
+
+
+QUERIES = [
+    (
+        'conf in (acc, sec) and tempo < 66 and rank <= 100',
+        lambda t: t.conf in ('ACC', 'SEC') and t.tempo < 66 and t.rank <= 100,
+    ),
+    (
+        'not (luck > 0 or conf = acc) and rank<=10',
+        lambda t: t.luck <= 0 and t.conf != 'ACC' and t.rank <= 10,
+    ),
+    ('name = "saint mary\'s" or abbrev in (vt,WOF)', lambda t: t.abbrev in ('SMC', 'VT', 'WOF')),
+    ("record = 12-0 or record == '11-1'", lambda t: t.record in ('12-0', '11-1')),
+    ('seed != 1 and rank < 50', lambda t: False),  # no seeds in December
+    ('not seed = 1 and rank < 5', lambda t: t.rank < 5),
+    ('conf != b10 and off_rank <= 5', lambda t: t.conf != 'B10' and t.off_rank <= 5),
+    ('sos_eff_margin > 5 or luck < -0.1', lambda t: t.sos_eff_margin > 5 or t.luck < -0.1),
+    ('luck > .05 or luck < -.040', lambda t: t.luck > 0.05 or t.luck < -0.04),
+]
+
+
+@pytest.mark.parametrize('query, predicate', QUERIES)
+def test_expression_rows(table_data, query, predicate):
+    expected = [i for i, t in enumerate(DICT_DATA.values()) if predicate(t)]
+    assert compile_filter(query).rows(table_data) == expected
+
+
+def test_percentile_columns(table_data):
+    stats = percentiles.percentiles_for(table_data)
+    expected = [
+        i
+        for i, t in enumerate(DICT_DATA.values())
+        if stats.value(t.abbrev, 'defense_pct') >= 90 and t.conf == 'SEC'
+    ]
+    assert compile_filter('defense_pct >= 90 and conf = sec').rows(table_data) == expected
+
+
+def test_filter_data():
+    query = 'conf in (acc,sec) and luck > 0'
+    from_dict, meta = filter_data(DICT_DATA, query)
+    from_table, _ = filter_data(parse_data(_fetch_test_content(), as_table=True)[0], query)
+    assert list(from_dict) == list(from_table) and meta['num_teams'] == len(from_dict)
+    assert all(t.conf in ('ACC', 'SEC') and t.luck > 0 for t in from_dict.values())
+
+    # Everything that isn't an expression means what it always has
+    for old in ('10', 'acc,sec', 'vt,wof', 'valley', "saint mary's", 'seed<=4'):
+        assert not is_expression(old) or old == 'seed<=4'
+    assert [t.abbrev for t in filter_data(DICT_DATA, 'vt,wof')[0].values()] == ['VT', 'WOF']
+
+
+def test_parse_and_cache():
+    assert parse('conf in (ACC, sec)') == In('conf', ('acc', 'sec'))
+    assert compile_filter('tempo < 66') is compile_filter('tempo < 66')
+
+
+@pytest.mark.parametrize(
+    'query, message',
+    [
+        ('tempo <', 'Expected value, found the end'),
+        ('foo < 3', "No field 'foo'"),
+        ('conf < acc', 'conf can only be compared with =, != or in'),
+        ('tempo = fast', "tempo needs a number, not 'fast'"),
+        ('(rank < 5', 'Expected ), found the end'),
+        ('rank < 5 rank', "Unexpected 'rank'"),
+    ],
+)
+def test_errors(query, message):
+    with pytest.raises(ExpressionError, match=message.replace('(', r'\(').replace(')', r'\)')):
+        compile_filter(query)
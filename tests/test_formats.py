@@ -0,0 +1,79 @@
+"""Tests for the machine-readable output formats."""
+
+import csv
+import io
+import json
+
+import pytest
+
+import formats
+from formats import FormatError
+from kenpom import filter_data, parse_data
+from table import FIELDS
+from tests.test_kenpom import _fetch_test_content
+
+DICT_DATA, AS_OF = parse_data(_fetch_test_content())
+TABLE_DATA, _ = parse_data(_fetch_test_content(), as_table=True)
+
+
+class _CountingStream(io.StringIO):
+    writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_jsonl():
+    stream = io.StringIO()
+    formats.write(TABLE_DATA, AS_OF, 'jsonl', stream)
+    rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(rows) == len(DICT_DATA)
+    assert list(rows[0]) == list(FIELDS)
+    vt = next(r for r in rows if r['abbrev'] == 'VT')
+    assert vt == {f: getattr(DICT_DATA['vt'], f) for f in FIELDS}
+
+
+def test_csv_filtered_and_from_dict():
+    filtered, _ = filter_data(TABLE_DATA, 'vt,wof')
+    stream = io.StringIO()
+    formats.write(filtered, AS_OF, 'csv', stream)
+    header, *rows = csv.reader(io.StringIO(stream.getvalue()))
+    assert header == list(FIELDS)
+    assert [r[FIELDS.index('abbrev')] for r in rows] == ['VT', 'WOF']
+    assert rows[0][FIELDS.index('conf')] == 'ACC'
+
+    from_dict = io.StringIO()
+    formats.write({k: DICT_DATA[k] for k in ('vt', 'wof')}, AS_OF, 'csv', from_dict)
+    assert from_dict.getvalue() == stream.getvalue()
+
+
+def test_writes_in_batches():
+    stream = _CountingStream()
+    formats.write(TABLE_DATA, AS_OF, 'jsonl', stream, batch_rows=100)
+    assert stream.writes == 4  # 363 rows
+
+    stream = _CountingStream()
+    empty, _ = filter_data(TABLE_DATA, 'foobar')
+    formats.write(empty, AS_OF, 'csv', stream)
+    assert stream.getvalue() == ','.join(FIELDS) + '\n'
+
+
+def test_arrow():
+    pa = pytest.importorskip('pyarrow')
+    stream = io.BytesIO()
+    formats.write(TABLE_DATA, AS_OF, 'arrow', stream, batch_rows=100)
+    reader = pa.ipc.open_stream(stream.getvalue())
+    assert reader.schema.metadata == {b'as_of': AS_OF.encode('utf-8')}
+    batches = list(reader)
+    assert [b.num_rows for b in batches] == [100, 100, 100, 63]
+    arrow_table = pa.Table.from_batches(batches)
+    assert arrow_table.column_names == list(FIELDS)
+    assert arrow_table.column('conf').to_pylist()[:2] == ['BE', 'Amer']
+    assert arrow_table.column('luck').to_pylist() == list(TABLE_DATA.column('luck'))
+    assert arrow_table.column('seed').null_count == len(TABLE_DATA)  # not tourney time
+
+
+def test_unknown_format():
+    with pytest.raises(FormatError):
+        formats.write(TABLE_DATA, AS_OF, 'xml', io.StringIO())
@@ -0,0 +1,88 @@
+"""Tests for typo-tolerant name, abbrev and conference lookups."""
+
+import io
+import timeit
+
+import pytest
+
+import fuzzy
+from fuzzy import edit_distance, FuzzyIndex, Suggestion
+from kenpom import filter_data, parse_data, write_to_console
+from tests.test_kenpom import _fetch_test_content
+
+DICT_DATA, AS_OF = parse_data(_fetch_test_content())
+TABLE_DATA, _ = parse_data(_fetch_test_content(), as_table=True)
+
+
+def test_edit_distance():
+    assert edit_distance('', 'acc') == 3
+    assert edit_distance('acc', 'acc') == 0
+    assert edit_distance('kitten', 'sitting') == 3
+    assert edit_distance('uconn', 'conn') == 1
+
+
+def test_suggest():
+    index = FuzzyIndex(['Virginia', 'Virginia Tech', 'West Virginia', 'Gonzaga'], ['vt'], ['acc'])
+    assert [s.text for s in index.suggest('virgina tech')] == ['virginia tech', 'virginia']
+    assert [s.text for s in index.suggest('virgina')][-1] == 'west virginia'
+    assert index.suggest('acx') == [Suggestion('acc', 'conf', pytest.approx(2 / 3))]
+    assert index.suggest('vx') == []  # one edit is too much of a two letter abbrev
+    assert index.suggest('xyzzy') == []
+
+    assert index.correct('gonzga').text == 'gonzaga'
+    assert index.correct('virgina tech').text == 'virginia tech'
+    assert fuzzy.default_index().correct('duk') is None  # Duke or Duquesne?
+
+    assert index.known('tech') and index.known('vt') and not index.known('gonzga')
+
+
+def test_default_index_is_fast():
+    index = fuzzy.default_index()
+    assert index is fuzzy.default_index()
+    terms = ['gonzga', 'virgina tech', 'uconn', 'sant marys', 'xyzzy', 'st']
+    seconds = min(timeit.repeat(lambda: [index.suggest(t) for t in terms], number=20, repeat=3))
+    assert seconds / (20 * len(terms)) < 0.001
+
+
+@pytest.mark.parametrize('data', [DICT_DATA, TABLE_DATA], ids=['dict', 'table'])
+def test_filter_data_corrects_typos(data):
+    filtered, meta = filter_data(data, 'virgina+tech')
+    assert [t.abbrev for t in filtered.values()] == ['VT']
+    assert meta['corrected'] == {'virgina tech': 'virginia tech'}
+
+    # A corrected name finds what the name spelled right would
+    for typo, spelled_right in (
+        ('virgina', 'virginia'),
+        ('gonzga,virginia', 'gonzaga,virginia'),
+        ('virgina+tech,wof', 'virginia+tech,wof'),
+    ):
+        filtered, _ = filter_data(data, typo)
+        assert list(filtered) == list(filter_data(data, spelled_right)[0])
+    assert {t.abbrev for t in filter_data(data, 'virgina')[0].values()} >= {'UVA', 'WVU', 'VT'}
+    assert {t.abbrev for t in filter_data(data, 'gonzga,virginia')[0].values()} >= {'GONZ', 'UVA'}
+
+    filtered, meta = filter_data(data, 'acx,sant marys')
+    assert not filtered
+    assert meta['suggestions'] == {'acx': ['acc', 'acu'], 'sant marys': ["saint mary's"]}
+
+    # Only corrections in the branch that applied are reported
+    filtered, meta = filter_data(data, 'vt,virgina tech')
+    assert [t.abbrev for t in filtered.values()] == ['VT'] and 'corrected' not in meta
+    _, meta = filter_data(data, 'acc,gonzga')
+    assert 'corrected' not in meta
+
+    # Exact and substring matches are left alone
+    for user_input in ('vt, wof', 'acc', 'valley', '10'):
+        _, meta = filter_data(data, user_input)
+        assert 'corrected' not in meta and 'suggestions' not in meta
+
+
+def test_write_corrections():
+    stream = io.StringIO()
+    write_to_console(*filter_data(TABLE_DATA, 'gonzga'), AS_OF, stream=stream)
+    assert 'Showing gonzaga for gonzga\n' in stream.getvalue()
+
+    stream = io.StringIO()
+    write_to_console(*filter_data(TABLE_DATA, 'sant marys,xyzzy'), AS_OF, stream=stream)
+    assert "Nothing matches sant marys, did you mean saint mary's?\n" in stream.getvalue()
+    assert 'Nothing matches xyzzy\n' in stream.getvalue()
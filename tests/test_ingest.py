@@ -0,0 +1,71 @@
+"""Tests for backfilling an archive from saved pages."""
+
+import datetime
+import tarfile
+
+from archive import Archive
+from ingest import ingest, page_date
+from tests.test_kenpom import _fetch_test_content
+
+HTML_CONTENT = _fetch_test_content()
+
+
+def _save_pages(directory):
+    directory.mkdir()
+    (directory / 'kenpom-2022-12-18.html').write_text(HTML_CONTENT)
+    # A renamed school and a row that lost a cell, as if the page layout changed
+    drifted = HTML_CONTENT.replace('>Wofford<', '>Wofford Terriers<').replace(
+        '<td class="hard_left">1</td>', '', 1
+    )
+    (directory / '20221219.html').write_text(drifted)
+    (directory / 'notes.txt').write_text('not a page')
+    (directory / '2022-12-20.html').write_text('<html>gone</html>')
+    return directory
+
+
+def test_page_date():
+    assert page_date('pages/kenpom-2023-03-01.html', 0) == datetime.date(2023, 3, 1)
+    assert page_date('20230301.html', 0) == datetime.date(2023, 3, 1)
+    mtime = datetime.datetime(2023, 2, 1, 12).timestamp()
+    assert page_date('front-page.html', mtime) == datetime.date(2023, 2, 1)
+
+
+def test_ingest_directory(tmp_path):
+    source = _save_pages(tmp_path / 'pages')
+    with Archive(tmp_path / 'kenpom.kpa') as archive:
+        reports = list(ingest(archive, source, workers=2))
+        assert [r.name for r in reports] == [
+            '2022-12-20.html',
+            '20221219.html',
+            'kenpom-2022-12-18.html',
+        ]
+        empty, drifted, clean = reports
+
+        assert clean.added and clean.rows == 363
+        assert clean.skipped_rows == [] and clean.unmatched_names == []
+
+        assert drifted.added and drifted.rows == 361
+        assert drifted.unmatched_names == ['Wofford Terriers']
+        assert [row[:2] for row in drifted.skipped_rows] == [['Connecticut', 'BE']]
+
+        assert empty.error == 'no team rows found' and not empty.added
+        assert archive.dates() == [datetime.date(2022, 12, 18), datetime.date(2022, 12, 19)]
+
+        # Running it again adds nothing new
+        assert not any(r.added for r in ingest(archive, source, workers=1))
+
+
+def test_ingest_tarball(tmp_path):
+    source = _save_pages(tmp_path / 'pages')
+    tarball = tmp_path / 'season.tar.gz'
+    with tarfile.open(tarball, 'w:gz') as tar:
+        tar.add(source, arcname='season')
+
+    with Archive(tmp_path / 'kenpom.kpa') as archive:
+        reports = list(ingest(archive, tarball, workers=1))
+        assert [r.name for r in reports] == [
+            'season/2022-12-20.html',
+            'season/20221219.html',
+            'season/kenpom-2022-12-18.html',
+        ]
+        assert len(archive) == 2
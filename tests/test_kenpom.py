@@ -11,11 +11,15 @@ import os
 from pathlib import Path
 import sys
 
+import pytest
+
 from kenpom import (
     NUM_SCHOOLS,
-    _massage_school_name,
+    _split_school_name,
     filter_data,
+    parse_args,
     parse_data,
+    ParseReport,
     write_to_console,
 )
 
@@ -89,6 +93,39 @@ def test_parse_data():
     assert num_41.abbrev == 'ORE'
 
 
+def test_parsers_agree():
+    html_content = _fetch_test_content()
+    assert parse_data(html_content, 'soup') == parse_data(html_content, 'stream')
+
+
+def test_parse_report():
+    html_content = _fetch_test_content().replace('>Hartford<', '>Hartford Hawks<')
+    # Drop a cell from Houston's row
+    html_content = html_content.replace('<td class="hard_left">2</td>', '', 1)
+    for parser in ('soup', 'stream'):
+        report = ParseReport([], [])
+        data, _ = parse_data(html_content, parser, report=report)
+        assert len(data) == NUM_SCHOOLS - 2
+        assert [row[:2] for row in report.skipped_rows] == [['Houston', 'Amer']]
+        assert report.unmatched_names == ['Hartford Hawks']
+
+
+def test_stream_parser_tourney_mode():
+    cells = ''.join(f'<td>{i}</td>' for i in range(2, 19))
+    html_content = (
+        '<html><body><span class="update">Data through <a>Monday</a>\n(5 games)</span>'
+        '<table><tr><th>Rk</th></tr>'
+        '<tr>\n<td>1</td><td><a>Boise St.</a> <span class="seed">10</span></td>'
+        f'<td>MWC</td><td>20-9</td>{cells}</tr>'
+        '</table></body></html>'
+    )
+    data, as_of = parse_data(html_content, 'stream')
+    assert as_of == 'Data through Monday (5 games)'
+    assert list(data) == ['bsu']
+    assert data['bsu'].name == 'Boise St'
+    assert data['bsu'].sos_non_conf_rank == 18
+
+
 def test_filter_data_conf_capitalization():
     all_data, _ = PARSED_CONTENT
     upper, _ = filter_data(all_data, 'meac')
@@ -273,12 +310,51 @@ def test_write_to_console_basic_conference():
     assert as_lines[18] == 'Data includes 84 of 97 games played on Saturday, December 17'
 
 
-def test_massage_school_name():
-    assert _massage_school_name('Gonzaga 1') == 'Gonzaga'
-    assert _massage_school_name('Gonzaga') == 'Gonzaga'
-    assert _massage_school_name('Boise St. 4') == 'Boise St'
-    assert _massage_school_name('One Two Three 245') == 'One Two Three'
-    assert _massage_school_name('') == ''
+def test_split_school_name():
+    assert _split_school_name('Gonzaga 1') == ('Gonzaga', 1)
+    assert _split_school_name('Gonzaga') == ('Gonzaga', None)
+    assert _split_school_name('Boise St. 4') == ('Boise St', 4)
+    assert _split_school_name("St. John's") == ("St John's", None)
+    assert _split_school_name('One Two Three 245') == ('One Two Three', 245)
+    assert _split_school_name('') == ('', None)
+
+
+def test_filter_seeds():
+    html_content = _fetch_test_content()
+    for name, seed in [('Houston', 1), ('Tennessee', 2), ('Virginia Tech', 11), ('Wofford', 16)]:
+        html_content = html_content.replace(f'>{name}</a>', f'>{name}</a> <span>{seed}</span>', 1)
+
+    for as_table in (False, True):
+        data, _ = parse_data(html_content, as_table=as_table)
+        assert data['hou'].seed == 1 and data['vt'].seed == 11 and data['duke'].seed is None
+
+        filtered, meta = filter_data(data, 'seed<=2')
+        assert [v.abbrev for v in filtered.values()] == ['HOU', 'TENN']
+        assert meta['num_teams'] == 2 and meta['max_name_len'] == len('Tennessee')
+        filtered, _ = filter_data(data, 'Seed > 2')
+        assert list(filtered) == ['vt', 'wof']
+        filtered, _ = filter_data(data, 'seed!=11')
+        assert list(filtered) == ['hou', 'tenn', 'wof']
+        filtered, _ = filter_data(data, 'seed=16')
+        assert list(filtered) == ['wof']
+        # A lone seed comparison uses the seed index, in an expression the mask
+        filtered, _ = filter_data(data, 'seed <= 11.5 and rank > 0')
+        assert list(filtered) == ['hou', 'tenn', 'vt']
+
+
+def test_usage_and_errors(monkeypatch, capsys):
+    # The usage text goes through `%` formatting, so a bare % in it breaks both
+    monkeypatch.setattr(sys, 'argv', ['kenpom.py', '--help'])
+    with pytest.raises(SystemExit) as exit_info:
+        parse_args()
+    assert exit_info.value.code == 0
+    assert 'top 10% of D1' in capsys.readouterr().out
+
+    monkeypatch.setattr(sys, 'argv', ['kenpom.py', '--similar', 'vt', 'many'])
+    with pytest.raises(SystemExit) as exit_info:
+        parse_args()
+    assert exit_info.value.code == 2
+    assert '--similar takes a team' in capsys.readouterr().err
 
 
 @contextmanager
@@ -0,0 +1,45 @@
+"""Tests for matchup predictions, single and all-pairs."""
+
+import pytest
+
+from kenpom import parse_data
+import matchup
+from matchup import MatchupMatrix, matrix_for, predict
+from tests.test_kenpom import _fetch_test_content
+
+TABLE_DATA, AS_OF = parse_data(_fetch_test_content(), as_table=True)
+
+
+def test_predict():
+    vt_wof = predict(TABLE_DATA, 'vt', 'Wofford')
+    wof_vt = predict(TABLE_DATA, 'WOF', 'virginia tech')
+    assert (vt_wof.team, vt_wof.opponent) == ('VT', 'WOF')
+    assert vt_wof.team_score == pytest.approx(75.93, abs=0.01)
+    assert vt_wof.margin == pytest.approx(-wof_vt.margin)
+    assert vt_wof.win_probability == pytest.approx(1 - wof_vt.win_probability)
+    assert 0.5 < vt_wof.win_probability < 1
+
+    even = predict(TABLE_DATA, 'vt', 'vt')
+    assert even.margin == 0 and even.win_probability == 0.5
+
+    with pytest.raises(KeyError):
+        predict(TABLE_DATA, 'vt', 'nope')
+
+
+def test_matrix_matches_single_predictions(backend):
+    matrix = MatchupMatrix(TABLE_DATA)
+    for team, opponent in [('vt', 'wof'), ('conn', 'iupui'), ('hou', 'tenn')]:
+        expected = predict(TABLE_DATA, team, opponent)
+        actual = matrix.predict(team, opponent)
+        assert actual == pytest.approx(expected, rel=1e-6)  # approximate erf with NumPy
+
+
+def test_matrix_is_cached_per_snapshot():
+    assert matrix_for(TABLE_DATA) is matrix_for(TABLE_DATA)
+
+
+def test_describe():
+    text = matchup.describe(predict(TABLE_DATA, 'wof', 'vt'), TABLE_DATA)
+    assert (
+        text == 'Wofford 64, Virginia Tech 76 (64 possessions)\nVirginia Tech by 12.3, 87% to win'
+    )
@@ -0,0 +1,87 @@
+"""Tests for the instrumentation spans, counters and sinks."""
+
+import io
+import json
+import sys
+
+import pytest
+
+import kenpom
+from kenpom import filter_data, parse_data
+import metrics
+from metrics import JsonLines, prometheus_text, Registry, stderr_summary
+import snapshot
+from tests.test_kenpom import _fetch_test_content
+
+
+def test_spans_and_counters():
+    registry = Registry()
+    with registry.span('parse'):
+        pass
+    with registry.span('parse'):
+        pass
+    registry.count('rows.unmatched_name')
+    registry.count('rows.unmatched_name', 2)
+
+    report = registry.report()
+    assert report['spans']['parse']['calls'] == 2
+    assert report['spans']['parse']['max_seconds'] <= report['spans']['parse']['seconds']
+    assert report['counters'] == {'rows.unmatched_name': 3}
+
+    flushed = []
+    registry.flush(flushed.append)
+    assert flushed == [report]
+    assert registry.report() == {'spans': {}, 'counters': {}}
+
+
+def test_hot_paths_are_instrumented():
+    metrics.reset()
+    table, _ = parse_data(_fetch_test_content(), as_table=True)
+    filter_data(table, 'acc')
+    report = metrics.report()
+    assert {'parse.stream', 'parse.build', 'filter'} <= set(report['spans'])
+    # The page's repeated header rows aren't schema drift
+    assert report['counters']['rows.skipped_column_count'] == 0
+    assert report['counters']['rows.unmatched_name'] == 0
+
+    # Drop a cell from Houston's row, and rename a school
+    html_content = _fetch_test_content().replace('Wofford', 'Not A School')
+    html_content = html_content.replace('<td class="hard_left">2</td>', '', 1)
+    for parser in ('soup', 'stream'):
+        metrics.reset()
+        parse_data(html_content, parser)
+        assert metrics.report()['counters']['rows.skipped_column_count'] == 1
+        assert metrics.report()['counters']['rows.unmatched_name'] == 1
+
+
+def test_sinks(tmp_path):
+    report = {
+        'spans': {'fetch': {'calls': 1, 'seconds': 0.25, 'max_seconds': 0.25}},
+        'counters': {'cache.memory.hits': 4},
+    }
+    stream = io.StringIO()
+    stderr_summary(report, stream)
+    assert 'fetch' in stream.getvalue() and '250.00 ms' in stream.getvalue()
+
+    path = tmp_path / 'profile.jsonl'
+    JsonLines(path)(report)
+    JsonLines(path)(report)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2 and lines[0]['counters'] == {'cache.memory.hits': 4}
+
+    text = prometheus_text(report)
+    assert 'kenpom_span_seconds_total{span="fetch"} 0.25' in text
+    assert 'kenpom_events_total{event="cache.memory.hits"} 4' in text
+
+
+@pytest.mark.parametrize(
+    'mode', [['--matchup', 'vt,wof'], ['--conf-summary', 'acc'], ['--similar', 'vt', '3']]
+)
+def test_one_shot_modes_flush(tmp_path, monkeypatch, capsys, mode):
+    path, profile = tmp_path / 'snapshot.kps', tmp_path / 'profile.jsonl'
+    snapshot.dump(path, *parse_data(_fetch_test_content()))
+    argv = ['kenpom.py', '--snapshot', str(path), '--profile-jsonl', str(profile), *mode]
+    monkeypatch.setattr(sys, 'argv', argv)
+    kenpom.main()
+    assert capsys.readouterr().out
+    assert len(profile.read_text().splitlines()) == 1
@@ -0,0 +1,154 @@
+"""Tests for the on-disk page cache, against a stand-in server."""
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import socket
+import threading
+
+import pytest
+
+import kenpom
+from kenpom import fetch_content, fetch_page, parse_data
+import pagecache
+from pagecache import SnapshotCache
+from tests.test_kenpom import _fetch_test_content
+
+HTML_CONTENT = _fetch_test_content()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Serve the test page, honoring `If-None-Match`."""
+
+    etag = '"v1"'
+    requests_seen: list = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        if self.etag and self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+        body = HTML_CONTENT.encode('utf-8')
+        self.send_response(200)
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def stand_in_server(etag):
+    handler = type('Handler', (_StandInHandler,), {'etag': etag, 'requests_seen': []})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}/', handler.requests_seen
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class _CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, page_content):
+        self.calls += 1
+        data, as_of = parse_data(page_content, as_table=True)
+        return as_of, data
+
+
+def test_fresh_cache_skips_network(tmp_path):
+    parse = _CountingParser()
+    with stand_in_server('"v1"') as (url, seen):
+        as_of, data = SnapshotCache(tmp_path, ttl=600).fetch_and_parse(url, fetch_page, parse)
+        assert len(data) == 363
+        assert 'December 17' in as_of
+
+        # A new process (new cache object) reads the snapshot straight off disk
+        cached_as_of, cached_data = SnapshotCache(tmp_path, 600).fetch_and_parse(
+            url, fetch_page, parse
+        )
+    assert len(seen) == 1
+    assert parse.calls == 1
+    assert cached_as_of == as_of
+    assert cached_data == data
+
+
+def test_stale_cache_revalidates_with_etag(tmp_path):
+    parse = _CountingParser()
+    with stand_in_server('"v1"') as (url, seen):
+        SnapshotCache(tmp_path, ttl=0).fetch_and_parse(url, fetch_page, parse)
+        _, data = SnapshotCache(tmp_path, ttl=0).fetch_and_parse(url, fetch_page, parse)
+    assert len(data) == 363
+    assert len(seen) == 2
+    assert 'If-None-Match' not in seen[0]
+    assert seen[1]['If-None-Match'] == '"v1"'
+    assert parse.calls == 1
+
+
+def test_unchanged_content_reuses_parse(tmp_path):
+    parse = _CountingParser()
+    with stand_in_server(None) as (url, seen):
+        SnapshotCache(tmp_path, ttl=0).fetch_and_parse(url, fetch_page, parse)
+        SnapshotCache(tmp_path, ttl=0).fetch_and_parse(url, fetch_page, parse)
+    assert len(seen) == 2
+    assert parse.calls == 1
+
+
+def test_changed_url_refetches(tmp_path):
+    parse = _CountingParser()
+    with stand_in_server('"v1"') as (url, seen):
+        SnapshotCache(tmp_path, ttl=600).fetch_and_parse(url, fetch_page, parse)
+        SnapshotCache(tmp_path, ttl=600).fetch_and_parse(url + '?y=2022', fetch_page, parse)
+    assert len(seen) == 2
+    assert 'If-None-Match' not in seen[1]
+    assert parse.calls == 2
+
+
+@pytest.mark.parametrize('ttl', [600, 0], ids=['fresh', 'stale'])
+@pytest.mark.parametrize('junk', [b'', b'garbage', None], ids=['empty', 'garbage', 'truncated'])
+def test_unreadable_snapshot_refetches(tmp_path, ttl, junk):
+    parse = _CountingParser()
+    with stand_in_server('"v1"') as (url, seen):
+        SnapshotCache(tmp_path, ttl).fetch_and_parse(url, fetch_page, parse)
+        snapshot_file = tmp_path / pagecache.SNAPSHOT_FILE
+        whole = snapshot_file.read_bytes()
+        snapshot_file.write_bytes(whole[: len(whole) // 2] if junk is None else junk)
+
+        _, data = SnapshotCache(tmp_path, ttl).fetch_and_parse(url, fetch_page, parse)
+        assert len(data) == 363
+        assert 'If-None-Match' not in seen[-1]  # a 304 would leave us nothing to read
+        assert parse.calls == 2
+
+        # ... and the cache is whole again
+        SnapshotCache(tmp_path, 600).fetch_and_parse(url, fetch_page, parse)
+        assert parse.calls == 2
+
+
+def test_unwritable_cache_still_answers(tmp_path):
+    not_a_dir = tmp_path / 'file'
+    not_a_dir.write_text('')
+    parse = _CountingParser()
+    with stand_in_server('"v1"') as (url, _):
+        _, data = SnapshotCache(not_a_dir / 'kenpom', 600).fetch_and_parse(url, fetch_page, parse)
+    assert len(data) == 363
+
+
+def test_stalled_server_times_out(monkeypatch):
+    requests = pytest.importorskip('requests')
+    monkeypatch.setattr(kenpom, 'REQUEST_TIMEOUT', 0.2)
+    with socket.socket() as listener:  # accepts connections, never answers
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        url = f'http://127.0.0.1:{listener.getsockname()[1]}/'
+        with pytest.raises(requests.Timeout):
+            fetch_content(url)
+        with pytest.raises(requests.Timeout):
+            fetch_page(url, {})
@@ -0,0 +1,74 @@
+"""Tests for the percentile and z-score columns.
+
+Covers working them out, filtering on them and display.
+"""
+
+import io
+import statistics
+
+import pytest
+
+from kenpom import filter_data, parse_data, write_to_console
+import percentiles
+from percentiles import FIELDS, Percentiles, percentiles_for
+from tests.test_kenpom import _fetch_test_content
+
+DICT_DATA, AS_OF = parse_data(_fetch_test_content())
+TABLE_DATA, _ = parse_data(_fetch_test_content(), as_table=True)
+
+
+def test_columns_match_definitions(backend):
+    stats = Percentiles(TABLE_DATA)
+    teams = list(DICT_DATA.values())
+    for field in FIELDS:
+        sign = -1 if field in percentiles.LOWER_IS_BETTER else 1
+        values = [sign * getattr(t, field) for t in teams]
+        mean, std = statistics.mean(values), statistics.pstdev(values)
+        for row, value in enumerate(values):
+            below = sum(v < value for v in values) + sum(v == value for v in values) / 2
+            assert stats.columns[f'{field}_pct'][row] == pytest.approx(100 * below / len(values))
+            assert stats.columns[f'{field}_z'][row] == pytest.approx((value - mean) / std)
+
+
+def test_small_tables_skip_numpy():
+    # A season's few hundred teams is below `NUMPY_MIN_ROWS`, see table.py
+    stats = Percentiles(TABLE_DATA)
+    assert all(isinstance(column, list) for column in stats.columns.values())
+    assert percentiles.z_scores([2.0, 2.0]) == [0.0, 0.0]
+
+
+def test_higher_is_better():
+    stats = percentiles_for(TABLE_DATA)
+    best_defense = min(DICT_DATA.values(), key=lambda t: t.def_rank).abbrev
+    assert stats.value(best_defense, 'defense_pct') == max(stats.columns['defense_pct'])
+    assert stats.value(best_defense, 'defense_z') > 2
+    assert percentiles_for(TABLE_DATA) is stats
+
+
+@pytest.mark.parametrize(
+    'query, column, expected',
+    [
+        ('defense_pct>=97', 'defense_pct', lambda v: v >= 97),
+        ('luck_z < -1.5', 'luck_z', lambda v: v < -1.5),
+        ('eff_margin_pct=50', 'eff_margin_pct', lambda v: v == 50),
+    ],
+)
+def test_filter_data(query, column, expected):
+    from_table, meta = filter_data(TABLE_DATA, query)
+    from_dict, _ = filter_data(DICT_DATA, query)
+    assert list(from_table) == list(from_dict) and meta['num_teams'] == len(from_dict)
+
+    stats = percentiles_for(TABLE_DATA)
+    matches = [a for a in DICT_DATA if expected(stats.value(DICT_DATA[a].abbrev, column))]
+    assert list(from_dict) == matches
+
+
+def test_write_stats_columns():
+    data, meta = filter_data(TABLE_DATA, 'vt,wof')
+    meta['stats'] = percentiles.console_columns(TABLE_DATA, data, 'pct')
+    stream = io.StringIO()
+    write_to_console(data, meta, AS_OF, stream=stream)
+    header, dashes, vt, wof = stream.getvalue().splitlines()[:4]
+    assert header.split()[-6:] == ['AdjEM%', 'Off%', 'Def%', 'Tempo%', 'Luck%', 'SOS%']
+    assert len(dashes) == len(header) - 1
+    assert vt.split()[-6:] == ['93', '95', '86', '27', '70', '32']
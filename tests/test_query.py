@@ -0,0 +1,80 @@
+"""Tests for the query indexes, against brute force scans."""
+
+from kenpom import parse_data
+import pytest
+
+from query import index_for, parse_sort, sort_order, sort_places, sort_rows, sort_values
+from query import SnapshotIndex
+from tests.test_kenpom import _fetch_test_content
+
+TABLE_DATA, _ = parse_data(_fetch_test_content(), as_table=True)
+NAMES = [n.lower() for n in TABLE_DATA.column('name')]
+
+
+def test_index_is_cached_per_table():
+    assert index_for(TABLE_DATA) is index_for(TABLE_DATA)
+    assert isinstance(index_for(TABLE_DATA), SnapshotIndex)
+    assert index_for(TABLE_DATA.take([0, 1])) is not index_for(TABLE_DATA)
+
+
+def test_top():
+    index = index_for(TABLE_DATA)
+    assert index.top(0) == []
+    assert index.top(3) == [0, 1, 2]
+    assert len(index.top(25)) == 25
+    assert len(index.top(1000)) == 363
+
+
+def test_abbrevs_and_confs():
+    index = index_for(TABLE_DATA)
+    assert [TABLE_DATA.row(i).abbrev for i in index.abbrevs(['wof', 'vt', 'nope'])] == [
+        'VT',
+        'WOF',
+    ]
+    rows = index.confs(['acc', 'sec'])
+    assert rows == sorted(rows)
+    assert {TABLE_DATA.row(i).conf for i in rows} == {'ACC', 'SEC'}
+    assert index.confs(['nope']) == []
+
+
+def test_names_match_brute_force():
+    index = index_for(TABLE_DATA)
+    terms = ['a', 'st', 'val', 'valley', 'virginia tech', 'north', "s'", 'zzz', 'texas a&m']
+    for term in terms:
+        expected = [i for i, name in enumerate(NAMES) if term in name]
+        assert index.names([term]) == expected, term
+
+    both = index.names(['valley', 'southern'])
+    expected = [i for i, name in enumerate(NAMES) if 'valley' in name or 'southern' in name]
+    assert both == expected
+
+
+def test_parse_sort():
+    assert parse_sort('tempo') == [('tempo', False)]
+    assert parse_sort('-Luck, def_rank') == [('luck', True), ('def_rank', False)]
+    with pytest.raises(ValueError):
+        parse_sort('tempo,nope')
+
+
+def test_sort_rows():
+    tempo = TABLE_DATA.column('tempo')
+    by_tempo = sort_rows(TABLE_DATA, None, [('tempo', False)])
+    assert by_tempo == sorted(range(363), key=lambda i: tempo[i])
+    assert sort_order(TABLE_DATA, 'tempo') is sort_order(TABLE_DATA, 'tempo')
+
+    rows = index_for(TABLE_DATA).confs(['acc'])
+    fastest_first = sort_rows(TABLE_DATA, rows, [('tempo', True)])
+    assert fastest_first == sorted(rows, key=lambda i: -tempo[i])
+
+    # Ties on the first key fall back to the second, then page order
+    ranks = TABLE_DATA.column('rank')
+    by_conf = sort_rows(TABLE_DATA, rows + [1, 0], [('conf', False), ('rank', True)])
+    assert by_conf[-2:] == [1, 0]  # ACC, then Amer, then BE
+    assert by_conf[:-2] == sorted(rows, key=lambda i: -ranks[i])
+
+    # Records sort by wins then fewest losses, not as text
+    assert sort_places(sort_values('record', ['9-0', '10-2', '', '10-1'])) == [0, 1, 3, 2]
+    records = TABLE_DATA.column('record')
+    best_first = sort_rows(TABLE_DATA, None, [('record', True)])
+    wins_losses = [tuple(map(int, records[i].split('-'))) for i in best_first]
+    assert wins_losses == sorted(wins_losses, key=lambda r: (-r[0], r[1]))
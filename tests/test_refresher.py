@@ -0,0 +1,73 @@
+"""Tests for the background snapshot refresher."""
+
+import threading
+import time
+
+import pytest
+
+from refresher import BackgroundRefresher, RefreshError
+
+
+class FlakyLoad:
+    """Stands in for `get_data`, failing whenever `fail` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+        self.called = threading.Event()
+
+    def __call__(self, revalidate):
+        self.calls.append(revalidate)
+        self.called.set()
+        if self.fail:
+            raise ConnectionError('KenPom is down')
+        return f'as of {len(self.calls)}', {}
+
+
+def _wait_for_call(load, count):
+    deadline = time.monotonic() + 5
+    while len(load.calls) < count and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert len(load.calls) >= count
+
+
+def test_refreshes_in_background():
+    load = FlakyLoad()
+    refresher = BackgroundRefresher(load, max_age=0.05, lead_time=0.02).start()
+    try:
+        assert refresher.get(timeout=5) == ('as of 1', {})
+        _wait_for_call(load, 3)
+        # Only the first load may come from the cache, later ones revalidate
+        assert load.calls[:3] == [False, True, True]
+        assert refresher.stale_note() == ''
+    finally:
+        refresher.stop()
+
+
+def test_failures_keep_last_good_snapshot():
+    load = FlakyLoad()
+    refresher = BackgroundRefresher(load, max_age=60, retry_after=0.01).start()
+    try:
+        assert refresher.get(timeout=5) == ('as of 1', {})
+        load.fail = True
+        refresher.refresh()
+        _wait_for_call(load, 3)
+        assert refresher.get() == ('as of 1', {})
+        assert isinstance(refresher.error, ConnectionError)
+
+        refresher.loaded_at -= 120
+        assert refresher.stale_note() == 'stale, refreshed 2 min ago, last refresh failed'
+    finally:
+        refresher.stop()
+
+
+def test_no_snapshot_at_all():
+    load = FlakyLoad()
+    load.fail = True
+    refresher = BackgroundRefresher(load, max_age=60, retry_after=60).start()
+    try:
+        with pytest.raises(RefreshError, match='KenPom is down'):
+            refresher.get(timeout=5)
+        assert refresher.stale_note() == ''
+    finally:
+        refresher.stop()
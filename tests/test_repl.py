@@ -0,0 +1,88 @@
+"""Tests for the interactive prompt's completion and commands."""
+
+import argparse
+import sys
+
+import pytest
+
+import kenpom
+import repl
+from repl import Completer, PrefixIndex, run_command
+import snapshot
+from tests.test_kenpom import PARSED_CONTENT
+
+
+def test_prefix_index():
+    index = PrefixIndex(['vt', 'virginia', 'virginia tech', 'vcu', 'wof', 'virginia'])
+    assert index.complete('vi') == ['virginia', 'virginia tech']
+    assert index.complete('virginia ') == ['virginia tech']
+    assert index.complete('') == ['vcu', 'virginia', 'virginia tech', 'vt', 'wof']
+    assert index.complete('x') == []
+
+
+def test_complete_filters():
+    completer = Completer()
+    assert completer.candidates('virginia t') == ['virginia tech']
+    assert completer.candidates('acc,Virginia T') == ['virginia tech']
+    assert completer.candidates('vt, wof') == [' wof', ' wofford']
+    assert 'gonz' in completer.candidates('gon') and 'gonzaga' in completer.candidates('gon')
+    assert {'sec', 'seton hall'} < set(completer.candidates('se'))
+    assert completer.candidates('zzz') == []
+
+
+def test_complete_commands():
+    completer = Completer()
+    assert completer.candidates(':') == [f':{c}' for c in sorted(repl.COMMANDS)]
+    assert completer.candidates(':so') == [':sort']
+    # Readline replaces everything after the last comma
+    assert completer.candidates(':sort -tem') == [':sort -tempo', ':sort -tempo_rank']
+    assert completer.candidates(':sort luck,off_r') == ['off_rank']
+    assert completer.candidates(':format j') == [':format jsonl']
+    assert completer.candidates(':refresh x') == []
+
+
+def test_run_command():
+    args = argparse.Namespace(sort=None, format='table', stats=None)
+    refreshed = []
+
+    assert run_command(':sort -tempo,luck', args, None) == 'Sorting by -tempo,luck'
+    assert args.sort == [('tempo', True), ('luck', False)]
+    assert 'nope' in run_command(':sort nope', args, None) and args.sort
+    assert run_command(':sort', args, None) == 'Sorting by rank' and args.sort is None
+
+    assert run_command(':format csv', args, None) == 'Printing csv' and args.format == 'csv'
+    assert run_command(':format arrow', args, None).startswith('Format is csv')
+    assert run_command(':stats z', args, None) == 'Showing z columns' and args.stats == 'z'
+    assert run_command(':stats', args, None) and args.stats is None
+
+    assert run_command(':refresh', args, None).startswith('Nothing to refresh')
+    assert run_command(':refresh', args, lambda: refreshed.append(1)).startswith('Refreshing')
+    assert refreshed == [1]
+    assert ':sort' in run_command(':help', args, None)
+    assert run_command(':nope', args, None) == 'No command :nope, try :help'
+
+
+def test_command_once(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'snapshot.kps'
+    snapshot.dump(path, *PARSED_CONTENT)
+    monkeypatch.setattr(sys, 'argv', ['kenpom.py', '--once', '--snapshot', str(path), ':help'])
+    monkeypatch.setattr('builtins.input', lambda text: pytest.fail('prompted with --once'))
+    kenpom.main()
+    assert ':sort' in capsys.readouterr().out
+
+
+def test_prompt_history(tmp_path, monkeypatch):
+    readline = pytest.importorskip('readline')
+    history = tmp_path / 'history'
+    readline.clear_history()
+    readline.add_history('acc')
+    readline.write_history_file(history)
+    readline.clear_history()
+
+    prompt = repl.Prompt(history)
+    assert readline.get_history_item(1) == 'acc'
+
+    monkeypatch.setattr('builtins.input', lambda text: 'vt,wof')
+    readline.add_history('vt,wof')  # what `input` does at a terminal
+    assert prompt.read('> ') == 'vt,wof'
+    assert history.read_text().split()[-2:] == ['acc', 'vt,wof']
@@ -0,0 +1,169 @@
+"""Tests for the JSON server, run against the local test data."""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from kenpom import parse_data
+from server import MAX_HEADER_LINES, SharedSnapshot, start_server
+from tests.test_kenpom import _fetch_test_content
+
+TABLE_DATA, AS_OF = parse_data(_fetch_test_content(), as_table=True)
+
+
+class _Loader:
+    """Stand-in for `get_data`, counting how often it runs."""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return AS_OF, TABLE_DATA
+
+
+@pytest.fixture
+def server_url():
+    loop = asyncio.new_event_loop()
+    shared = SharedSnapshot(_Loader())
+    server = loop.run_until_complete(start_server(shared, '127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}'
+    loop.call_soon_threadsafe(server.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def _get(url):
+    with urllib.request.urlopen(url) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_teams(server_url):
+    status, body = _get(f'{server_url}/teams?q=vt,wof')
+    assert status == 200
+    assert body['as_of'] == AS_OF
+    assert [t['abbrev'] for t in body['teams']] == ['VT', 'WOF']
+    assert body['teams'][0]['name'] == 'Virginia Tech'
+    assert body['teams'][0]['tempo'] == 66.6
+    assert body['meta']['num_teams'] == 2
+
+    _, body = _get(f'{server_url}/teams')
+    assert len(body['teams']) == 25
+
+    _, body = _get(f'{server_url}/teams?q=virginia+tech')
+    assert [t['abbrev'] for t in body['teams']] == ['VT']
+
+    _, body = _get(f'{server_url}/teams?q=vt,wof&sort=luck')
+    assert [t['abbrev'] for t in body['teams']] == ['WOF', 'VT']
+
+
+def test_errors(server_url):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f'{server_url}/teams?q=-1')
+    assert e.value.code == 400
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f'{server_url}/teams?q=acc&sort=nope')
+    assert e.value.code == 400
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f'{server_url}/teams?q=tempo+%3C')
+    assert e.value.code == 400
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f'{server_url}/nope')
+    assert e.value.code == 404
+
+
+def _raw(server_url, request):
+    """Send raw bytes, return the status line of the answer."""
+    host, port = server_url.rsplit('/', 1)[1].split(':')
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        sock.sendall(request)
+        return sock.makefile('rb').readline().decode('latin-1').strip()
+
+
+@pytest.mark.parametrize(
+    'request_bytes',
+    [
+        b'GET /' + b'x' * 10_000 + b' HTTP/1.1\r\n\r\n',
+        b'GET /health HTTP/1.1\r\nX-Long: ' + b'x' * 100_000 + b'\r\n\r\n',
+        b'GET /health HTTP/1.1\r\n' + b'X-Many: 1\r\n' * (MAX_HEADER_LINES + 1) + b'\r\n',
+    ],
+    ids=['request-line', 'header-line', 'header-count'],
+)
+def test_oversized_requests(server_url, request_bytes):
+    assert _raw(server_url, request_bytes) == 'HTTP/1.1 400 Bad Request'
+    assert _raw(server_url, b'GET /health HTTP/1.0\r\n\r\n') == 'HTTP/1.1 200 OK'
+
+
+def test_health(server_url):
+    status, body = _get(f'{server_url}/health')
+    assert status == 200
+    assert body['as_of'] == AS_OF
+
+
+def test_matchup(server_url):
+    status, body = _get(f'{server_url}/matchup?teams=vt,wof')
+    assert status == 200
+    assert (body['team'], body['opponent']) == ('VT', 'WOF')
+    assert body['margin'] > 0 and body['win_probability'] > 0.5
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f'{server_url}/matchup?teams=vt,nope')
+    assert e.value.code == 404
+
+
+def test_conferences(server_url):
+    status, body = _get(f'{server_url}/conferences?confs=acc,sec')
+    assert status == 200 and body['as_of'] == AS_OF
+    assert [c['conf'] for c in body['conferences']] == ['SEC', 'ACC']
+    assert body['conferences'][1]['teams'] == 15
+
+
+def test_similar(server_url):
+    status, body = _get(f'{server_url}/similar?team=vt&k=3')
+    assert status == 200 and body['as_of'] == AS_OF
+    assert [n['team'] for n in body['similar']] == ['PITT', 'TTU', 'MIA']
+
+    for query, code in [('team=nope', 404), ('team=vt&k=x', 400), ('k=3', 400)]:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            _get(f'{server_url}/similar?{query}')
+        assert e.value.code == code
+
+
+def test_metrics(server_url):
+    _get(f'{server_url}/teams?q=acc')
+    with urllib.request.urlopen(f'{server_url}/metrics') as response:
+        assert response.headers['Content-Type'].startswith('text/plain')
+        text = response.read().decode('utf-8')
+    assert '# TYPE kenpom_span_seconds_total counter' in text
+    assert 'kenpom_span_calls_total{span="filter"}' in text
+
+
+def test_single_refresh_in_flight():
+    async def run():
+        loader = _Loader(delay=0.05)
+        shared = SharedSnapshot(loader, max_age=600)
+        results = await asyncio.gather(*(shared.get() for _ in range(20)))
+        assert loader.calls == 1
+        assert all(r == (AS_OF, TABLE_DATA) for r in results)
+
+        # Expired: everyone still gets the old snapshot at once, one reload starts
+        shared.max_age = 0
+        await asyncio.gather(*(shared.get() for _ in range(20)))
+        await asyncio.sleep(0.1)
+        assert loader.calls == 2
+
+    asyncio.run(run())
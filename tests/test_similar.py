@@ -0,0 +1,60 @@
+"""Tests for the similar teams search.
+
+Checked against distances worked out by hand.
+"""
+
+import math
+import statistics
+
+import pytest
+
+from kenpom import parse_data
+import similar
+from similar import FEATURES, index_for, SimilarityIndex
+from tests.test_kenpom import _fetch_test_content
+
+TABLE_DATA, AS_OF = parse_data(_fetch_test_content(), as_table=True)
+
+
+def _brute_force(team: str, k: int):
+    columns = {}
+    for f in FEATURES:
+        values = TABLE_DATA.column(f)
+        mean, std = statistics.mean(values), statistics.pstdev(values)
+        columns[f] = [(v - mean) / std for v in values]
+    row = TABLE_DATA.position(team)
+    distances = sorted(
+        (math.dist([columns[f][i] for f in FEATURES], [columns[f][row] for f in FEATURES]), i)
+        for i in range(len(TABLE_DATA))
+        if i != row
+    )
+    abbrevs = TABLE_DATA.column('abbrev')
+    return [(abbrevs[i], d) for d, i in distances[:k]]
+
+
+def test_nearest_matches_brute_force(backend):
+    index = SimilarityIndex(TABLE_DATA)
+    abbrevs = TABLE_DATA.column('abbrev')
+    for team in ('vt', 'wof', 'hou'):
+        expected = _brute_force(team, 8)
+        actual = [(abbrevs[r], d) for r, d in index.nearest(TABLE_DATA.position(team), 8)]
+        assert [a for a, _ in actual] == [a for a, _ in expected]
+        assert [d for _, d in actual] == pytest.approx([d for _, d in expected])
+
+
+def test_similar(backend):
+    data, _ = parse_data(_fetch_test_content(), as_table=True)  # not cached with the other backend
+    neighbors = similar.similar(data, 'Virginia Tech', 5)
+    assert [n.team for n in neighbors] == ['PITT', 'TTU', 'MIA', 'FAU', 'CLEM']
+    assert all(a.distance <= b.distance for a, b in zip(neighbors, neighbors[1:]))
+
+    everyone = similar.similar(data, 'vt', 1000)
+    assert len(everyone) == len(data) - 1 and 'VT' not in {n.team for n in everyone}
+    assert similar.similar(data, 'vt', 0) == []
+
+    with pytest.raises(KeyError):
+        similar.similar(data, 'nope')
+
+
+def test_index_is_cached_per_snapshot():
+    assert index_for(TABLE_DATA) is index_for(TABLE_DATA)
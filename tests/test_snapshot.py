@@ -0,0 +1,72 @@
+"""Tests for the binary snapshot format."""
+
+import struct
+
+import pytest
+
+from kenpom import parse_data
+import snapshot
+from snapshot import SnapshotError, SnapshotReader
+from table import FIELDS, KenPomTable
+from tests.test_kenpom import _fetch_test_content
+
+DICT_DATA, AS_OF = parse_data(_fetch_test_content())
+TABLE_DATA, _ = parse_data(_fetch_test_content(), as_table=True)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'kenpom.kps'
+    snapshot.dump(path, TABLE_DATA, AS_OF)
+    data, as_of = snapshot.load(path)
+    assert as_of == AS_OF
+    assert data == DICT_DATA
+    assert list(data) == list(DICT_DATA)
+    assert data['ore'].luck == -0.04
+    assert data['ore'].conf == 'P12'
+
+
+def test_seeds_and_snapshots_without_them(monkeypatch):
+    rows = [row.to_kenpom() for row in TABLE_DATA.values()]
+    rows[0].seed = 1
+    seeded = snapshot.loads(snapshot.dumps(KenPomTable.from_rows(rows), AS_OF))[0]
+    assert seeded['conn'].seed == 1 and seeded['hou'].seed is None
+
+    monkeypatch.setattr(snapshot, 'FIELDS', FIELDS[:-1])  # as written before `seed`
+    older, _ = snapshot.loads(snapshot.dumps(TABLE_DATA, AS_OF))
+    assert 'seed' not in SnapshotReader(snapshot.dumps(TABLE_DATA, AS_OF)).column_names
+    assert older == DICT_DATA
+    assert older['conn'].seed is None
+
+
+def test_dumps_accepts_dict():
+    assert snapshot.dumps(DICT_DATA, AS_OF) == snapshot.dumps(TABLE_DATA, AS_OF)
+
+
+def test_reader_single_column():
+    buffer = b'padding' + snapshot.dumps(TABLE_DATA, AS_OF)
+    reader = SnapshotReader(buffer, offset=len(b'padding'))
+    assert reader.num_rows == 363
+    assert reader.as_of == AS_OF
+    assert list(reader.column('rank')) == list(range(1, 364))
+    assert reader.column('abbrev')[:2] == ['CONN', 'HOU']
+    assert 'tempo' in reader.column_names
+
+
+def test_rejects_junk(tmp_path):
+    with pytest.raises(SnapshotError):
+        snapshot.loads(b'not a snapshot at all')
+
+    newer = bytearray(snapshot.dumps(TABLE_DATA, AS_OF))
+    struct.pack_into('<H', newer, 6, snapshot.VERSION + 1)
+    with pytest.raises(SnapshotError):
+        snapshot.loads(bytes(newer))
+
+    whole = snapshot.dumps(TABLE_DATA, AS_OF)
+    for length in (4, snapshot._HEADER.size + 2, 200, len(whole) - 1):
+        with pytest.raises(SnapshotError):
+            snapshot.loads(whole[:length])
+
+    empty = tmp_path / 'empty.kps'
+    empty.write_bytes(b'')
+    with pytest.raises(SnapshotError):
+        snapshot.load(empty)
@@ -0,0 +1,50 @@
+"""Start up cost of `kenpom.py`, from `python -X importtime`."""
+
+from pathlib import Path
+import subprocess
+import sys
+from typing import Dict
+
+from kenpom import parse_data, URL
+from pagecache import SnapshotCache
+from tests.test_kenpom import _fetch_test_content
+
+ROOT = Path(__file__).resolve().parent.parent
+# Only needed to fetch or parse a page, or for big tables
+HEAVY_PACKAGES = ('bs4', 'lxml', 'requests', 'urllib3', 'cachetools', 'numpy')
+
+
+def _import_times(stderr: str) -> Dict[str, int]:
+    """Map each imported module to its cumulative import time."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cached_run_skips_html_and_http_stack(tmp_path):
+    page = _fetch_test_content()
+    table, as_of = parse_data(page, as_table=True)
+    SnapshotCache(tmp_path, ttl=600).store(URL, page, 'digest', {}, (as_of, table))
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'kenpom.py', '--once', '--cache-dir', tmp_path, '5'],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert 'Connecticut' in result.stdout
+
+    times = _import_times(result.stderr)
+    assert 'kenpom' not in times  # run as __main__
+    assert 'pagecache' in times
+    heavy = sorted(m for m in times if m.split('.')[0] in HEAVY_PACKAGES)
+    assert heavy == []
+
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:10]
+    print('\nSlowest imports (cumulative us):')
+    print('\n'.join(f'{us:>10,} {name}' for name, us in slowest))
@@ -0,0 +1,96 @@
+"""Tests for the columnar KenPomTable, against the dict version."""
+
+from array import array
+
+import pytest
+
+from kenpom import filter_data, HEADER_LEN, parse_data, write_to_console
+from query import parse_sort
+import table
+from table import as_table, KenPomRow, KenPomTable
+from tests.test_kenpom import _fetch_test_content, captured_output
+
+HTML_CONTENT = _fetch_test_content()
+DICT_DATA, AS_OF = parse_data(HTML_CONTENT)
+TABLE_DATA, TABLE_AS_OF = parse_data(HTML_CONTENT, as_table=True)
+
+FILTERS = ['0', '7', 'acc,SEC', 'vt,wof', 'utah', 'valley,southern', "'virginia tech'", 'foobar']
+
+
+def test_parse_as_table():
+    assert isinstance(TABLE_DATA, KenPomTable)
+    assert TABLE_AS_OF == AS_OF
+    assert TABLE_DATA == DICT_DATA
+    assert list(TABLE_DATA) == list(DICT_DATA)
+
+    oregon = TABLE_DATA['ore']
+    assert isinstance(oregon, KenPomRow)
+    assert oregon == DICT_DATA['ore']
+    assert oregon.conf == 'P12'
+    assert oregon.luck == -0.040
+    assert oregon.to_kenpom() == DICT_DATA['ore']
+
+
+def test_columns_are_typed():
+    assert isinstance(TABLE_DATA.column('rank'), array)
+    assert TABLE_DATA.column('rank').typecode == 'i'
+    assert TABLE_DATA.column('tempo').typecode == 'd'
+    assert TABLE_DATA.column('conf').typecode == 'B'
+    assert TABLE_DATA.conf_labels[TABLE_DATA.column('conf')[0]] == 'BE'
+    assert TABLE_DATA.conf_code('acc') == TABLE_DATA.conf_code('ACC') >= 0
+    assert TABLE_DATA.conf_code('nope') == -1
+
+
+def test_from_dict_round_trip():
+    assert KenPomTable.from_dict(DICT_DATA) == TABLE_DATA
+    assert as_table(DICT_DATA) == TABLE_DATA and as_table(TABLE_DATA) is TABLE_DATA
+
+
+@pytest.mark.parametrize('user_input', FILTERS)
+def test_filter_table_matches_dict(backend, user_input):
+    expected, expected_meta = filter_data(DICT_DATA, user_input)
+    actual, actual_meta = filter_data(TABLE_DATA, user_input)
+    assert list(actual) == list(expected)
+    assert actual == expected
+    assert actual_meta == expected_meta
+
+
+@pytest.mark.parametrize('sort', ['tempo', '-luck', 'conf,-eff_margin', '-seed,name', 'record'])
+@pytest.mark.parametrize('user_input', ['0', 'acc,SEC', 'valley,southern'])
+def test_sorted_filter_table_matches_dict(backend, user_input, sort):
+    keys = parse_sort(sort)
+    expected, expected_meta = filter_data(DICT_DATA, user_input, keys)
+    actual, actual_meta = filter_data(TABLE_DATA, user_input, keys)
+    assert list(actual) == list(expected)
+    assert actual_meta == expected_meta
+
+
+def test_write_sorted_table_to_console():
+    data, meta = filter_data(TABLE_DATA, 'acc', parse_sort('-tempo'))
+    with captured_output() as (out, _):
+        write_to_console(data, meta, TABLE_AS_OF)
+    lines = out.getvalue().splitlines()
+    assert lines[0].endswith('Conf  tempo')
+    assert lines[2] == '      NC State   NCST    54   42 /  67    9-3   ACC   72.2'
+    assert len(lines[1]) == meta['max_name_len'] + HEADER_LEN + len('  tempo')
+
+
+def test_vector_helpers(backend):
+    assert table.is_ndarray(TABLE_DATA.vector('rank')) == (backend == 'numpy')
+    assert TABLE_DATA.where('rank', '<=', 3) == [0, 1, 2]
+    slowest = TABLE_DATA.argsort('tempo')[0]
+    assert TABLE_DATA.row(slowest).tempo == min(TABLE_DATA.column('tempo'))
+    fastest = TABLE_DATA.argsort('tempo', reverse=True)[0]
+    assert TABLE_DATA.row(fastest).tempo == max(TABLE_DATA.column('tempo'))
+    acc = TABLE_DATA.where_conf(['acc'])
+    assert {TABLE_DATA.row(i).conf for i in acc} == {'ACC'}
+
+
+def test_write_table_to_console():
+    expected, meta = filter_data(DICT_DATA, 'acc')
+    actual, _ = filter_data(TABLE_DATA, 'acc')
+    with captured_output() as (expected_out, _):
+        write_to_console(expected, meta, AS_OF)
+    with captured_output() as (actual_out, _):
+        write_to_console(actual, meta, AS_OF)
+    assert actual_out.getvalue() == expected_out.getvalue()
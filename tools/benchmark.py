@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""Benchmarks for the hot spots in kenpom.py.
+
+Times `parse_data` (each parser), `filter_data` (each branch),
+`_split_school_name` and `write_to_console` against the test page and
+synthetic pages with 10x and 100x its rows, reporting ns/row and peak memory.
+The soup parser is twenty times slower than the default stream parser, so it
+is only timed when asked for with `--parsers soup,stream`.
+
+Run from the repo root:
+
+    python tools/benchmark.py                           # print results
+    python tools/benchmark.py --save results.json       # ... and keep them
+    python tools/benchmark.py --baseline results.json   # fail on regressions
+    python tools/benchmark.py --row-construction        # KenPom construction only
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+from pathlib import Path
+import platform
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from datastructures import KenPom  # noqa: E402
+from kenpom import (  # noqa: E402
+    _split_school_name,
+    _stream_rows,
+    filter_data,
+    parse_data,
+    PARSERS,
+    write_to_console,
+)
+from query import SnapshotIndex  # noqa: E402
+
+TEST_HTML = ROOT / 'tests' / 'test.html'
+SCALES = (1, 10, 100)
+# One filter per branch of `filter_data`
+FILTERS = {
+    'all': '0',
+    'top': '25',
+    'abbrev': 'vt,wof',
+    'conf': 'acc,sec',
+    'name': 'valley,southern',
+    'seed': 'seed<=4',
+    'fuzzy': 'gonzga,virgina tech',
+}
+MIN_TIME = 0.2  # seconds per timing, so fast benchmarks loop enough to be stable
+
+
+@dataclasses.dataclass
+class ReflectiveKenPom:
+    """The original `KenPom`, typed via `dataclasses.fields`."""
+
+    rank: int
+    name: str
+    conf: str
+    record: str
+    eff_margin: float
+    offense: float
+    off_rank: int
+    defense: float
+    def_rank: int
+    tempo: float
+    tempo_rank: int
+    luck: float
+    luck_rank: int
+    sos_eff_margin: float
+    sos_eff_margin_rank: int
+    sos_off: float
+    sos_off_rank: int
+    sos_def: float
+    sos_def_rank: int
+    sos_non_conf: float
+    sos_non_conf_rank: int
+    abbrev: str
+
+    def __post_init__(self):
+        for field in dataclasses.fields(self):
+            value = getattr(self, field.name)
+            if not isinstance(value, field.type):
+                setattr(self, field.name, field.type(value))
+
+
+def _text_rows():
+    rows, _ = _stream_rows(TEST_HTML.read_text())
+    return [row + ['ABBR'] for row in rows]
+
+
+def _ns_per_row(build, rows, repeat=5):
+    number = max(1, 20000 // len(rows))
+    best = min(timeit.repeat(lambda: [build(r) for r in rows], number=number, repeat=repeat))
+    return best / number / len(rows) * 1e9
+
+
+def _bytes_per_row(build, rows):
+    tracemalloc.start()
+    built = [build(r) for r in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return size / len(rows)
+
+
+def bench_row_construction():
+    """Compare ways of turning page text into a typed row."""
+    rows = _text_rows()
+    builders = [
+        ('reflective __post_init__ (before)', lambda r: ReflectiveKenPom(*r)),
+        ('KenPom(*text_items)', lambda r: KenPom(*r)),
+        ('KenPom.from_text_items (after)', KenPom.from_text_items),
+    ]
+    print(f'Row construction, {len(rows)} rows from {TEST_HTML.name}')
+    for label, build in builders:
+        ns = _ns_per_row(build, rows)
+        size = _bytes_per_row(build, rows)
+        print(f'  {label:>35}: {ns:8,.0f} ns/row {size:8,.0f} bytes/row')
+
+
+def synthetic_page(scale: int) -> str:
+    """The test page with its rows repeated `scale` times."""
+    page = TEST_HTML.read_text()
+    head, rest = page.split('<tbody>', 1)
+    body, tail = rest.split('</tbody>', 1)
+    return f'{head}<tbody>{body * scale}</tbody>{tail}'
+
+
+def measure(func: Callable[[], Any], rows: int, repeat: int = 3) -> Dict[str, float]:
+    """Best-of-`repeat` timing of `func`, and its peak memory."""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(number, int(number * MIN_TIME / elapsed)) if elapsed else number
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'rows': rows,
+        'seconds': best,
+        'ns_per_row': best / rows * 1e9,
+        'peak_bytes': peak,
+    }
+
+
+def _write_quietly(data, meta, as_of):
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_to_console(data, meta, as_of)
+
+
+def run_suite(scales=SCALES, parsers=('stream',), repeat: int = 3) -> Dict[str, Dict]:
+    """Run every benchmark at every scale.
+
+    Results are keyed like `filter_data[top]@10x`.
+    """
+    results: Dict[str, Dict] = {}
+
+    def bench(name, scale, func, rows):
+        key = f'{name}@{scale}x'
+        results[key] = result = measure(func, rows, repeat)
+        print(
+            f'{key:>32}: {result["ns_per_row"]:10,.0f} ns/row'
+            f' {result["seconds"] * 1e3:10,.2f} ms {result["peak_bytes"] / 1024:10,.0f} KiB peak'
+        )
+
+    for scale in scales:
+        page = synthetic_page(scale)
+        table, as_of = parse_data(page, as_table=True)
+        rows = len(table.column('rank'))
+        for parser in parsers:
+            bench(f'parse_data[{parser}]', scale, lambda: parse_data(page, parser, True), rows)
+
+        raw_names = [row[1] for row in _stream_rows(page)[0]]
+        split = _split_school_name.__wrapped__  # the work a cache miss does
+        bench('_split_school_name', scale, lambda: list(map(split, raw_names)), rows)
+
+        bench('SnapshotIndex', scale, lambda: SnapshotIndex(table), rows)
+        filter_data(table, '0')  # build the per-snapshot index outside the timings
+        for branch, user_input in FILTERS.items():
+            bench(f'filter_data[{branch}]', scale, lambda: filter_data(table, user_input), rows)
+
+        everything, meta = filter_data(table, '0')
+        bench('write_to_console', scale, lambda: _write_quietly(everything, meta, as_of), rows)
+    return results
+
+
+def regressions(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float
+) -> List[str]:
+    """Describe each benchmark that got `threshold` slower.
+
+    That is, slower per row by more than `threshold`.
+    """
+    slower = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        ratio = result['ns_per_row'] / before['ns_per_row']
+        if ratio > 1 + threshold:
+            slower.append(
+                f'{key}: {before["ns_per_row"]:,.0f} -> {result["ns_per_row"]:,.0f} ns/row'
+                f' ({ratio - 1:+.0%})'
+            )
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parsing, filtering and output.')
+    parser.add_argument(
+        '--scales',
+        default=','.join(map(str, SCALES)),
+        help='comma-separated multiples of the test page rows, defaults to %(default)s',
+    )
+    parser.add_argument(
+        '--parsers',
+        default='stream',
+        help=f'comma-separated parsers to time ({", ".join(PARSERS)}), defaults to %(default)s',
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='defaults to %(default)s')
+    parser.add_argument('--save', type=Path, metavar='FILE', help='write results as JSON')
+    parser.add_argument(
+        '--baseline', type=Path, metavar='FILE', help='compare with results saved earlier'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.25,
+        help='fail if a benchmark is this much slower per row than the baseline,'
+        ' defaults to %(default)s',
+    )
+    parser.add_argument(
+        '--row-construction', action='store_true', help='only compare KenPom construction'
+    )
+    args = parser.parse_args()
+
+    if args.row_construction:
+        bench_row_construction()
+        return
+
+    results = run_suite(
+        [int(s) for s in args.scales.split(',')], args.parsers.split(','), args.repeat
+    )
+    if args.save:
+        report = {'python': platform.python_version(), 'results': results}
+        args.save.write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())['results']
+        if slower := regressions(results, baseline, args.threshold):
+            print(f'\nSlower than {args.baseline} by more than {args.threshold:.0%}:')
+            print('\n'.join(f'  {s}' for s in slower))
+            sys.exit(1)
+        print(f'\nNo regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()